@@ -1,12 +1,47 @@
 import zipfile
+import multiprocessing
 import os
 import shutil
-import re
-from collections import Counter
+import stat
+import sys
+import time
 import argparse
 from pathlib import Path
 from datetime import datetime
-
+from analyzers import parse_header
+from detections import find_log_window
+from html_report import minute_key, write_html_report
+from event_db import DB_NAME, write_event_db
+from event_store import EventStore
+from log_sources import LogSources
+from log_parser import (
+    aggregates_from_store,
+    new_aggregates,
+    parse_buffer,
+    parse_mapped_log,
+)
+from pipeline import (
+    file_source,
+    parse_parallel,
+    read_blocks,
+    sevenzip_source,
+    zip_member_source,
+)
+from profiling import Profiler
+from quicklook import DEFAULT_TIME_BUDGET, quick_look
+from salvage import needs_salvage, salvage_zip
+from sevenzip import SIGNATURE as SEVENZIP_SIGNATURE
+from sevenzip import Bad7zFile, SevenZipFile, is_7z_file
+from zipstream import ZipStreamReader
+from sketches import DEFAULT_CAPACITY, SpaceSaving, format_bound, save_sketches
+from spill import SpillingCounter
+from versions import (
+    NO_VERSION,
+    VERSION_REGEX,
+    VersionComparison,
+    index_versions,
+    version_key,
+)
 
 """
 Diag_analyzer.exe v2
@@ -28,7 +63,10 @@ parser.add_argument(
     required=False,
 )
 parser.add_argument(
-    "-i", "--infile", help="Location of the diagnostic file", required=False
+    "-i",
+    "--infile",
+    help='Location of the diagnostic file, or "-" to read a zip from stdin',
+    required=False,
 )
 parser.add_argument(
     "-d",
@@ -36,23 +74,110 @@ parser.add_argument(
     help="Directory location of the diagnostic files",
     required=False,
 )
-args = parser.parse_args()
+parser.add_argument(
+    "--profile",
+    action="store_true",
+    help="Record stage timings, parser counters, memory peaks and a cProfile of the parse loop in the results directory",
+)
+parser.add_argument(
+    "--approximate",
+    action="store_true",
+    help="Count Files, Paths and Processes with fixed-size Space-Saving sketches instead of exact counters, reporting error bounds",
+)
+parser.add_argument(
+    "--sketch-size",
+    type=int,
+    default=DEFAULT_CAPACITY,
+    help=f"Entries kept per sketch with --approximate (default {DEFAULT_CAPACITY})",
+)
+parser.add_argument(
+    "-q",
+    "--quick-look",
+    action="store_true",
+    help="Estimate the top Processes, Extensions and Paths from evenly spaced samples of the logs, with 95%% confidence intervals",
+)
+parser.add_argument(
+    "--time-budget",
+    type=float,
+    default=DEFAULT_TIME_BUDGET,
+    help=f"Seconds the quick look may spend sampling (default {DEFAULT_TIME_BUDGET})",
+)
+parser.add_argument(
+    "--memory-limit",
+    type=int,
+    help="Megabytes the Files and Paths counters may use before spilling sorted partial counts to disk (exact, for very high path counts)",
+)
+parser.add_argument(
+    "--spill-dir",
+    help="Directory for the temporary run files written by --memory-limit (default: system temp)",
+)
+parser.add_argument(
+    "--all-files",
+    action="store_true",
+    help="Also write every scanned file and path with its count to -all-files.txt and -all-paths.txt",
+)
+parser.add_argument(
+    "--event-store",
+    action="store_true",
+    help="Keep every parsed event in a compact columnar store, saved as -events.store, so the results can be re-sliced without re-parsing",
+)
+parser.add_argument(
+    "--event-db",
+    action="store_true",
+    help="Also write the events, summary counters and analyzer tables to an SQLite index, -events.db, queried with event_db.py or from the results window (keeps the event store)",
+)
+parser.add_argument(
+    "-j",
+    "--jobs",
+    type=int,
+    default=os.cpu_count() or 1,
+    help="Parser processes (default: one per core).  With more than one, logs are decompressed and parsed in parallel and no longer extracted to the results folder; -j 1 extracts them first as earlier versions did",
+)
+parser.add_argument(
+    "--salvage",
+    action="store_true",
+    help="Read the zip through its local file headers, recovering complete members and the readable start of a truncated one (automatic when the central directory is missing)",
+)
+parser.add_argument(
+    "--incremental",
+    action="store_true",
+    help="With a zip that is still being copied: save the progress in results/ and only parse the new bytes on the next run (implies --salvage)",
+)
+parser.add_argument(
+    "--compare-versions",
+    action="store_true",
+    help="Parse the logs of every connector version in the diagnostic, in parallel, and compare the scan load of the newest with the one before it (the rest of the report covers the newest version)",
+)
+# Defaults when imported by the GUI or the benchmark, the command line is
+# only parsed when this file is run directly
+args = parser.parse_args([])
+
+
+# "-" for stdin, or a named pipe
+def is_stream_source(path):
+    if path == "-":
+        return True
+    return os.path.exists(path) and stat.S_ISFIFO(os.stat(path).st_mode)
 
 
 def get_source(input_path=None):
     # 1. Use explicitly provided input path (highest priority)
     if input_path and os.path.isfile(input_path):
         return os.path.abspath(input_path)
+    if input_path and is_stream_source(input_path):
+        return input_path
 
     # 2. Use args.infile if available
     if hasattr(args, "infile") and args.infile:
+        if is_stream_source(args.infile):
+            return args.infile
         infile_path = os.path.join(os.curdir, args.infile)
         if os.path.isfile(infile_path):
             return os.path.abspath(infile_path)
 
-    # 3. Use args.directory if it points to a file
+    # 3. Use args.directory if it points to a file or a directory of logs
     if hasattr(args, "directory") and args.directory:
-        if os.path.isfile(args.directory):
+        if os.path.exists(args.directory):
             return os.path.abspath(args.directory)
 
     # 4. Search current directory for a matching file
@@ -64,31 +189,38 @@ def get_source(input_path=None):
     exit("No diagnostic file found or specified.")
 
 
-def get_max_version(list_of_paths):
-    max_version = [0, 0, 0]
-    r = r"\d{1,2}\.\d{1,2}\.\d{1,2}.\d{1,5}"
-    for path in list_of_paths:
-        reg = re.findall(r, path)
-        if reg:
-            if list(map(lambda x: int(x), reg[0].split("."))) > max_version:
-                max_version = list(map(lambda x: int(x), reg[0].split(".")))
-    print(
-        "Found latest version: "
-        + ".".join(list(map(lambda x: str(x), max_version)))
-        + "\n"
-    )
-    return ".".join(list(map(lambda x: str(x), max_version)))
+# Newest of a collection of versions, e.g. the keys of index_versions
+def get_max_version(versions):
+    max_version = max(versions, key=version_key, default=NO_VERSION)
+    print("Found latest version: " + max_version + "\n")
+    return max_version
 
 
 def get_version(path):
-    r = r"(\d{1,2}\.\d{1,2}\.\d{1,2}.\d{1,5}).*sfc\.exe.*"
-    reg = re.findall(r, path)
-    if reg:
-        return reg[0]
-    return "0.0.0"
-
-
-def get_log_files_directory(source, output):
+    reg = VERSION_REGEX.search(path)
+    return reg[1] if reg else NO_VERSION
+
+
+# The sfc.exe.log files under a directory.  With sources (a LogSources) given,
+# the other files they read are handed to them in the same walk.
+def get_unpacked_logs(directory, sources=None):
+    logs = []
+    for root, _, files in os.walk(directory):
+        for file in files:
+            path = os.path.abspath(os.path.join(root, file))
+            if file.startswith("sfc.exe.log"):
+                logs.append(path)
+            elif sources is not None and sources.wants(path):
+                with open(path, "rb") as stream:
+                    sources.feed(os.path.relpath(path, directory), stream)
+    return logs
+
+
+def get_log_files_directory(source, output, sources=None):
+    # Already unpacked logs are parsed where they are, without copying them
+    unpacked = get_unpacked_logs(source, sources)
+    if unpacked:
+        return get_log_members(unpacked)
     files_7z = []
     for file in os.listdir(source):
         if file.endswith(".7z"):
@@ -97,31 +229,222 @@ def get_log_files_directory(source, output):
             files_7z.append(file)
     log_files = []
     for file in files_7z:
-        log_files.append(get_log_files(file, output))
+        # Only the first archive's logs are parsed, and its other members read
+        log_files.append(
+            get_log_files(
+                os.path.join(source, file), output, None if log_files else sources
+            )
+        )
     return log_files[0]
 
 
+# Picks the newest-version sfc.exe.log members out of an archive listing
+def get_log_members(namelist):
+    versions = index_versions(namelist)
+    return versions.get(get_max_version(versions), [])
+
+
+# When the diagnostic was collected, so that log lines, which carry no year,
+# are never dated after it: the newest sfc.exe.log member of a zip, else the
+# file's modification time.  None for pipes.
+def get_archive_time(source):
+    if is_stream_source(source) or not os.path.exists(source):
+        return None
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            times = [
+                info.date_time
+                for info in archive.infolist()
+                if os.path.basename(info.filename).startswith("sfc.exe.log")
+            ]
+        # Writers that leave member times unset store 1980-01-01
+        if times and max(times)[0] > 1980:
+            return datetime(*max(times))
+    return datetime.fromtimestamp(os.path.getmtime(source))
+
+
+def open_archive(source):
+    if is_7z_file(source):
+        return SevenZipFile(source)
+    return zipfile.ZipFile(source)
+
+
+# Yields (name, stream) per member.  7z members come in archive order and are
+# decoded as they are read, so only the folders holding them are decompressed.
+def open_members(archive, members):
+    if isinstance(archive, SevenZipFile):
+        yield from archive.open_members(members)
+        return
+    for f in members:
+        with archive.open(f) as source:
+            yield f, source
+
+
+# Hands the members the sources read to them, from an open archive
+def read_sources(archive, sources):
+    if sources is None:
+        return
+    names = [name for name in archive.namelist() if sources.wants(name)]
+    for name, stream in open_members(archive, names):
+        sources.feed(name, stream)
+
+
+# Streams for the parallel pipeline as (version, stream) pairs: one per zip
+# member, one for all the 7z members of a version (they share solid folders)
+# or one per unpacked log.  Only the newest version's unless all_versions.
+# None when the source has to be extracted first.  The other members go to
+# sources.
+def get_log_sources(source, sources=None, all_versions=False):
+    if args.directory and os.path.isdir(args.directory):
+        unpacked = get_unpacked_logs(args.directory, sources)
+        if not unpacked:
+            return None
+        return [
+            (version, file_source(path))
+            for version, paths in select_versions(unpacked, all_versions).items()
+            for path in paths
+        ]
+    try:
+        with open_archive(source) as archive:
+            versions = select_versions(archive.namelist(), all_versions)
+            read_sources(archive, sources)
+    except zipfile.BadZipFile:
+        exit(f"Error: The file '{source}' is not a valid ZIP file.")
+    except Bad7zFile as e:
+        exit(f"Error: The file '{source}' could not be read as a 7z file: {e}")
+    if is_7z_file(source):
+        return [
+            (version, sevenzip_source(source, members))
+            for version, members in versions.items()
+        ]
+    return [
+        (version, zip_member_source(source, member))
+        for version, members in versions.items()
+        for member in members
+    ]
+
+
+# {version: sfc.exe.log members} of every version, or of the newest only
+def select_versions(names, all_versions=False):
+    versions = index_versions(names)
+    if all_versions:
+        return versions
+    max_version = get_max_version(versions)
+    return {max_version: versions.get(max_version, [])}
+
+
+# (name, stream) of the newest-version logs of an archive or a directory of
+# diagnostics, only those in names when given
+def open_logs(source, names=None):
+    if os.path.isdir(source):
+        unpacked = get_unpacked_logs(source)
+        if unpacked:
+            for path in get_log_members(unpacked):
+                if names is None or path in names:
+                    with open(path, "rb") as stream:
+                        yield path, stream
+            return
+        archives = [f for f in os.listdir(source) if f.endswith((".7z", ".zip"))]
+        if not archives:
+            return
+        source = os.path.join(source, archives[0])
+    with open_archive(source) as archive:
+        members = get_log_members(archive.namelist())
+        if names is not None:
+            members = [member for member in members if member in names]
+        yield from open_members(archive, members)
+
+
+# The log lines around a detection (see detections.find_log_window), for the
+# results window.  The log that started last before the detection's time is
+# searched first, so usually only one log is read.
+def log_window(source, timestamp, ticks, thread, context=20):
+    starts = []
+    for name, stream in open_logs(source):
+        start = parse_header(stream.read(4096))[1]
+        starts.append((minute_key(start) if start else None, name))
+    target = minute_key(timestamp)
+    earlier = sorted(
+        (item for item in starts if item[0] is not None and item[0] <= target),
+        reverse=True,
+    )
+    order = [name for _, name in earlier]
+    order += [name for _, name in starts if name not in order]
+    for name in order:
+        found = find_log_window(open_logs(source, [name]), ticks, thread, context)
+        if found is not None:
+            return found
+    return None
+
+
+# Parses the sfc.exe.log members of a zip read sequentially from a pipe, with
+# no temporary copy.  The newest version is only known once the whole stream
+# has been read, so each version is counted separately and the others are
+# dropped at the end.  The other members go to sources.  Returns
+# {version: (aggregates, event store)}.
+def parse_zip_stream(stream, new_version_aggregates, keep_store=False, sources=None):
+    if stream.peek(len(SEVENZIP_SIGNATURE)).startswith(SEVENZIP_SIGNATURE):
+        exit("Error: 7z diagnostics cannot be read from a pipe, save the file first.")
+    versions = {}
+    try:
+        for name, member in ZipStreamReader(stream).members():
+            if sources is not None and sources.wants(name):
+                sources.feed(name, member)
+                continue
+            if not os.path.basename(name).startswith("sfc.exe.log"):
+                continue
+            version = get_version(name)
+            if version not in versions:
+                versions[version] = (
+                    new_version_aggregates(),
+                    EventStore() if keep_store else None,
+                )
+            aggregates, store = versions[version]
+            for block, ahead in read_blocks(member):
+                parse_buffer(block, aggregates, store, ahead=ahead)
+            aggregates["analysis"].end_source()
+    except zipfile.BadZipFile as e:
+        exit(f"Error: The input stream is not a valid ZIP file: {e}")
+    if not versions:
+        exit("No sfc.exe.log files found in the input stream.")
+    return versions
+
+
+def print_salvage(info):
+    print(
+        f"Salvaged {info['members']} complete sfc.exe.log members "
+        f"({info['new_members']} new, resumed at byte {info['resumed_from']})."
+    )
+    if info["truncated"]:
+        print(
+            f"{info['truncated']} is cut off, its first "
+            f"{info['truncated_bytes']} bytes were parsed."
+        )
+    elif not info["complete"]:
+        print("The archive ends early, run again once more of it is available.")
+    print()
+
+
+def extract_members(archive, members, output):
+    for f, source in open_members(archive, members):
+        fname = os.path.basename(f)
+        with open(os.path.join(output, fname), "wb") as target:
+            shutil.copyfileobj(source, target)
+
+
 # Creates the output directory dependent upon version number
-def get_log_files(source, output):
+def get_log_files(source, output, sources=None):
     print("Moving log files into the output directory.\n")
     try:
-        with zipfile.ZipFile(source) as archive:
-            namelist = []
-            for x in archive.namelist():
-                namelist.append(x)
-            max_version = get_max_version(namelist)
-            for f in archive.namelist():
-                if get_version(f) == max_version:
-                    fname = os.path.basename(f)
-                    source = archive.open(f)
-                    target = open(os.path.join(output, fname), "wb")
-                    with source, target:
-                        shutil.copyfileobj(source, target)
-        archive.close()
+        with open_archive(source) as archive:
+            extract_members(archive, get_log_members(archive.namelist()), output)
+            read_sources(archive, sources)
         # Returns a list of file names that were just extracted to the output directory
         return os.listdir(output)
     except zipfile.BadZipFile:
         exit(f"Error: The file '{source}' is not a valid ZIP file.")
+    except Bad7zFile as e:
+        exit(f"Error: The file '{source}' could not be read as a 7z file: {e}")
 
 
 # Formats the output.
@@ -130,7 +453,7 @@ def print_info(data, name, source, count=100000):
         filename = "Directory-summary.txt"
     else:
         filename = f'{source.split(".")[0]}-summary.txt'
-    with open(filename, "a") as f:
+    with open(filename, "a", encoding="utf-8") as f:
         print("\n-----------------------------------\nTop {} {}:\n".format(count, name))
         f.write("Top {} {}:\n".format(count, name))
         for i in data:
@@ -146,7 +469,7 @@ def print_info_to_file(data, name, results_dir, overwrite=False):
     # Always write to results/summary.txt
     file_name = os.path.join(results_dir, "-summary.txt")
     mode = "w" if overwrite else "a"
-    with open(file_name, mode) as f:
+    with open(file_name, mode, encoding="utf-8") as f:
         f.write("{}:\n".format(name))
         for i in data:
             output_line = "{0:>8}".format(i[1]), i[0].rstrip()
@@ -154,6 +477,20 @@ def print_info_to_file(data, name, results_dir, overwrite=False):
         f.write("\n\n")
 
 
+# Writes a table of several columns, padded to the widest cell of each
+def print_table_to_file(title, headings, rows, results_dir):
+    file_name = os.path.join(results_dir, "-summary.txt")
+    table = [[str(cell) for cell in headings]]
+    table += [[str(cell) for cell in row] for row in rows]
+    widths = [max(len(row[i]) for row in table) for i in range(len(headings))]
+    with open(file_name, "a", encoding="utf-8") as f:
+        f.write("{}:\n".format(title))
+        for row in table:
+            cells = [cell.ljust(width) for cell, width in zip(row, widths)]
+            f.write("  ".join(cells).rstrip() + "\n")
+        f.write("\n\n")
+
+
 def get_timestamped_results_dir():
     base_results_dir = Path.cwd() / "results"
     base_results_dir.mkdir(parents=True, exist_ok=True)
@@ -166,74 +503,306 @@ def get_timestamped_results_dir():
     return timestamped_dir
 
 
-def main(source=None):
-    source = get_source(source)
-
-    # Get output folder name from the zip filename
-    output_dir_name = os.path.splitext(os.path.basename(source))[0]
-
-    # Create timestamped results directory
-    results_dir = get_timestamped_results_dir()
-
-    # Use the timestamped results directory as the base for output
-    output = results_dir / output_dir_name
-    output.mkdir(parents=True, exist_ok=True)  # Ensure output subfolder exists
-
-    print(f"Logs will be extracted to: {output}")
-
-    # Collect and extract logs into 'results'
-    print("\nExtracting logs into 'results' directory...\n")
-    try:
-        if args.directory:
-            log_files = get_log_files_directory(args.directory, output)
-        else:
-            log_files = get_log_files(source, output)
-        print("Parsing the logs...\n")
-    except OSError as e:
-        exit(f"Log extraction failed: {str(e)}\n")
-
-    data = []
+def parse_log_files(log_files, output, aggregates, store=None):
     for log in log_files:
         if os.path.isdir(os.path.join(output, log)):
             continue  # Skip directories
-        r = r"(\w{3} \d{1,2} \d\d:\d\d:\d\d).*Event::HandleCreation: START (\\\\\?\\[^\(]+)\(\\\\\?\\[^\)]+\), (\\\\\?\\.+)"
-        with open(os.path.join(output, log), errors="ignore") as f:
-            log_read = f.readlines()
-        for line in log_read:
-            if "Event::HandleCreation" in line:
-                reg = re.findall(r, line)
-                if reg:
-                    data.append("{},{},{}\n".format(reg[0][0], reg[0][1], reg[0][2]))
+        parse_mapped_log(os.path.join(output, log), aggregates, store)
+    return aggregates
 
-    # Write results to results/summary.txt
-    process_list = list(map(lambda x: x.split(",")[2], data))
-    common_process = Counter(process_list).most_common(10)
+
+# Top rows of a counter, with the "<=count (>=count - error)" bound for sketches
+def get_top(counter, count):
+    if isinstance(counter, SpaceSaving):
+        return [
+            (item, format_bound(hits, error))
+            for item, hits, error in counter.most_common_with_error(count)
+        ]
+    return counter.most_common(count)
+
+
+def write_summary(aggregates, results_dir):
+    common_process = get_top(aggregates["processes"], 10)
     print_info_to_file(common_process, "Processes", results_dir, True)
 
-    file_list = list(map(lambda x: x.split(",")[1], data))
-    common_files = Counter(file_list).most_common(10)
+    common_files = get_top(aggregates["files"], 10)
     print_info_to_file(common_files, "Files", results_dir)
 
-    extension_list = list(map(lambda x: x.split(",")[1], data))
-    extension_list_scrubbed = []
-    for i in extension_list:
-        if "." in i.split("\\")[-1]:
-            x = i.split(".")[-1]
-            extension_list_scrubbed.append(x)
-    common_extensions = Counter(extension_list_scrubbed).most_common(10)
+    common_extensions = aggregates["extensions"].most_common(10)
     print_info_to_file(common_extensions, "Extensions", results_dir)
 
-    path_list = list(map(lambda x: x.split(",")[1], data))
-    path_list_scrubbed = []
-    for i in path_list:
-        path_only = i.split("\\")[:-1]
-        path_only_merged = "\\".join(path_only)
-        path_list_scrubbed.append(path_only_merged)
-    common_paths = Counter(path_list_scrubbed).most_common(100)
+    common_paths = get_top(aggregates["paths"], 100)
     print_info_to_file(common_paths, "Paths", results_dir)
 
+    # Sketches can be merged with other runs by sketches.py
+    sketches = {
+        name.capitalize(): aggregates[name]
+        for name in ("processes", "files", "paths")
+        if isinstance(aggregates[name], SpaceSaving)
+    }
+    if sketches:
+        save_sketches(sketches, os.path.join(results_dir, "-sketches.json"))
+
+    # The other members of the diagnostic first, then the version comparison
+    # and the analyzers
+    found = []
+    for name in ("sources", "versions", "analysis"):
+        if name in aggregates:
+            found += aggregates[name].sections()
+    for _, sections in found:
+        for title, headings, rows in sections:
+            print_table_to_file(title, headings, rows, results_dir)
+
+
+# Writes the quick-look estimates with the same headings as a full summary,
+# so the results window can show them
+def write_quick_look(result, results_dir):
+    overwrite = True
+    for name, rows in result["sections"].items():
+        data = [(item, "~{} ±{}".format(total, margin)) for item, total, margin in rows]
+        print_info_to_file(data, name, results_dir, overwrite)
+        overwrite = False
+    coverage = 100 * result["sampled_bytes"] / max(result["total_bytes"], 1)
+    details = [
+        ("blocks sampled", result["blocks"]),
+        ("percent of log bytes read", round(coverage, 2)),
+        ("seconds, extraction included", result["seconds"]),
+        ("seconds extracting", result["setup_seconds"]),
+        ("stopped because: " + result["reason"], ""),
+    ]
+    print_info_to_file(details, "Quick Look", results_dir)
+
+
+# Writes every entry of a counter, most scanned first, like v1.03's "All Files"
+# section.  Kept out of the summary since it can run to millions of lines.
+def print_all_to_file(counter, name, results_dir):
+    file_name = os.path.join(results_dir, f"-all-{name.lower()}.txt")
+    if isinstance(counter, SpillingCounter):
+        rows = counter.iter_most_common()
+    else:
+        rows = get_top(counter, None)
+    with open(file_name, "w", encoding="utf-8") as f:
+        f.write("All {}:\n".format(name))
+        for i in rows:
+            output_line = "{0:>8}".format(i[1]), i[0].rstrip()
+            f.write("{} {}\n".format(output_line[0], output_line[1]))
+        f.write("\n\n")
+    return file_name
+
+
+def write_reports(aggregates, results_dir, source):
+    # Write results to results/summary.txt
+    write_summary(aggregates, results_dir)
+
+    # Write the shareable HTML report next to the summary
+    write_html_report(aggregates, results_dir, source)
+
+    # Export tables of the analyzers, e.g. -hashing.csv
+    aggregates["analysis"].export(results_dir)
+
+    if args.all_files:
+        print_all_to_file(aggregates["files"], "Files", results_dir)
+        print_all_to_file(aggregates["paths"], "Paths", results_dir)
+
+
+def main(
+    source=None,
+    profile=False,
+    approximate=False,
+    quick=False,
+    event_store=False,
+    event_db=False,
+):
+    source = get_source(source)
+    profiler = Profiler(enabled=profile or args.profile)
+    sketch_size = args.sketch_size if approximate or args.approximate else None
+    memory_limit = args.memory_limit * 2**20 if args.memory_limit else None
+    # The SQLite index is built from the event store
+    event_db = event_db or args.event_db
+    store = None
+    if event_store or args.event_store or event_db:
+        store = EventStore(latest=get_archive_time(source))
+    if store is not None and (sketch_size or memory_limit):
+        exit(
+            "--event-store keeps every event and cannot be combined with "
+            "--approximate or --memory-limit."
+        )
+    compare = args.compare_versions
+    if compare and store is not None:
+        exit("--compare-versions cannot be combined with --event-store.")
+
+    # Get output folder name from the zip filename
+    output_dir_name = os.path.splitext(os.path.basename(source))[0]
+
+    # Create timestamped results directory
+    results_dir = get_timestamped_results_dir()
+
+    # Diagnostic members besides the logs, read along with them
+    sources = LogSources()
+
+    quick = quick or args.quick_look
+    # Logs are streamed straight from the archive to the parser processes,
+    # the quick look needs them extracted first
+    log_sources = None
+    salvage = args.salvage or args.incremental
+    streamed = is_stream_source(source)
+    if streamed:
+        if quick:
+            exit("--quick-look needs a diagnostic file, not a pipe.")
+    elif not salvage and needs_salvage(source):
+        print("The zip has no central directory, it is truncated or still being")
+        print("copied.  Salvaging the members that can be read.\n")
+        salvage = True
+    if salvage and quick:
+        exit("--quick-look cannot read a truncated archive, run without it.")
+    if compare and quick:
+        exit("--quick-look cannot be combined with --compare-versions.")
+    # Versions are compared through the pipeline, even with a single job
+    if not streamed and not salvage and (args.jobs > 1 or compare) and not quick:
+        log_sources = get_log_sources(source, sources, compare)
+        if compare and not log_sources:
+            exit(
+                "--compare-versions needs a diagnostic archive or a directory of "
+                "unpacked logs."
+            )
+    # {version: aggregates} of every version parsed, for the comparison
+    versions = {}
+
+    if streamed:
+        print("Reading the diagnostic from the input stream...\n")
+        with profiler.stage("parsing"), profiler.profile():
+            stream = sys.stdin.buffer if source == "-" else open(source, "rb")
+            with stream:
+                parsed = parse_zip_stream(
+                    stream,
+                    lambda: new_aggregates(sketch_size, memory_limit, args.spill_dir),
+                    store is not None,
+                    sources,
+                )
+        aggregates, store = parsed[get_max_version(parsed)]
+        versions = {version: parsed[version][0] for version in parsed}
+        source = "stdin" if source == "-" else source
+    elif salvage:
+        if args.incremental and memory_limit:
+            exit("--incremental cannot be combined with --memory-limit.")
+        checkpoint = None
+        if args.incremental:
+            checkpoint = str(
+                results_dir.parent / (os.path.basename(source) + ".salvage")
+            )
+        with profiler.stage("parsing"), profiler.profile():
+            versions, info = salvage_zip(
+                source,
+                lambda: new_aggregates(sketch_size, memory_limit, args.spill_dir),
+                get_version,
+                checkpoint,
+                settings=sketch_size,
+            )
+        print_salvage(info)
+        if not versions:
+            exit("No sfc.exe.log data could be recovered.")
+        aggregates = versions[get_max_version(versions)]
+        sources = info["sources"]
+        if store is not None:
+            print("The event store is not kept for salvaged archives.\n")
+            store = None
+    elif log_sources:
+        print(f"Parsing the logs with {args.jobs} parser processes...\n")
+        for version, _ in log_sources:
+            if version not in versions:
+                versions[version] = new_aggregates(
+                    sketch_size, memory_limit, args.spill_dir
+                )
+        aggregates = versions[get_max_version(versions)]
+        with profiler.stage("parsing"), profiler.profile():
+            try:
+                parse_parallel(
+                    [log_source for _, log_source in log_sources],
+                    aggregates,
+                    args.jobs,
+                    store,
+                    [versions[version] for version, _ in log_sources],
+                )
+            except (OSError, zipfile.BadZipFile, Bad7zFile) as e:
+                exit(f"Log extraction failed: {str(e)}\n")
+    else:
+        # Use the timestamped results directory as the base for output
+        output = results_dir / output_dir_name
+        output.mkdir(parents=True, exist_ok=True)  # Ensure output subfolder exists
+
+        print(f"Logs will be extracted to: {output}")
+
+        # Collect and extract logs into 'results'
+        print("\nExtracting logs into 'results' directory...\n")
+        # The quick look's time budget includes the extraction
+        started = time.perf_counter()
+        try:
+            with profiler.stage("extraction"):
+                if args.directory:
+                    log_files = get_log_files_directory(args.directory, output, sources)
+                else:
+                    log_files = get_log_files(source, output, sources)
+            print("Parsing the logs...\n")
+        except OSError as e:
+            exit(f"Log extraction failed: {str(e)}\n")
+
+        if quick:
+            log_paths = [os.path.join(output, log) for log in log_files]
+            with profiler.stage("quick look"):
+                result = quick_look(
+                    [path for path in log_paths if os.path.isfile(path)],
+                    args.time_budget,
+                    start=started,
+                )
+            write_quick_look(result, results_dir)
+            print(
+                f"Quick look: estimates from {result['blocks']} blocks in "
+                f"{result['seconds']}s, {result['setup_seconds']}s of them extracting "
+                f"({result['reason']}), run without --quick-look for exact counts.\n"
+            )
+            profiler.write(results_dir)
+            return results_dir
+
+        with profiler.stage("parsing"), profiler.profile():
+            aggregates = parse_log_files(
+                log_files,
+                output,
+                new_aggregates(sketch_size, memory_limit, args.spill_dir),
+                store,
+            )
+    profiler.add_counters(aggregates["stats"])
+
+    # Sections of the other members go with the analyzers', and their
+    # settings (the policy exclusions) to the analyzers
+    aggregates["sources"] = sources
+    aggregates["analysis"].configure(sources.settings())
+    if compare:
+        aggregates["versions"] = VersionComparison(versions)
+        print(
+            f"Compared connector versions: {', '.join(sorted(versions, key=version_key))}\n"
+        )
+
+    if store is not None:
+        with profiler.stage("aggregation"):
+            aggregates_from_store(store, aggregates)
+        store.save(os.path.join(results_dir, "-events.store"))
+        print(f"Event store written to: {results_dir / '-events.store'}\n")
+        if event_db:
+            with profiler.stage("event index"):
+                write_event_db(store, aggregates, str(results_dir / DB_NAME))
+            print(f"SQLite index written to: {results_dir / DB_NAME}\n")
+
+    with profiler.stage("report"):
+        write_reports(aggregates, results_dir, source)
+
+    for path in profiler.write(results_dir):
+        print(f"Profile written to: {path}")
+
     return results_dir
 
 
 if __name__ == "__main__":
+    # Parser processes re-import this module when the analyzer is frozen
+    multiprocessing.freeze_support()
+    args = parser.parse_args()
     main()
@@ -0,0 +1,242 @@
+import re
+from collections import Counter
+
+"""
+Analyzers that follow sequences of related log lines (a lock requested, then
+acquired, then released) rather than counting lines one at a time.
+
+Parsing is split in two so it works the same in parser processes:
+- in the parser, `extract` turns each line holding one of an analyzer's
+  markers into a small record tuple, tagged with the line's ticks, timestamp,
+  thread and the file and process of that thread's last HandleCreation;
+- in the parent, `Analysis.absorb` hands the records to the analyzers in log
+  order, so pairs split across two blocks still meet.
+"""
+
+
+# "(59302107, +0 ms) Jan 22 08:00:01 [1234]: ..." -> ticks, timestamp, thread
+HEADER_REGEX = re.compile(rb"\((\d+),[^)]*\) (\w{3} +\d{1,2} \d\d:\d\d:\d\d) \[(\d+)\]")
+# Upper bounds (ms) of the duration histograms
+DURATION_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000, 30000, 60000)
+# Row that a capped table counts the keys past its cap under
+OTHER = "(other)"
+
+
+def parse_header(line):
+    reg = HEADER_REGEX.match(line)
+    if reg is None:
+        return None, None, None
+    return int(reg[1]), reg[2].decode("ascii"), int(reg[3])
+
+
+# Exact duration distribution: occurrences per whole millisecond.  Durations
+# repeat a lot, so this stays small and merges by adding.
+class Durations(Counter):
+    def count(self):
+        return sum(self.values())
+
+    def total(self):
+        return sum(ms * n for ms, n in self.items())
+
+    def percentile(self, share):
+        rank = share * self.count()
+        seen = 0
+        for ms in sorted(self):
+            seen += self[ms]
+            if seen >= rank:
+                return ms
+        return 0
+
+    def summary(self):
+        count = self.count()
+        return {
+            "count": count,
+            "mean": round(self.total() / count, 1) if count else 0,
+            "p50": self.percentile(0.5),
+            "p90": self.percentile(0.9),
+            "p99": self.percentile(0.99),
+            "max": max(self, default=0),
+        }
+
+    def histogram(self):
+        buckets = Counter()
+        for ms, n in self.items():
+            bound = next((b for b in DURATION_BUCKETS if ms <= b), None)
+            buckets[bound] += n
+        return buckets
+
+
+def bucket_label(bound, previous):
+    if bound is None:
+        return f"> {DURATION_BUCKETS[-1]} ms"
+    if previous is None or previous + 1 == bound:
+        return f"{bound} ms"
+    return f"{previous + 1}-{bound} ms"
+
+
+# Rows of a side-by-side histogram table for several distributions
+def histogram_rows(*distributions):
+    histograms = [d.histogram() for d in distributions]
+    rows = []
+    previous = None
+    for bound in (*DURATION_BUCKETS, None):
+        counts = [h[bound] for h in histograms]
+        if any(counts):
+            rows.append((bucket_label(bound, previous), *counts))
+        previous = bound
+    return rows
+
+
+# Sorted minutes ("Jan 22 08:01") merged into at most max_rows neighbouring
+# groups, as [(label, minutes)]
+def minute_groups(minutes, max_rows):
+    size = max(-(-len(minutes) // max_rows), 1)
+    groups = []
+    for start in range(0, len(minutes), size):
+        group = minutes[start : start + size]
+        label = group[0] if size == 1 else f"{group[0]} - {group[-1][-5:]}"
+        groups.append((label, group))
+    return groups
+
+
+def holder_label(holder):
+    if holder is None:
+        return "(unknown)"
+    path, process = holder
+    return f"{process} -> {path}"
+
+
+# Base class.  Analyzers keep only mergeable state (Counters) in their results
+# so partial results from several logs can be added up.
+class Analyzer:
+    # Heading in the summary and the HTML report
+    name = ""
+    # Line markers routed to extract, found by the same scan as HandleCreation
+    markers = ()
+    # Timed analyzers get one more field: the ticks of the thread's next
+    # line of any kind within the next FOLLOW_BYTES of the log, or None
+    timed = False
+    # Keys kept per file or process table in the bounded-memory modes (None:
+    # unbounded), and how often a key was counted under OTHER instead
+    key_limit = None
+    folded = 0
+
+    # key, or other when table is full and does not hold key yet.  Further
+    # columns of a table keyed alike pass folds=0 so a key is counted once.
+    def capped(self, table, key, other, folds=1):
+        limit = self.key_limit
+        if limit is None or key in table or len(table) < limit:
+            return key
+        self.folded += folds
+        return other
+
+    # Adds the counts of partial into table, within the cap
+    def merge_capped(self, table, partial, other, folds=1):
+        for key, count in partial.items():
+            table[self.capped(table, key, other, folds)] += count
+
+    # Runs in the parser: the fields of a record for this line, or None
+    @staticmethod
+    def extract(line):
+        return None
+
+    # Runs in the parent, in log order.  holder is (file, process) of the
+    # thread's last HandleCreation, or None.
+    def consume(self, ticks, timestamp, thread, holder, fields):
+        pass
+
+    # A log ended: anything still open will never be closed
+    def end_source(self):
+        pass
+
+    def merge(self, other):
+        pass
+
+    # Settings read from the diagnostic besides the logs, e.g. {"policy": ...}
+    def configure(self, settings):
+        pass
+
+    # [(title, column headings, rows)] for the summary and the HTML report
+    def sections(self):
+        return []
+
+    # Writes export files (e.g. CSV) next to the summary
+    def export(self, results_dir):
+        pass
+
+
+# Records collected while parsing one buffer, in log order
+class LineRecords:
+    def __init__(self):
+        # (analyzer index, ticks, timestamp, thread, holder, fields)
+        self.records = []
+        # thread -> (file, process) of its last HandleCreation in the buffer
+        self.threads = {}
+        # (position in records, line number in the scan) of the timed records
+        # whose end the parser still has to look up
+        self.timed = []
+
+    # Sets the end ticks of the timed record at position
+    def finish(self, position, end):
+        record = self.records[position]
+        self.records[position] = (*record[:5], (*record[5][:-1], end))
+
+
+class Analysis:
+    def __init__(self, analyzers, key_limit=None):
+        self.analyzers = [analyzer() for analyzer in analyzers]
+        self.key_limit = key_limit
+        for analyzer in self.analyzers:
+            analyzer.key_limit = key_limit
+        # Last HandleCreation per thread so far, for records that had none in
+        # their own buffer
+        self.threads = {}
+
+    def absorb(self, records):
+        analyzers, threads = self.analyzers, self.threads
+        for index, ticks, timestamp, thread, holder, fields in records.records:
+            if holder is None:
+                holder = threads.get(thread)
+            analyzers[index].consume(ticks, timestamp, thread, holder, fields)
+        threads.update(records.threads)
+
+    def end_source(self):
+        for analyzer in self.analyzers:
+            analyzer.end_source()
+        self.threads = {}
+
+    def merge(self, other):
+        for analyzer, partial in zip(self.analyzers, other.analyzers):
+            analyzer.merge(partial)
+            analyzer.folded += partial.folded
+
+    def configure(self, settings):
+        for analyzer in self.analyzers:
+            analyzer.configure(settings)
+
+    def export(self, results_dir):
+        for analyzer in self.analyzers:
+            analyzer.export(results_dir)
+
+    # [(analyzer name, sections)] for the analyzers that found anything
+    def sections(self):
+        found = []
+        for analyzer in self.analyzers:
+            sections = analyzer.sections()
+            if sections and analyzer.folded:
+                sections.append(
+                    (
+                        "Capped Tables",
+                        ("Cap", "Folded"),
+                        [
+                            (
+                                f"{analyzer.key_limit} keys per table, "
+                                f"later keys counted as {OTHER}",
+                                analyzer.folded,
+                            )
+                        ],
+                    )
+                )
+            if sections:
+                found.append((analyzer.name, sections))
+        return found
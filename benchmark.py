@@ -0,0 +1,306 @@
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import zipfile
+from datetime import datetime
+from pathlib import Path
+
+import Diag_Analyzer_v2 as analyzer
+import generate_diag
+import log_parser
+from generate_diag import generate_diagnostic, parse_size
+from pipeline import parse_parallel
+from profiling import StageTimer
+
+try:
+    import resource
+except ImportError:  # Windows, the parser processes' peak is not measured
+    resource = None
+
+"""
+Benchmark harness
+
+Generates synthetic diagnostics of several sizes and runs the analyzer over them
+stage by stage, reporting wall time, MB/s, events/s and peak RSS for member
+discovery, decompression, parsing and report writing.  Each stage calls the
+functions main() runs with -j 1, so parsing includes folding the events into
+the counters as main() does.  With --jobs above 1 the logs are also parsed
+through the parallel pipeline, which decompresses, parses and merges in one
+overlapped stage.  Peak RSS is that of this process; the parallel stage also
+reports the peak of its largest parser process where the platform tells it.
+
+Usage:
+    python benchmark.py run --sizes 10MB,100MB,1GB -o baseline.json
+    python benchmark.py run --sizes 10MB,100MB -o current.json --baseline baseline.json
+    python benchmark.py compare baseline.json current.json --threshold 10
+"""
+
+
+STAGES = ["discovery", "decompression", "parsing", "report", "parallel parsing"]
+DEFAULT_SIZES = "10MB,100MB"
+DEFAULT_THRESHOLD = 10.0
+# Stages faster than this are timer noise and never count as regressions
+MIN_SECONDS = 0.05
+
+
+# Short hash of the generator's source, so archives cached by an older
+# generator are never reused
+def generator_version():
+    with open(generate_diag.__file__, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+# Peak RSS (bytes) of the largest child process waited for so far, or None
+def get_children_peak_rss():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # Kilobytes, except on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def get_archive(size, seed, work_dir):
+    name = f"synthetic-{size}-seed{seed}-{generator_version()}.zip"
+    archive = Path(work_dir) / name
+    # Archives are deterministic, so a previous run's copy can be reused
+    if not archive.exists():
+        print(f"Generating {archive.name}...")
+        generate_diagnostic(str(archive), size, seed=seed)
+    return archive
+
+
+def run_stages(archive_path, work_dir, jobs=1):
+    output = Path(tempfile.mkdtemp(dir=work_dir))
+    timer = StageTimer()
+    worker_rss = None
+    try:
+        # The analyzer prints progress for interactive use, keep it out of the results
+        with contextlib.redirect_stdout(io.StringIO()):
+            with timer.stage("discovery"):
+                archive = zipfile.ZipFile(archive_path)
+                members = analyzer.get_log_members(archive.namelist())
+                log_bytes = sum(archive.getinfo(m).file_size for m in members)
+
+            with timer.stage("decompression"):
+                analyzer.extract_members(archive, members, output)
+            archive.close()
+
+            with timer.stage("parsing"):
+                aggregates = analyzer.parse_log_files(
+                    sorted(os.listdir(output)), output, log_parser.new_aggregates()
+                )
+
+            with timer.stage("report"):
+                analyzer.write_reports(aggregates, output, str(archive_path))
+
+            if jobs > 1:
+                with timer.stage("parallel parsing"):
+                    log_sources = analyzer.get_log_sources(str(archive_path))
+                    parse_parallel(
+                        [log_source for _, log_source in log_sources],
+                        log_parser.new_aggregates(),
+                        jobs,
+                    )
+                worker_rss = get_children_peak_rss()
+    finally:
+        timer.stop()
+        shutil.rmtree(output, ignore_errors=True)
+
+    events = aggregates["events"]
+    stages = {}
+    for stage in [s for s in STAGES if s in timer.seconds] + ["total"]:
+        if stage == "total":
+            # The -j 1 run, the parallel stage parses the same logs again
+            serial = [s for s in timer.seconds if s != "parallel parsing"]
+            seconds = sum(timer.seconds[s] for s in serial)
+            rss = max((timer.peak_rss.get(s, 0) for s in serial), default=0)
+        else:
+            seconds = timer.seconds.get(stage, 0.0)
+            rss = timer.peak_rss.get(stage, 0)
+        stages[stage] = {
+            "seconds": round(seconds, 4),
+            "mb_per_s": round(log_bytes / 2**20 / seconds, 2) if seconds else None,
+            "events_per_s": round(events / seconds) if seconds else None,
+            "peak_rss_mb": round(rss / 2**20, 1),
+        }
+        if stage == "parallel parsing" and worker_rss is not None:
+            stages[stage]["worker_peak_rss_mb"] = round(worker_rss / 2**20, 1)
+    return {
+        "archive_bytes": os.path.getsize(archive_path),
+        "log_bytes": log_bytes,
+        "events": events,
+        "stages": stages,
+    }
+
+
+# Best-of-N: keeps the fastest time and the lowest peak RSS of each stage
+def best_of(runs):
+    best = runs[0]
+    for run in runs[1:]:
+        for stage, numbers in run["stages"].items():
+            kept = best["stages"][stage]
+            if numbers["seconds"] < kept["seconds"]:
+                for key in ("seconds", "mb_per_s", "events_per_s"):
+                    kept[key] = numbers[key]
+            for key in ("peak_rss_mb", "worker_peak_rss_mb"):
+                if key in numbers:
+                    kept[key] = min(kept.get(key, numbers[key]), numbers[key])
+    return best
+
+
+def run_benchmark(sizes, seed, repeat, work_dir, jobs=1):
+    results = {
+        "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "repeat": repeat,
+        "jobs": jobs,
+        "generator": generator_version(),
+        "sizes": {},
+    }
+    for label in sizes:
+        archive = get_archive(parse_size(label), seed, work_dir)
+        runs = [run_stages(archive, work_dir, jobs) for _ in range(repeat)]
+        results["sizes"][label] = best_of(runs)
+        print_result(label, results["sizes"][label])
+    return results
+
+
+def print_result(label, result):
+    print(
+        f"\n{label}: {result['log_bytes'] / 2**20:.1f} MB of logs, "
+        f"{result['events']} events"
+    )
+    print(
+        "{0:<18}{1:>10}{2:>10}{3:>14}{4:>12}{5:>12}".format(
+            "stage", "seconds", "MB/s", "events/s", "parent MB", "worker MB"
+        )
+    )
+    for stage, numbers in result["stages"].items():
+        print(
+            "{0:<18}{1:>10}{2:>10}{3:>14}{4:>12}{5:>12}".format(
+                stage,
+                numbers["seconds"],
+                numbers["mb_per_s"] if numbers["mb_per_s"] is not None else "-",
+                numbers["events_per_s"] if numbers["events_per_s"] is not None else "-",
+                numbers["peak_rss_mb"],
+                numbers.get("worker_peak_rss_mb", "-"),
+            )
+        )
+
+
+# Returns a list of (size, stage, metric, baseline, current, percent) for every
+# stage that got slower or used more memory than the threshold allows.
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    regressions = []
+    for label, result in current["sizes"].items():
+        if label not in baseline["sizes"]:
+            continue
+        for stage, numbers in result["stages"].items():
+            base = baseline["sizes"][label]["stages"].get(stage)
+            if not base:
+                continue
+            for metric in ("seconds", "peak_rss_mb", "worker_peak_rss_mb"):
+                if not base.get(metric) or metric not in numbers:
+                    continue
+                if (
+                    metric == "seconds"
+                    and max(base[metric], numbers[metric]) < MIN_SECONDS
+                ):
+                    continue
+                change = 100 * (numbers[metric] - base[metric]) / base[metric]
+                if change > threshold:
+                    regressions.append(
+                        (label, stage, metric, base[metric], numbers[metric], change)
+                    )
+    return regressions
+
+
+def print_regressions(regressions, threshold):
+    if not regressions:
+        print(f"\nNo regressions above {threshold}%.")
+        return
+    print(f"\nRegressions above {threshold}%:")
+    for label, stage, metric, base, value, change in regressions:
+        print(
+            f"  {label:<8} {stage:<18} {metric:<12} {base} -> {value} (+{change:.1f}%)"
+        )
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diagnostic analyzer benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Run the benchmark and save the results")
+    run.add_argument(
+        "--sizes",
+        default=DEFAULT_SIZES,
+        help=f"Comma separated log sizes to generate, default {DEFAULT_SIZES}",
+    )
+    run.add_argument("--seed", type=int, default=1)
+    run.add_argument("--repeat", type=int, default=1, help="Keep the best of N runs")
+    run.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Parser processes of the parallel parsing stage, as the analyzer's -j (default: one per core, skipped with 1)",
+    )
+    run.add_argument(
+        "--work-dir",
+        default=os.path.join(tempfile.gettempdir(), "diag_benchmark"),
+        help="Where generated diagnostics are cached",
+    )
+    run.add_argument("-o", "--output", help="JSON file to write the results to")
+    run.add_argument("--baseline", help="Baseline JSON to compare the run against")
+    run.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    compare = commands.add_parser("compare", help="Compare two result files")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Percent slowdown or memory growth that counts as a regression",
+    )
+    args = parser.parse_args()
+
+    if args.command == "run":
+        os.makedirs(args.work_dir, exist_ok=True)
+        results = run_benchmark(
+            args.sizes.split(","), args.seed, args.repeat, args.work_dir, args.jobs
+        )
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+            print(f"\nResults written to {args.output}")
+        if not args.baseline:
+            return
+        baseline = load_results(args.baseline)
+    else:
+        baseline = load_results(args.baseline)
+        results = load_results(args.current)
+
+    regressions = compare_results(baseline, results, args.threshold)
+    print_regressions(regressions, args.threshold)
+    # Non-zero exit so a nightly job fails when a stage regresses
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import re
+from collections import Counter
+
+from analyzers import OTHER, Analyzer, minute_groups
+from html_report import minute_key
+
+r"""
+Verdict cache and exclusion cache hit ratios.
+
+    Cache::Get: age 5120, sha256: ...                      verdict cache hit
+    Cache::Get: no entry for sha256: ...                   verdict cache miss
+    Exclusion::IsExcluded: result: 1 from cache for \\?\C:\...   exclusion cache hit
+    Exclusion::IsExcluded: result: 1 for \\?\C:\..., reason: ... computed, a miss
+
+Verdict cache lines carry only a hash, so they are charged to the file and
+process of the thread's last HandleCreation.  Exclusion lines name their file.
+Folders that miss a lot are the ones driving repeated hashing and scanning.
+"""
+
+
+# NFMMemCache::Get lines belong to the network flow cache
+VERDICT_REGEX = re.compile(rb"(?<!NFMMem)Cache::Get: (age|no entry)")
+EXCLUSION_REGEX = re.compile(
+    rb"Exclusion::IsExcluded: result: \d( from cache)? for (\\\\\?\\[^,\r\n]+)"
+)
+VERDICT, EXCLUSION = "Verdict cache", "Exclusion cache"
+CACHES = (VERDICT, EXCLUSION)
+ENCODING = "utf-8"
+# Rows of the over-time table, neighbouring minutes are merged beyond that
+TIME_ROWS = 48
+TOP_PROCESSES = 10
+TOP_FOLDERS = 15
+# Folders with fewer lookups are too small to judge their hit rate
+MIN_FOLDER_LOOKUPS = 20
+
+
+def hit_rate(hits, lookups):
+    return round(100 * hits / lookups, 2) if lookups else 0
+
+
+class CacheAnalyzer(Analyzer):
+    name = "Cache Hit Ratios"
+    markers = (
+        b"Cache::Get: age",
+        b"Cache::Get: no entry",
+        b"Exclusion::IsExcluded: result: ",
+    )
+
+    def __init__(self):
+        # Lookups and hits keyed by cache, then (cache, minute), (cache,
+        # process) and (cache, folder)
+        self.lookups = Counter()
+        self.hits = Counter()
+
+    @staticmethod
+    def extract(line):
+        reg = VERDICT_REGEX.search(line)
+        if reg is not None:
+            return VERDICT, reg[1] == b"age", None
+        reg = EXCLUSION_REGEX.search(line)
+        if reg is not None:
+            return EXCLUSION, reg[1] is not None, reg[2].decode(ENCODING, "ignore")
+        return None
+
+    def consume(self, ticks, timestamp, thread, holder, fields):
+        cache, hit, file_path = fields
+        process = None
+        if holder is not None:
+            process = holder[1]
+            if file_path is None:
+                file_path = holder[0]
+        keys = [cache, (cache, "minute", timestamp[:-3])]
+        if process is not None:
+            keys.append((cache, "process", process))
+        if file_path is not None:
+            keys.append((cache, "folder", file_path.rpartition("\\")[0]))
+        for key in keys:
+            key = self.capped_key(key)
+            self.lookups[key] += 1
+            if hit:
+                self.hits[key] += 1
+
+    # Process and folder keys past the cap are counted under the cache's
+    # OTHER row, caches and minutes are few and always kept
+    def capped_key(self, key):
+        if isinstance(key, tuple) and key[1] != "minute":
+            return self.capped(self.lookups, key, (key[0], key[1], OTHER))
+        return key
+
+    def merge(self, other):
+        for key, lookups in other.lookups.items():
+            capped = self.capped_key(key)
+            self.lookups[capped] += lookups
+            if key in other.hits:
+                self.hits[capped] += other.hits[key]
+
+    # {name: lookups} of one cache's minutes, processes or folders
+    def grouped(self, cache, kind):
+        return Counter(
+            {
+                key[2]: lookups
+                for key, lookups in self.lookups.items()
+                if isinstance(key, tuple) and key[:2] == (cache, kind)
+            }
+        )
+
+    def ratio_row(self, cache, kind, name, lookups):
+        hits = self.hits[(cache, kind, name)]
+        return name, lookups, lookups - hits, hit_rate(hits, lookups)
+
+    def over_time(self):
+        minutes = sorted(
+            {
+                key[2]
+                for key in self.lookups
+                if isinstance(key, tuple) and key[1] == "minute"
+            },
+            key=minute_key,
+        )
+        rows = []
+        for label, group in minute_groups(minutes, TIME_ROWS):
+            row = [label]
+            for cache in CACHES:
+                lookups = sum(self.lookups[(cache, "minute", m)] for m in group)
+                hits = sum(self.hits[(cache, "minute", m)] for m in group)
+                row += [lookups, hit_rate(hits, lookups)]
+            rows.append(row)
+        return rows
+
+    def sections(self):
+        if not any(self.lookups[cache] for cache in CACHES):
+            return []
+        totals = [
+            (
+                cache,
+                self.lookups[cache],
+                self.hits[cache],
+                self.lookups[cache] - self.hits[cache],
+                hit_rate(self.hits[cache], self.lookups[cache]),
+            )
+            for cache in CACHES
+        ]
+        sections = [
+            (
+                "Cache Hit Ratios",
+                ("Cache", "Lookups", "Hits", "Misses", "Hit %"),
+                totals,
+            ),
+            (
+                "Cache Hit Ratios over Time",
+                (
+                    "Minute",
+                    "Verdict lookups",
+                    "Verdict hit %",
+                    "Exclusion lookups",
+                    "Exclusion hit %",
+                ),
+                self.over_time(),
+            ),
+        ]
+        for cache in CACHES:
+            processes = self.grouped(cache, "process")
+            sections.append(
+                (
+                    f"{cache} Hit Ratio by Process",
+                    ("Process", "Lookups", "Misses", "Hit %"),
+                    [
+                        self.ratio_row(cache, "process", name, lookups)
+                        for name, lookups in processes.most_common(TOP_PROCESSES)
+                    ],
+                )
+            )
+            # Worst hit rate first, then most misses
+            folders = [
+                self.ratio_row(cache, "folder", name, lookups)
+                for name, lookups in self.grouped(cache, "folder").items()
+                if lookups >= MIN_FOLDER_LOOKUPS
+            ]
+            folders.sort(key=lambda row: (row[3], -row[2]))
+            sections.append(
+                (
+                    f"{cache} Poor Hit Rate Folders",
+                    ("Folder", "Lookups", "Misses", "Hit %"),
+                    folders[:TOP_FOLDERS],
+                )
+            )
+        return sections
@@ -0,0 +1,191 @@
+import re
+from collections import Counter
+
+from analyzers import OTHER, Analyzer, Durations, histogram_rows
+
+"""
+Cloud lookup latency.
+
+A lookup and its outcome are logged by the same thread:
+    Query::LookupExecute: attempting lookup with cloud
+    Query::LookupExecute: cloud lookup complete, disposition: 1
+    Query::LookupExecute: cloud lookup timed out
+Latency runs from the attempt to the outcome, in log ticks (ms).  Each lookup
+is charged to the file and process of the thread's last HandleCreation, which
+is the scan that needed the cloud verdict.
+"""
+
+
+LOOKUP_REGEX = re.compile(
+    rb"Query::LookupExecute: (?:(attempting lookup with cloud)|cloud lookup (complete|timed out))"
+)
+ATTEMPT, COMPLETE, TIMED_OUT = 0, 1, 2
+OUTCOMES = {b"complete": COMPLETE, b"timed out": TIMED_OUT}
+TOP_MINUTES = 10
+TOP_CALLERS = 10
+
+
+class CloudLookupAnalyzer(Analyzer):
+    name = "Cloud Lookups"
+    markers = (b"Query::LookupExecute: ",)
+
+    def __init__(self):
+        # thread -> (ticks, minute, holder) of its lookup in flight
+        self.pending = {}
+        self.latencies = Durations()
+        self.timeouts = Durations()
+        self.outcomes = Counter()
+        # Per minute of the attempt ("Jan 22 08:01"): lookups, timeouts, and
+        # total latency of the lookups with an outcome
+        self.minute_lookups = Counter()
+        self.minute_timeouts = Counter()
+        self.minute_outcomes = Counter()
+        self.minute_latency = Counter()
+        self.process_lookups = Counter()
+        self.process_latency = Counter()
+        self.file_lookups = Counter()
+        self.file_latency = Counter()
+
+    @staticmethod
+    def extract(line):
+        reg = LOOKUP_REGEX.search(line)
+        if reg is None:
+            return None
+        return ATTEMPT if reg[1] else OUTCOMES[reg[2]]
+
+    def consume(self, ticks, timestamp, thread, holder, action):
+        if action == ATTEMPT:
+            if thread in self.pending:
+                self.outcomes["no outcome logged"] += 1
+            minute = timestamp[:-3]
+            self.minute_lookups[minute] += 1
+            if holder is not None:
+                # Within the cap, the outcome's latency goes to the same rows
+                holder = (
+                    self.capped(self.file_lookups, holder[0], OTHER),
+                    self.capped(self.process_lookups, holder[1], OTHER),
+                )
+                self.file_lookups[holder[0]] += 1
+                self.process_lookups[holder[1]] += 1
+            self.pending[thread] = (ticks, minute, holder)
+            return
+        attempt = self.pending.pop(thread, None)
+        if attempt is None:
+            self.outcomes["outcome without a lookup"] += 1
+            return
+        started, minute, holder = attempt
+        latency = ticks - started
+        if action == TIMED_OUT:
+            self.outcomes["timed out"] += 1
+            self.timeouts[latency] += 1
+            self.minute_timeouts[minute] += 1
+        else:
+            self.outcomes["answered"] += 1
+            self.latencies[latency] += 1
+        self.minute_outcomes[minute] += 1
+        self.minute_latency[minute] += latency
+        if holder is not None:
+            self.file_latency[holder[0]] += latency
+            self.process_latency[holder[1]] += latency
+
+    def end_source(self):
+        self.outcomes["no outcome logged"] += len(self.pending)
+        self.pending = {}
+
+    def merge(self, other):
+        for name in (
+            "latencies",
+            "timeouts",
+            "outcomes",
+            "minute_lookups",
+            "minute_timeouts",
+            "minute_outcomes",
+            "minute_latency",
+        ):
+            getattr(self, name).update(getattr(other, name))
+        for lookups, latency, partial, partial_latency in (
+            (
+                self.process_lookups,
+                self.process_latency,
+                other.process_lookups,
+                other.process_latency,
+            ),
+            (
+                self.file_lookups,
+                self.file_latency,
+                other.file_lookups,
+                other.file_latency,
+            ),
+        ):
+            for name, count in partial.items():
+                key = self.capped(lookups, name, OTHER)
+                lookups[key] += count
+                latency[key] += partial_latency[name]
+
+    # Callers with the most round trips, with the time they spent waiting
+    def callers(self, lookups, latency):
+        return [
+            (name, count, latency[name], round(latency[name] / count, 1))
+            for name, count in lookups.most_common(TOP_CALLERS)
+        ]
+
+    def sections(self):
+        lookups = sum(self.minute_lookups.values())
+        if not lookups:
+            return []
+        answered, timeouts = self.latencies.summary(), self.timeouts.summary()
+        outcomes = [
+            ("lookups", lookups),
+            *sorted((label, n) for label, n in self.outcomes.items() if n),
+            ("timeout share %", round(100 * timeouts["count"] / lookups, 2)),
+            ("minutes with lookups", len(self.minute_lookups)),
+            ("lookups per minute, mean", round(lookups / len(self.minute_lookups), 1)),
+            ("lookups per minute, peak", max(self.minute_lookups.values())),
+        ]
+        latency = [
+            (label, answered[key])
+            for label, key in (
+                ("mean", "mean"),
+                ("median", "p50"),
+                ("90th percentile", "p90"),
+                ("99th percentile", "p99"),
+                ("longest", "max"),
+            )
+        ]
+        latency.append(("time to time out, median", timeouts["p50"]))
+        minutes = [
+            (
+                minute,
+                count,
+                self.minute_timeouts[minute],
+                round(
+                    self.minute_latency[minute] / max(self.minute_outcomes[minute], 1),
+                    1,
+                ),
+            )
+            for minute, count in self.minute_lookups.most_common(TOP_MINUTES)
+        ]
+        return [
+            ("Cloud Lookup Outcomes", ("", "Lookups"), outcomes),
+            ("Cloud Lookup Latency (ms)", ("", "Answered"), latency),
+            (
+                "Cloud Lookup Latency Distribution",
+                ("Latency", "Answered", "Timed out"),
+                histogram_rows(self.latencies, self.timeouts),
+            ),
+            (
+                "Cloud Lookup Busiest Minutes",
+                ("Minute", "Lookups", "Timed out", "Mean latency ms"),
+                minutes,
+            ),
+            (
+                "Cloud Lookups by Process",
+                ("Process", "Lookups", "Total latency ms", "Mean latency ms"),
+                self.callers(self.process_lookups, self.process_latency),
+            ),
+            (
+                "Cloud Lookups by File",
+                ("File", "Lookups", "Total latency ms", "Mean latency ms"),
+                self.callers(self.file_lookups, self.file_latency),
+            ),
+        ]
@@ -0,0 +1,330 @@
+import csv
+import os
+import re
+from collections import Counter
+
+from analyzers import Analyzer, minute_groups, parse_header
+from html_report import minute_key
+
+r"""
+Malicious dispositions and quarantines, in log order.
+
+    TetraEngineInterface::ScanFile: \\?\C:\... disp 3, detection: W32.Auto
+    EventMgr::Publish: publishing type=553648143, \\?\C:\...
+
+Each detection keeps its time, ticks and thread, which locate its line in the
+logs, with the file (on the line, or that of the thread's last
+HandleCreation), process and engine that produced it.  The engine is the
+component logging the disposition; a quarantine is credited to the engine of
+the thread's last malicious disposition.  All detections are written to
+-detections.csv, the index the results window uses to show the log lines
+around one.  With the policy.xml, detected files that an exclusion covers are
+listed: an exclusion there hides real detections.
+"""
+
+
+DISPOSITION_REGEX = re.compile(rb"\bdisp 3\b")
+QUARANTINE_REGEX = re.compile(rb"publishing type=553648143\b")
+PATH_REGEX = re.compile(rb"(\\\\\?\\[^,\r\n]+?)(?: disp \d|,|\r?\n|$)")
+DETECTION_NAME_REGEX = re.compile(rb"detection(?: name)?: ([^,\r\n]+)")
+COMPONENT_REGEX = re.compile(rb"\]: (\w+)::")
+MALICIOUS, QUARANTINED = "Malicious", "Quarantined"
+# Components logging dispositions, by the start of their name
+ENGINE_COMPONENTS = (
+    ("tetra", "Tetra"),
+    ("ethos", "ETHOS"),
+    ("spero", "SPERO"),
+    ("query", "Cloud"),
+    ("cloud", "Cloud"),
+)
+ENCODING = "utf-8"
+UNKNOWN = "(unknown)"
+TIME_ROWS = 48
+TOP_ROWS = 10
+# Detections listed in the summary, all of them go to the CSV
+LISTED_DETECTIONS = 50
+# Detections kept for the list and the CSV, the counts go on past it
+MAX_DETECTIONS = 100000
+CSV_NAME = "-detections.csv"
+CSV_HEADINGS = [
+    "time",
+    "ticks",
+    "thread",
+    "kind",
+    "engine",
+    "file",
+    "process",
+    "detection",
+    "excluded_by",
+]
+
+
+def get_engine(component):
+    if component is None:
+        return UNKNOWN
+    name = component.decode("ascii").lower()
+    for prefix, engine in ENGINE_COMPONENTS:
+        if name.startswith(prefix):
+            return engine
+    return component.decode("ascii")
+
+
+# Detections in log order.  Logs are not always read oldest first, ticks
+# order lines within a boot.
+def detection_key(detection):
+    return minute_key(detection[0]), detection[1]
+
+
+class DetectionAnalyzer(Analyzer):
+    name = "Detections"
+    markers = (b"disp 3", b"publishing type=553648143")
+
+    def __init__(self):
+        # (timestamp, ticks, thread, kind, engine, file, process, detection)
+        self.detections = []
+        self.dropped = 0
+        self.kinds = Counter()
+        # Per (kind, minute), (kind, engine), (kind, process), (kind, file)
+        self.counts = Counter()
+        # thread -> engine of its last malicious disposition
+        self.engines = {}
+        self.policy = None
+
+    @staticmethod
+    def extract(line):
+        if DISPOSITION_REGEX.search(line):
+            kind = MALICIOUS
+        elif QUARANTINE_REGEX.search(line):
+            kind = QUARANTINED
+        else:
+            return None
+        reg = PATH_REGEX.search(line)
+        file_path = reg and reg[1].decode(ENCODING, "ignore").rstrip()
+        reg = DETECTION_NAME_REGEX.search(line)
+        name = reg and reg[1].decode(ENCODING, "ignore").rstrip()
+        reg = COMPONENT_REGEX.search(line)
+        return kind, file_path, get_engine(reg and reg[1]), name
+
+    def consume(self, ticks, timestamp, thread, holder, fields):
+        kind, file_path, engine, name = fields
+        process = UNKNOWN
+        if holder is not None:
+            process = holder[1]
+            file_path = file_path or holder[0]
+        file_path = file_path or UNKNOWN
+        if kind == MALICIOUS:
+            self.engines[thread] = engine
+        else:
+            engine = self.engines.get(thread, UNKNOWN)
+        self.kinds[kind] += 1
+        for key in (
+            ("minute", timestamp[:-3]),
+            ("engine", engine),
+            ("process", process),
+            ("file", file_path),
+        ):
+            self.counts[(kind, *key)] += 1
+        if len(self.detections) < MAX_DETECTIONS:
+            self.detections.append(
+                (timestamp, ticks, thread, kind, engine, file_path, process, name)
+            )
+        else:
+            self.dropped += 1
+
+    def end_source(self):
+        self.engines = {}
+
+    def merge(self, other):
+        room = MAX_DETECTIONS - len(self.detections)
+        self.detections += other.detections[:room]
+        self.dropped += other.dropped + max(len(other.detections) - room, 0)
+        self.kinds.update(other.kinds)
+        self.counts.update(other.counts)
+
+    def configure(self, settings):
+        self.policy = settings.get("policy")
+
+    # The policy exclusion covering a detected file, or ""
+    def excluded_by(self, file_path, process, matches):
+        if self.policy is None or file_path == UNKNOWN:
+            return ""
+        key = (file_path, process)
+        if key not in matches:
+            index = self.policy.match(
+                file_path, None if process == UNKNOWN else process
+            )
+            matches[key] = "" if index is None else self.policy.exclusions[index][0]
+        return matches[key]
+
+    # [(name, malicious, quarantined)] of one kind of key, most first
+    def grouped(self, group):
+        names = {key[2] for key in self.counts if key[1] == group}
+        rows = [
+            (
+                name,
+                self.counts[(MALICIOUS, group, name)],
+                self.counts[(QUARANTINED, group, name)],
+            )
+            for name in names
+        ]
+        rows.sort(key=lambda row: (-row[1] - row[2], row[0]))
+        return rows
+
+    def timeline(self):
+        minutes = sorted(
+            {key[2] for key in self.counts if key[1] == "minute"}, key=minute_key
+        )
+        return [
+            (
+                label,
+                sum(self.counts[(MALICIOUS, "minute", m)] for m in group),
+                sum(self.counts[(QUARANTINED, "minute", m)] for m in group),
+            )
+            for label, group in minute_groups(minutes, TIME_ROWS)
+        ]
+
+    def sections(self):
+        if not self.kinds:
+            return []
+        detections = sorted(self.detections, key=detection_key)
+        matches = {}
+        listed = [
+            (
+                timestamp,
+                ticks,
+                thread,
+                kind,
+                engine,
+                file_path,
+                process,
+                self.excluded_by(file_path, process, matches),
+            )
+            for timestamp, ticks, thread, kind, engine, file_path, process, _ in (
+                detections[:LISTED_DETECTIONS]
+            )
+        ]
+        totals = [
+            ("malicious dispositions", self.kinds[MALICIOUS]),
+            ("quarantines", self.kinds[QUARANTINED]),
+            ("files", len({key[2] for key in self.counts if key[1] == "file"})),
+            ("first", detections[0][0] if detections else ""),
+            ("last", detections[-1][0] if detections else ""),
+        ]
+        if self.dropped:
+            totals.append(("not kept for the list and -detections.csv", self.dropped))
+        headings = ("Malicious", "Quarantined")
+        sections = [
+            ("Detections", ("", "Count"), totals),
+            ("Detections by Engine", ("Engine", *headings), self.grouped("engine")),
+            (
+                "Detections by Process",
+                ("Process", *headings),
+                self.grouped("process")[:TOP_ROWS],
+            ),
+            ("Detection Timeline", ("Minute", *headings), self.timeline()),
+            (
+                "Detection List",
+                (
+                    "Time",
+                    "Ticks",
+                    "Thread",
+                    "Kind",
+                    "Engine",
+                    "File",
+                    "Process",
+                    "Excluded by",
+                ),
+                listed,
+            ),
+        ]
+        if self.policy is not None:
+            # Every detected file the policy would now exclude
+            covered = Counter()
+            for detection in detections:
+                file_path, process = detection[5], detection[6]
+                exclusion = self.excluded_by(file_path, process, matches)
+                if exclusion:
+                    covered[(file_path, exclusion)] += 1
+            sections.append(
+                (
+                    "Detected Files Covered by Exclusions",
+                    ("File", "Exclusion", "Detections"),
+                    [
+                        (file_path, exclusion, count)
+                        for (file_path, exclusion), count in sorted(
+                            covered.items(), key=lambda item: (-item[1], item[0])
+                        )
+                    ],
+                )
+            )
+        return sections
+
+    def export(self, results_dir):
+        if not self.detections:
+            return
+        matches = {}
+        with open(
+            os.path.join(results_dir, CSV_NAME), "w", newline="", encoding="utf-8-sig"
+        ) as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_HEADINGS)
+            for detection in sorted(self.detections, key=detection_key):
+                file_path, process = detection[5], detection[6]
+                writer.writerow(
+                    [
+                        *(detection[:7]),
+                        detection[7] or "",
+                        self.excluded_by(file_path, process, matches),
+                    ]
+                )
+
+
+def read_detections(results_dir):
+    path = os.path.join(results_dir, CSV_NAME)
+    if not os.path.isfile(path):
+        return []
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return list(csv.DictReader(f))
+
+
+# The lines around the one logged at ticks by thread, searched in log
+# streams yielded as (name, stream), or None.  A line is found by its
+# "(ticks," header, checked against the thread.
+def find_log_window(streams, ticks, thread, context=20):
+    needle = b"(%d," % ticks
+    for name, stream in streams:
+        before = []
+        rest = b""
+        while True:
+            data = stream.read(4 * 2**20)
+            if not data:
+                break
+            lines = (rest + data).split(b"\n")
+            rest = lines.pop()
+            for position, line in enumerate(lines):
+                if not line.startswith(needle):
+                    continue
+                header = parse_header(line)
+                if header[2] is not None and header[2] != thread:
+                    continue
+                after = lines[position + 1 : position + 1 + context]
+                while len(after) < context:
+                    data = stream.read(2**20)
+                    if not data:
+                        break
+                    more = (rest + data).split(b"\n")
+                    rest = more.pop()
+                    after += more[: context - len(after)]
+                window = (
+                    before[-context:] + lines[max(position - context, 0) : position]
+                )
+                return {
+                    "log": name,
+                    "lines": [
+                        l.decode(ENCODING, "replace").rstrip("\r")
+                        for l in (*window[-context:], line, *after)
+                    ],
+                    "line": min(len(window), context),
+                }
+            before = (before + lines)[-context:]
+    return None
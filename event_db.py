@@ -0,0 +1,292 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from event_store import KIND_NAMES, MONTHS
+
+"""
+SQLite index of the parsed events, for ad-hoc questions without re-parsing.
+
+    python event_db.py results/<run>/-events.db --process powershell
+        --folder C:\\ProgramData --from 10:00 --to 10:05 --by file
+
+Built from the event store after a run with --event-db.  Paths, folders and
+processes are interned in their own tables, events keep their time as
+seconds since 1970 (wall clock, the logs carry no time zone) with ids into
+those tables, and are indexed by time, process and path.  The run's summary
+counters and analyzer tables are stored next to them.  Filters select ids
+from the small tables first, so a question over millions of events takes
+milliseconds to a few seconds.  --sql runs any SELECT.
+"""
+
+
+DB_NAME = "-events.db"
+EPOCH = datetime(1970, 1, 1)
+DAY = 24 * 60 * 60
+INSERT_BATCH = 100000
+# What --by groups on: the column shown and the expression grouped by
+GROUPS = {
+    "process": "processes.name",
+    "file": "paths.path",
+    "folder": "folders.name",
+    "extension": "paths.extension",
+    "minute": "datetime(events.time - events.time % 60, 'unixepoch')",
+}
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE processes (id INTEGER PRIMARY KEY, name TEXT);
+CREATE TABLE folders (id INTEGER PRIMARY KEY, name TEXT);
+CREATE TABLE paths (
+    id INTEGER PRIMARY KEY, path TEXT, folder_id INTEGER, extension TEXT
+);
+CREATE TABLE events (
+    time INTEGER, path_id INTEGER, process_id INTEGER, kind INTEGER
+);
+CREATE TABLE kinds (id INTEGER PRIMARY KEY, name TEXT);
+CREATE TABLE counts (counter TEXT, name TEXT, count INTEGER);
+CREATE TABLE sections (
+    analyzer TEXT, title TEXT, headings TEXT, position INTEGER, cells TEXT
+);
+"""
+INDEXES = """
+CREATE INDEX events_time ON events (time);
+CREATE INDEX events_process ON events (process_id, time);
+CREATE INDEX events_path ON events (path_id, time);
+CREATE INDEX counts_counter ON counts (counter, count);
+"""
+
+
+def to_epoch(moment):
+    return int((moment - EPOCH).total_seconds())
+
+
+# Writes the events of an EventStore, and the summary counters and analyzer
+# sections of the run's aggregates, to a new database
+def write_event_db(store, aggregates, file_name):
+    if os.path.exists(file_name):
+        os.remove(file_name)
+    connection = sqlite3.connect(file_name)
+    try:
+        # A fresh file that is rebuilt from scratch if anything goes wrong
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.executescript(SCHEMA)
+        folders, extensions, path_folders, path_extensions = store.derived()
+        connection.executemany(
+            "INSERT INTO processes VALUES (?, ?)", enumerate(store.processes.strings)
+        )
+        connection.executemany(
+            "INSERT INTO folders VALUES (?, ?)", enumerate(folders.strings)
+        )
+        connection.executemany(
+            "INSERT INTO paths VALUES (?, ?, ?, ?)",
+            (
+                (index, path, folder, extensions[extension].lower())
+                for index, (path, folder, extension) in enumerate(
+                    zip(store.paths.strings, path_folders, path_extensions)
+                )
+            ),
+        )
+        connection.executemany("INSERT INTO kinds VALUES (?, ?)", KIND_NAMES.items())
+        base = to_epoch(store.base) if store.base else 0
+        events = zip(store.times, store.path_ids, store.process_ids, store.kinds)
+        batch = []
+        for seconds, path_id, process_id, kind in events:
+            batch.append((base + seconds, path_id, process_id, kind))
+            if len(batch) == INSERT_BATCH:
+                connection.executemany("INSERT INTO events VALUES (?, ?, ?, ?)", batch)
+                batch = []
+        connection.executemany("INSERT INTO events VALUES (?, ?, ?, ?)", batch)
+        for counter in ("processes", "files", "extensions", "paths", "engines"):
+            connection.executemany(
+                "INSERT INTO counts VALUES (?, ?, ?)",
+                ((counter, name, count) for name, count in aggregates[counter].items()),
+            )
+        connection.executemany(
+            "INSERT INTO sections VALUES (?, ?, ?, ?, ?)",
+            (
+                (
+                    name,
+                    title,
+                    json.dumps(headings),
+                    position,
+                    json.dumps(row, default=str),
+                )
+                for name, sections in aggregates["analysis"].sections()
+                for title, headings, rows in sections
+                for position, row in enumerate(rows)
+            ),
+        )
+        first = min(store.times, default=None)
+        meta = {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "events": len(store),
+            "year": (
+                store.to_datetime(first).year if first is not None else store.year
+            ),
+        }
+        connection.executemany("INSERT INTO meta VALUES (?, ?)", meta.items())
+        connection.executescript(INDEXES)
+        connection.commit()
+    finally:
+        connection.close()
+    return file_name
+
+
+# "10:00", "Jan 22 10:00:05" or "2025-01-22 10:00" -> ("day", seconds into
+# the day) for a time of day on any date, or ("moment", epoch seconds)
+def parse_time(value, year, end=False):
+    value = value.strip()
+    reg = re.fullmatch(r"(\d{1,2}):(\d\d)(?::(\d\d))?", value)
+    if reg:
+        second = int(reg[3]) if reg[3] else (59 if end else 0)
+        return "day", int(reg[1]) * 3600 + int(reg[2]) * 60 + second
+    reg = re.fullmatch(r"(\w{3}) +(\d{1,2}) (\d{1,2}):(\d\d)(?::(\d\d))?", value)
+    if reg and reg[1] in MONTHS:
+        moment = datetime(year, MONTHS[reg[1]], int(reg[2]), int(reg[3]), int(reg[4]))
+    else:
+        reg = re.fullmatch(
+            r"(\d{4})-(\d\d)-(\d\d)[ T](\d{1,2}):(\d\d)(?::(\d\d))?", value
+        )
+        if not reg:
+            raise ValueError(f"Unrecognised time: {value}")
+        moment = datetime(*(int(part) for part in reg.groups()[:5]))
+    second = reg.groups()[-1]
+    if second:
+        moment += timedelta(seconds=int(second))
+    elif end:
+        moment += timedelta(seconds=59)
+    return "moment", to_epoch(moment)
+
+
+# (column headings, rows) of the events matching the filters, counted per
+# GROUPS entry, most first.  process is a case-insensitive part of the
+# process, folder the start of the path (with or without \\?\).
+def query_events(
+    connection, process=None, folder=None, start=None, end=None, by="process", top=20
+):
+    year = int(
+        connection.execute("SELECT value FROM meta WHERE key = 'year'").fetchone()[0]
+    )
+    where, parameters = [], []
+    if process:
+        where.append(
+            "events.process_id IN (SELECT id FROM processes WHERE name LIKE ? ESCAPE '!')"
+        )
+        parameters.append(f"%{like_escape(process)}%")
+    if folder:
+        where.append(
+            "events.path_id IN (SELECT id FROM paths"
+            " WHERE path LIKE ? ESCAPE '!' OR path LIKE ? ESCAPE '!')"
+        )
+        parameters += [f"{like_escape(folder)}%", f"\\\\?\\{like_escape(folder)}%"]
+    bounds = [
+        (*parse_time(value, year, is_end), operator)
+        for value, operator, is_end in ((start, ">=", False), (end, "<=", True))
+        if value
+    ]
+    if len(bounds) == 2 and bounds[0][0] == bounds[1][0] == "day":
+        if bounds[0][1] > bounds[1][1]:
+            # A time of day range such as 23:55 to 00:05 wraps midnight
+            where.append(f"(events.time % {DAY} >= ? OR events.time % {DAY} <= ?)")
+            parameters += [bounds[0][1], bounds[1][1]]
+            bounds = []
+    for kind, seconds, operator in bounds:
+        if kind == "day":
+            where.append(f"events.time % {DAY} {operator} ?")
+        else:
+            where.append(f"events.time {operator} ?")
+        parameters.append(seconds)
+    group = GROUPS[by]
+    sql = (
+        f"SELECT {group}, COUNT(*) AS scans FROM events"
+        " JOIN processes ON processes.id = events.process_id"
+        " JOIN paths ON paths.id = events.path_id"
+        " JOIN folders ON folders.id = paths.folder_id"
+        + (" WHERE " + " AND ".join(where) if where else "")
+        + f" GROUP BY {group} ORDER BY scans DESC, {group} LIMIT ?"
+    )
+    rows = connection.execute(sql, (*parameters, top)).fetchall()
+    return (by.capitalize(), "Scans"), rows
+
+
+def like_escape(text):
+    return text.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+
+
+# (column headings, rows) of a read-only SQL statement
+def run_sql(connection, sql):
+    cursor = connection.execute(sql)
+    headings = tuple(column[0] for column in cursor.description or ())
+    return headings, cursor.fetchall()
+
+
+# The database, opened read-only so ad-hoc SQL cannot change it.  The path
+# becomes a file: URI, which escapes characters such as "?" and "#" and makes
+# Windows paths absolute.
+def open_event_db(file_name):
+    if not os.path.isfile(file_name):
+        raise FileNotFoundError(file_name)
+    return sqlite3.connect(Path(file_name).resolve().as_uri() + "?mode=ro", uri=True)
+
+
+def format_table(headings, rows):
+    table = [[str(cell) for cell in headings]]
+    table += [[str(cell) for cell in row] for row in rows]
+    widths = [max(len(row[i]) for row in table) for i in range(len(headings))]
+    return "\n".join(
+        "  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip()
+        for row in table
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query an -events.db index")
+    parser.add_argument("database", help="-events.db written with --event-db")
+    parser.add_argument("--process", help="Part of the process path")
+    parser.add_argument("--folder", help="Start of the file path, e.g. C:\\ProgramData")
+    parser.add_argument(
+        "--from",
+        dest="start",
+        help='From a time of day ("10:00") or a moment ("Jan 22 10:00:00")',
+    )
+    parser.add_argument(
+        "--to",
+        dest="end",
+        help="Up to, like --from.  Times of day before --from wrap past midnight",
+    )
+    parser.add_argument("--by", choices=list(GROUPS), default="process")
+    parser.add_argument("--top", type=int, default=20, help="Rows to print")
+    parser.add_argument("--sql", help="Run this SELECT instead of the filters")
+    args = parser.parse_args()
+
+    connection = open_event_db(args.database)
+    started = time.perf_counter()
+    try:
+        if args.sql:
+            headings, rows = run_sql(connection, args.sql)
+        else:
+            headings, rows = query_events(
+                connection,
+                args.process,
+                args.folder,
+                args.start,
+                args.end,
+                args.by,
+                args.top,
+            )
+    except (sqlite3.Error, ValueError) as e:
+        exit(f"Error: {e}")
+    finally:
+        connection.close()
+    print(format_table(headings, rows))
+    print(f"\n{len(rows)} rows in {1000 * (time.perf_counter() - started):.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+import json
+import struct
+from array import array
+from calendar import monthrange
+from collections import Counter
+from datetime import datetime, timedelta
+from itertools import compress
+
+try:
+    import numpy
+except ImportError:  # Optional, the array/Counter fallback gives the same results
+    numpy = None
+
+"""
+Columnar store of parsed events.
+
+Each event is four fixed-width columns: seconds since the store's base (uint32),
+path id (uint32), process id (uint32) and event kind (uint8).  Paths and
+processes are interned once in string tables, so 40M events take roughly
+500 MB instead of several GB of strings, and any slice (time window, process,
+folder) can be re-aggregated without re-parsing the logs.
+
+NumPy is an optional dependency and is not in requirements.txt.  When it is
+installed the counting uses it, otherwise array and Counter give the same
+results more slowly.
+"""
+
+
+KIND_HANDLE_CREATION = 0
+KIND_NAMES = {KIND_HANDLE_CREATION: "HandleCreation"}
+
+MONTHS = {
+    month: index
+    for index, month in enumerate(
+        "Jan Feb Mar Apr May Jun Jul Aug Sep Oct Nov Dec".split(), start=1
+    )
+}
+STORE_VERSION = 1
+HALF_YEAR = timedelta(days=183)
+
+
+class StringTable:
+    def __init__(self, strings=()):
+        self.strings = list(strings)
+        self.ids = {string: index for index, string in enumerate(self.strings)}
+
+    def __len__(self):
+        return len(self.strings)
+
+    def __getitem__(self, index):
+        return self.strings[index]
+
+    def intern(self, string):
+        index = self.ids.get(string)
+        if index is None:
+            index = self.ids[string] = len(self.strings)
+            self.strings.append(string)
+        return index
+
+
+class EventStore:
+    # latest is when the logs were collected (the archive's time), no event
+    # is dated after it.  A year given instead is used for the first event.
+    def __init__(self, year=None, latest=None):
+        if year is None and latest is None:
+            latest = datetime.now()
+        self.latest = latest
+        self.year = year or latest.year
+        self.base = None
+        self.times = array("I")
+        self.path_ids = array("I")
+        self.process_ids = array("I")
+        self.kinds = array("B")
+        self.paths = StringTable()
+        self.processes = StringTable()
+        self._seconds = {}
+        self._derived = None
+
+    def __len__(self):
+        return len(self.times)
+
+    # "Jan 22 00:00:01" -> datetime.  Logs carry no year: the first event
+    # stored gets the last year that does not put it after latest, the others
+    # the year that puts them within half a year of it.
+    def to_moment(self, timestamp):
+        month, day, clock = timestamp.split()
+        fields = (MONTHS[month], int(day), *map(int, clock.split(":")))
+        if self.base is not None:
+            reference = self.base + HALF_YEAR
+            years = range(reference.year - 4, reference.year + 5)
+            moments = self.candidates(fields, years)
+            return min(moments, key=lambda moment: abs(moment - reference))
+        if self.latest is None:
+            return next(self.candidates(fields, range(self.year, self.year - 8, -1)))
+        # A day of slack for the clocks of the logs and the archive
+        limit = self.latest + timedelta(days=1)
+        years = range(limit.year, limit.year - 8, -1)
+        return next(m for m in self.candidates(fields, years) if m <= limit)
+
+    # The moments of the fields in those of years where the date exists, so
+    # Feb 29 only lands in leap years.  Days past the end of their month in
+    # any year (corrupt lines) are moved back to it.
+    @staticmethod
+    def candidates(fields, years):
+        month, day, *clock = fields
+        day = min(max(day, 1), 29 if month == 2 else monthrange(2001, month)[1])
+        for year in years:
+            if day <= monthrange(year, month)[1]:
+                yield datetime(year, month, day, *clock)
+
+    # Seconds since the store's base, which sits half a year before the first
+    # event so that rotated logs read newest-first still land at positive
+    # offsets.  The base is on a whole minute so times // 60 are wall minutes.
+    def to_seconds(self, timestamp):
+        seconds = self._seconds.get(timestamp)
+        if seconds is None:
+            moment = self.to_moment(timestamp)
+            if self.base is None:
+                self.base = (moment - HALF_YEAR).replace(second=0)
+            seconds = int((moment - self.base).total_seconds())
+            self._seconds[timestamp] = seconds
+        return seconds
+
+    def to_datetime(self, seconds):
+        return self.base + timedelta(seconds=seconds)
+
+    def add(self, timestamp, file_path, process, kind=KIND_HANDLE_CREATION):
+        self.times.append(self.to_seconds(timestamp))
+        self.path_ids.append(self.paths.intern(file_path))
+        self.process_ids.append(self.processes.intern(process))
+        self.kinds.append(kind)
+        self._derived = None
+
+    # Folder and extension ids per path id, computed once per store
+    def derived(self):
+        if self._derived is None:
+            folders, extensions = StringTable(), StringTable()
+            path_folders, path_extensions = array("I"), array("I")
+            for path in self.paths.strings:
+                folder, _, file_name = path.rpartition("\\")
+                path_folders.append(folders.intern(folder))
+                # Files without an extension are grouped under ""
+                extension = file_name.split(".")[-1] if "." in file_name else ""
+                path_extensions.append(extensions.intern(extension))
+            self._derived = (folders, extensions, path_folders, path_extensions)
+        return self._derived
+
+    def column(self, name):
+        values = getattr(self, name)
+        if numpy is not None:
+            return numpy.frombuffer(values, dtype=numpy.dtype(values.typecode))
+        return values
+
+    # A selection is a boolean mask over the events (None means everything)
+    def select(self, start=None, end=None, process=None, folder=None, kind=None):
+        masks = []
+        if start is not None or end is not None:
+            low = self.to_offset(start, 0)
+            high = self.to_offset(end, 2**32 - 1)
+            if numpy is not None:
+                times = self.column("times")
+                masks.append((times >= low) & (times <= high))
+            else:
+                masks.append(bytearray(low <= t <= high for t in self.times))
+        if process:
+            needle = process.lower()
+            ids = {
+                index
+                for index, name in enumerate(self.processes.strings)
+                if needle in name.lower()
+            }
+            masks.append(self._isin("process_ids", ids))
+        if folder:
+            prefix = folder.lower()
+            ids = {
+                index
+                for index, path in enumerate(self.paths.strings)
+                if path.lower().startswith((prefix, "\\\\?\\" + prefix))
+            }
+            masks.append(self._isin("path_ids", ids))
+        if kind is not None:
+            masks.append(self._isin("kinds", {kind}))
+        if not masks:
+            return None
+        selection = masks[0]
+        for mask in masks[1:]:
+            if numpy is not None:
+                selection = selection & mask
+            else:
+                selection = bytearray(a and b for a, b in zip(selection, mask))
+        return selection
+
+    def to_offset(self, moment, default):
+        if moment is None or self.base is None:
+            return default
+        if isinstance(moment, str):
+            moment = self.to_moment(moment)
+        return max(int((moment - self.base).total_seconds()), 0)
+
+    def _isin(self, name, ids):
+        if numpy is not None:
+            wanted = numpy.fromiter(ids, dtype=numpy.int64, count=len(ids))
+            return numpy.isin(self.column(name), wanted)
+        return bytearray(value in ids for value in getattr(self, name))
+
+    def _values(self, name, selection):
+        if numpy is not None:
+            values = self.column(name)
+            return values if selection is None else values[selection]
+        values = getattr(self, name)
+        return values if selection is None else compress(values, selection)
+
+    # Occurrences per id: a dense NumPy array from bincount, or a Counter
+    def count(self, name, selection=None, size=0):
+        values = self._values(name, selection)
+        if numpy is not None:
+            return numpy.bincount(values, minlength=size)
+        return Counter(values)
+
+    # Rolls per-path counts up to folders or extensions through a path id ->
+    # group id mapping
+    def roll_up(self, path_counts, mapping, size):
+        if numpy is not None:
+            groups = numpy.frombuffer(mapping, dtype=numpy.uint32)
+            return numpy.bincount(groups, weights=path_counts, minlength=size).astype(
+                numpy.int64
+            )
+        counts = Counter()
+        for path_id, hits in path_counts.items():
+            counts[mapping[path_id]] += hits
+        return counts
+
+    @staticmethod
+    def labelled(counts, table):
+        if numpy is not None:
+            ids = numpy.flatnonzero(counts)
+            return Counter(
+                {table[i]: n for i, n in zip(ids.tolist(), counts[ids].tolist())}
+            )
+        return Counter({table[i]: n for i, n in counts.items() if n})
+
+    def counters(self, selection=None):
+        folders, extensions, path_folders, path_extensions = self.derived()
+        path_counts = self.count("path_ids", selection, len(self.paths))
+        extension_counts = self.labelled(
+            self.roll_up(path_counts, path_extensions, len(extensions)), extensions
+        )
+        extension_counts.pop("", None)
+        return {
+            "processes": self.labelled(
+                self.count("process_ids", selection, len(self.processes)),
+                self.processes,
+            ),
+            "files": self.labelled(path_counts, self.paths),
+            "extensions": extension_counts,
+            "paths": self.labelled(
+                self.roll_up(path_counts, path_folders, len(folders)), folders
+            ),
+        }
+
+    # Scans per minute, keyed like the parser's timeline ("Jan 22 00:00")
+    def timeline(self, selection=None):
+        values = self._values("times", selection)
+        if numpy is not None:
+            counts = numpy.bincount(values // 60)
+            ids = numpy.flatnonzero(counts)
+            items = zip(ids.tolist(), counts[ids].tolist())
+        else:
+            items = Counter(t // 60 for t in values).items()
+        minutes = Counter()
+        for minute, hits in items:
+            minutes[self.to_datetime(minute * 60).strftime("%b %d %H:%M")] = hits
+        return minutes
+
+    def summarize(self, selection=None, top=10):
+        counters = self.counters(selection)
+        sizes = {"processes": top, "files": top, "extensions": top, "paths": 100}
+        return {name: counters[name].most_common(sizes[name]) for name in counters}
+
+    # Per-entry change between two selections, largest changes first
+    def diff(self, before, after, dimension="processes", top=10):
+        old = self.counters(before)[dimension]
+        new = self.counters(after)[dimension]
+        rows = [
+            (name, old[name], new[name], new[name] - old[name])
+            for name in old.keys() | new.keys()
+        ]
+        rows.sort(key=lambda row: abs(row[3]), reverse=True)
+        return rows[:top]
+
+    # Header (length-prefixed JSON with the string tables) followed by the raw
+    # column buffers in native byte order
+    def save(self, file_name):
+        header = json.dumps(
+            {
+                "version": STORE_VERSION,
+                "year": self.year,
+                "base": self.base.isoformat() if self.base else None,
+                "count": len(self),
+                "paths": self.paths.strings,
+                "processes": self.processes.strings,
+            }
+        ).encode("utf-8")
+        with open(file_name, "wb") as f:
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            for name in ("times", "path_ids", "process_ids", "kinds"):
+                getattr(self, name).tofile(f)
+
+    @classmethod
+    def load(cls, file_name):
+        with open(file_name, "rb") as f:
+            (length,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(length).decode("utf-8"))
+            store = cls(header["year"])
+            if header["base"]:
+                store.base = datetime.fromisoformat(header["base"])
+            store.paths = StringTable(header["paths"])
+            store.processes = StringTable(header["processes"])
+            for name in ("times", "path_ids", "process_ids", "kinds"):
+                getattr(store, name).fromfile(f, header["count"])
+        return store
@@ -0,0 +1,314 @@
+import re
+import xml.etree.ElementTree as ET
+from collections import Counter
+
+from analyzers import OTHER, Analyzer
+
+r"""
+Which exclusions fire, and how often.
+
+    Exclusion::IsExcluded: result: 1 from cache for \\?\C:\...   cached verdict
+    Exclusion::IsExcluded: result: 1 for \\?\C:\..., reason: path  computed
+    Exclusion::IsExcluded: result: 0 for \\?\C:\...                 not excluded
+    ExclusionCheck: \\?\C:\... is excluded
+    ExclusionCheck: responding: is excluded
+
+Excluded files are counted per path and per process of the thread's last
+HandleCreation (lines without a path are charged to that file too).  With the
+policy.xml of the diagnostic, every excluded file is matched to the policy
+exclusion that covers it, so exclusions that fire can be told from the ones
+that never do.  Only file, extension, wildcard and process file exclusions
+can show up in these lines, SPP and MAP process exclusions are not judged.
+"""
+
+
+IS_EXCLUDED_REGEX = re.compile(
+    rb"Exclusion::IsExcluded: result: (\d)( from cache)? for (\\\\\?\\[^,\r\n]+)(?:, reason: ([^\r\n]+))?"
+)
+EXCLUSION_CHECK_REGEX = re.compile(
+    rb"ExclusionCheck: (?:(\\\\\?\\[^\r\n]+?) is excluded|responding: is excluded)"
+)
+CACHED, COMPUTED, CHECKED, NOT_EXCLUDED = 0, 1, 2, 3
+ENCODING = "utf-8"
+UNKNOWN = "(unknown)"
+TOP_PATHS = 15
+TOP_PROCESSES = 10
+
+POLICY_NAME = "policy.xml"
+PATH, EXTENSION, WILDCARD, PROCESS = "Path", "Extension", "Wildcard", "Process"
+# Type codes of the file exclusions of policy.xml ("1|0|C:\Temp\"), type 2
+# being a threat exclusion, which names a detection rather than a path
+FILE_EXCLUSION_TYPES = {"1": PATH, "3": EXTENSION, "4": WILDCARD}
+# Process exclusion flags of policy.xml that apply to file scans, without and
+# with the child processes
+PROCESS_FILE_FLAGS = ("0", "1")
+# Folders the policy names by CSIDL, as found on a default install
+CSIDL_FOLDERS = {
+    "CSIDL_WINDOWS": "C:\\Windows",
+    "CSIDL_SYSTEM": "C:\\Windows\\System32",
+    "CSIDL_SYSTEMX86": "C:\\Windows\\SysWOW64",
+    "CSIDL_PROGRAM_FILES": "C:\\Program Files",
+    "CSIDL_PROGRAM_FILESX86": "C:\\Program Files (x86)",
+    "CSIDL_PROGRAM_FILES_COMMON": "C:\\Program Files\\Common Files",
+    "CSIDL_PROGRAM_FILES_COMMONX86": "C:\\Program Files (x86)\\Common Files",
+    "CSIDL_COMMON_APPDATA": "C:\\ProgramData",
+}
+CSIDL_REGEX = re.compile(r"^(CSIDL_\w+)", re.IGNORECASE)
+
+
+# Lower case, without the \\?\ prefix, CSIDL names or a trailing backslash
+def normalize_path(path):
+    if path.startswith("\\\\?\\"):
+        path = path[4:]
+    reg = CSIDL_REGEX.match(path)
+    if reg is not None:
+        folder = CSIDL_FOLDERS.get(reg[1].upper())
+        if folder is not None:
+            path = folder + path[len(reg[1]) :]
+    return path.lower().rstrip("\\")
+
+
+# * and ? of a wildcard exclusion as a regex matching the start of a path.  A
+# leading ".*" is already the regex spelling of "*".
+def wildcard_regex(pattern):
+    if pattern.startswith(".*"):
+        pattern = pattern[1:]
+    escaped = re.escape(normalize_path(pattern))
+    escaped = escaped.replace(r"\*", ".*").replace(r"\?", ".")
+    return re.compile(escaped + r"(?:\\|$)")
+
+
+# The file and process exclusions of a policy.xml, matched against the
+# excluded files and their processes
+class PolicyExclusions:
+    def __init__(self, exclusions):
+        # [(exclusion as written in the policy, type)]
+        self.exclusions = exclusions
+        self.paths, self.extensions, self.processes = {}, {}, {}
+        self.wildcards = []
+        for index, (value, kind) in enumerate(exclusions):
+            if kind == PATH:
+                self.paths.setdefault(normalize_path(value), index)
+            elif kind == EXTENSION:
+                self.extensions.setdefault(value.lower().lstrip("."), index)
+            elif kind == WILDCARD:
+                self.wildcards.append((wildcard_regex(value), index))
+            else:
+                self.processes.setdefault(normalize_path(value), index)
+
+    @classmethod
+    def parse(cls, data):
+        try:
+            root = ET.fromstring(data)
+        except ET.ParseError:
+            return None
+        exclusions = []
+        for element in root.iter():
+            if not element.tag.endswith("exclusions"):
+                continue
+            for group in element:
+                tag = group.tag.rpartition("}")[2]
+                for item in group:
+                    split = (item.text or "").split("|")
+                    kind = FILE_EXCLUSION_TYPES.get(split[0])
+                    if tag == "info" and kind is not None and len(split) >= 3:
+                        exclusions.append((split[-1], kind))
+                    elif tag == "process" and len(split) >= 3:
+                        if split[-2] in PROCESS_FILE_FLAGS and split[-3]:
+                            exclusions.append((split[-3], PROCESS))
+        return cls(exclusions)
+
+    # Index of the exclusion covering file_path scanned for process, or None.
+    # The most specific path first, then extension, wildcard and process.
+    def match(self, file_path, process):
+        path = normalize_path(file_path)
+        end = len(path)
+        while end > 0:
+            index = self.paths.get(path[:end])
+            if index is not None:
+                return index
+            end = path.rfind("\\", 0, end)
+        file_name = path.rpartition("\\")[2]
+        if "." in file_name:
+            index = self.extensions.get(file_name.rpartition(".")[2])
+            if index is not None:
+                return index
+        for regex, index in self.wildcards:
+            if regex.match(path):
+                return index
+        if process is not None:
+            process = normalize_path(process)
+            index = self.processes.get(process)
+            if index is None:
+                index = self.processes.get(process.rpartition("\\")[2])
+            return index
+        return None
+
+
+class ExclusionAnalyzer(Analyzer):
+    name = "Exclusions"
+    markers = (b"Exclusion::IsExcluded: result: ", b"ExclusionCheck: ")
+
+    def __init__(self):
+        # (how, file, process) -> excluded checks, how being CACHED, COMPUTED
+        # or CHECKED
+        self.excluded = Counter()
+        self.not_excluded = 0
+        self.reasons = Counter()
+        self.policy = None
+
+    @staticmethod
+    def extract(line):
+        reg = IS_EXCLUDED_REGEX.search(line)
+        if reg is not None:
+            if reg[1] == b"0":
+                return NOT_EXCLUDED, None, None
+            file_path = reg[3].decode(ENCODING, "ignore").rstrip()
+            if reg[2]:
+                return CACHED, file_path, None
+            reason = reg[4] and reg[4].decode(ENCODING, "ignore").rstrip()
+            return COMPUTED, file_path, reason
+        reg = EXCLUSION_CHECK_REGEX.search(line)
+        if reg is not None:
+            return CHECKED, reg[1] and reg[1].decode(ENCODING, "ignore"), None
+        return None
+
+    def consume(self, ticks, timestamp, thread, holder, fields):
+        how, file_path, reason = fields
+        if how == NOT_EXCLUDED:
+            self.not_excluded += 1
+            return
+        process = UNKNOWN
+        if holder is not None:
+            process = holder[1]
+            file_path = file_path or holder[0]
+        key = (how, file_path or UNKNOWN, process)
+        self.excluded[self.capped(self.excluded, key, (how, OTHER, OTHER))] += 1
+        if reason:
+            self.reasons[reason] += 1
+
+    def merge(self, other):
+        for key, count in other.excluded.items():
+            self.excluded[
+                self.capped(self.excluded, key, (key[0], OTHER, OTHER))
+            ] += count
+        self.not_excluded += other.not_excluded
+        self.reasons.update(other.reasons)
+
+    def configure(self, settings):
+        self.policy = settings.get("policy")
+
+    # file -> [checks, from cache, computed, processes]
+    def files(self):
+        files = {}
+        for (how, file_path, process), count in self.excluded.items():
+            row = files.setdefault(file_path, [0, 0, 0, set()])
+            row[0] += count
+            if how == CACHED:
+                row[1] += count
+            elif how == COMPUTED:
+                row[2] += count
+            row[3].add(process)
+        return files
+
+    def policy_sections(self):
+        policy = self.policy
+        # exclusion index -> [checks, from cache, computed, files]
+        fired = {}
+        # The same file shows up once per way it was checked
+        matches = {}
+        for (how, file_path, process), count in self.excluded.items():
+            index = matches.get((file_path, process), -1)
+            if index == -1:
+                index = None
+                if file_path == OTHER:
+                    # Files past the cap, their exclusions are not known
+                    index = OTHER
+                elif file_path != UNKNOWN:
+                    caller = None if process == UNKNOWN else process
+                    index = policy.match(file_path, caller)
+                matches[(file_path, process)] = index
+            row = fired.setdefault(index, [0, 0, 0, set()])
+            row[0] += count
+            if how == CACHED:
+                row[1] += count
+            elif how == COMPUTED:
+                row[2] += count
+            row[3].add(file_path)
+        rows = []
+        for index, (count, cached, computed, files) in fired.items():
+            if index is None:
+                value, kind = "(no policy exclusion)", ""
+            elif index == OTHER:
+                value, kind = OTHER, ""
+            else:
+                value, kind = policy.exclusions[index]
+            rows.append((value, kind, count, cached, computed, len(files)))
+        rows.sort(key=lambda row: (-row[2], row[0]))
+        never = [
+            exclusion
+            for index, exclusion in enumerate(policy.exclusions)
+            if index not in fired
+        ]
+        sections = [
+            (
+                "Policy Exclusions Firing",
+                ("Exclusion", "Type", "Checks", "From cache", "Computed", "Files"),
+                rows,
+            )
+        ]
+        if never:
+            sections.append(
+                ("Policy Exclusions Never Firing", ("Exclusion", "Type"), never)
+            )
+        return sections
+
+    def sections(self):
+        if not self.excluded and not self.not_excluded:
+            return []
+        totals = Counter()
+        processes = Counter()
+        for (how, _, process), count in self.excluded.items():
+            totals[how] += count
+            processes[process] += count
+        files = self.files()
+        checks = [
+            ("excluded, verdict from cache", totals[CACHED]),
+            ("excluded, computed", totals[COMPUTED]),
+            ("excluded, ExclusionCheck", totals[CHECKED]),
+            ("not excluded", self.not_excluded),
+            ("excluded files", len(files)),
+            *(
+                (f"computed, reason: {reason}", n)
+                for reason, n in sorted(self.reasons.items())
+            ),
+        ]
+        if self.policy is None:
+            checks.append((f"{POLICY_NAME} exclusions", "not found"))
+        else:
+            checks.append((f"{POLICY_NAME} exclusions", len(self.policy.exclusions)))
+        # Excluded files checked over and over, most checks first
+        rechecked = [
+            (file_path, count, cached, computed, len(callers))
+            for file_path, (count, cached, computed, callers) in files.items()
+            if count > 1
+        ]
+        rechecked.sort(key=lambda row: (-row[1], row[0]))
+        sections = [
+            ("Exclusion Checks", ("", "Checks"), checks),
+            (
+                "Most Re-checked Excluded Files",
+                ("File", "Checks", "From cache", "Computed", "Processes"),
+                rechecked[:TOP_PATHS],
+            ),
+            (
+                "Excluded Checks by Process",
+                ("Process", "Checks"),
+                sorted(processes.items(), key=lambda item: (-item[1], item[0]))[
+                    :TOP_PROCESSES
+                ],
+            ),
+        ]
+        if self.policy is not None:
+            sections += self.policy_sections()
+        return sections
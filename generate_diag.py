@@ -0,0 +1,618 @@
+import argparse
+import hashlib
+import heapq
+import itertools
+import random
+import re
+import zipfile
+from datetime import datetime, timedelta
+
+"""
+Synthetic diagnostic generator
+
+Writes a diagnostic .zip laid out like a Secure Endpoint debug diagnostic so the
+analyzer can be benchmarked without customer data.  Every byte is derived from
+the seed, so the same arguments always produce the same archive.
+
+Usage:
+    python generate_diag.py -o synthetic.zip --size 100MB
+    python generate_diag.py -o big.zip --size 20GB --rotations 10 --seed 7
+    python generate_diag.py -o mix.zip --mix HandleCreation=50,ETHOS=10,Tetra=10
+"""
+
+
+DEFAULT_VERSION = "8.4.2.30317"
+DEFAULT_OLD_VERSION = "8.2.1.21650"
+START_TIME = datetime(2025, 1, 22, 8, 0, 0)
+BATCH_SIZE = 4096
+START_TICKS = 1000000
+# Tetra holds its slot's lock this long (ms), much longer for archives and
+# databases, so threads queue up behind them
+TETRA_HOLD = (5, 200)
+TETRA_LONG_HOLD = (1000, 8000)
+TETRA_LONG_EXTENSIONS = (".zip", ".mdf")
+# Hashing takes this long (ms), much longer for large binaries and archives
+HASH_TIME = (1, 60)
+HASH_LARGE_TIME = (50, 3000)
+HASH_LARGE_EXTENSIONS = (".zip", ".mdf", ".exe", ".dll")
+# Cloud lookups are answered within this many ms, or time out after
+# CLOUD_TIMEOUT ms with probability CLOUD_TIMEOUT_RATE
+CLOUD_LATENCY = (30, 400)
+CLOUD_TIMEOUT = 5000
+CLOUD_TIMEOUT_RATE = 0.03
+# Components that log a malicious disposition, and the share of detections
+# that are then quarantined
+DETECTION_COMPONENTS = [
+    "TetraEngineInterface::ScanFile",
+    "Ethos::GetHash",
+    "Spero::Compute",
+    "Query::LookupExecute",
+]
+QUARANTINE_RATE = 0.9
+# Inner files scanned per container scan follow a Pareto tail, so a few
+# containers set off thousands
+INNER_SCAN_SHAPE = 1.1
+MAX_INNER_SCANS = 40000
+
+# Distinct remote hosts of the NFMMemCache lines
+REMOTE_IPS = 500
+# Scanning threads, numbered like the connector's (1000, 1004, ...)
+THREADS = 64
+
+# Exclusions of the synthetic policy.xml, as the items of its exclusions/info
+# and exclusions/process lists.  The last of each never match a generated
+# path or process, the SPP process exclusion does not apply to file scans.
+POLICY_FILE_EXCLUSIONS = [
+    "1|0|C:\\Windows\\WinSxS\\",
+    "1|0|CSIDL_COMMON_APPDATA\\Package Cache\\",
+    "3|0|.mdf",
+    "4|0|*\\Engineering\\builds\\",
+    "2|0|W32.Example.Trojan",
+    "1|0|C:\\Program Files\\Unused Vendor\\",
+    "3|0|.vhdx",
+]
+POLICY_PROCESS_EXCLUSIONS = [
+    "1|C:\\Program Files\\Veeam\\Backup\\VeeamAgent.exe|0|",
+    "1|C:\\Program Files\\Microsoft SQL Server\\MSSQL\\Binn\\sqlservr.exe|4|",
+    "1|C:\\Program Files\\Retired\\agent.exe|1|",
+]
+# What the exclusions above cover, for the Exclusion lines
+EXCLUDED_PREFIXES = ("C:\\Windows\\WinSxS\\", "C:\\ProgramData\\Package Cache\\")
+EXCLUDED_PARTS = ("\\Engineering\\builds\\",)
+EXCLUDED_EXTENSIONS = (".mdf",)
+EXCLUDED_PROCESSES = ("C:\\Program Files\\Veeam\\Backup\\VeeamAgent.exe",)
+
+# Relative weight of each event kind when no --mix is given
+DEFAULT_MIX = {
+    "HandleCreation": 60,
+    "ETHOS": 4,
+    "SPERO": 4,
+    "Tetra": 6,
+    "Exclusion": 8,
+    "Cache": 10,
+    "NFMMemCache": 8,
+    "Cloud": 4,
+    "Detection": 0.2,
+    "InnerFile": 0.5,
+}
+
+# Connector noise that carries none of the markers the analyzer looks for
+NOISE_LINES = [
+    "Sched::WorkerThread: dequeued job",
+    "EventQueue::Process: queue depth 3",
+    "ConfigMgr::Refresh: no policy change",
+    "Heartbeat::Send: status ok",
+    "FileInfo::Open: share mode 7",
+]
+
+ROOT_FOLDERS = [
+    "C:\\Windows\\System32",
+    "C:\\Windows\\SysWOW64",
+    "C:\\Windows\\WinSxS",
+    "C:\\Windows\\Temp",
+    "C:\\Program Files\\Microsoft Office\\root\\Office16",
+    "C:\\Program Files (x86)\\Google\\Chrome\\Application",
+    "C:\\ProgramData\\Microsoft\\Windows Defender\\Scans",
+    "C:\\ProgramData\\Package Cache",
+    "C:\\Users\\{user}\\AppData\\Local\\Temp",
+    "C:\\Users\\{user}\\AppData\\Roaming\\Microsoft\\Teams",
+    "C:\\Users\\{user}\\Downloads",
+    "D:\\Shares\\Finance",
+    "D:\\Shares\\Engineering\\builds",
+    "E:\\SQLData",
+]
+
+EXTENSIONS = ["dll", "exe", "tmp", "log", "js", "ps1", "zip", "docx", "xlsx", "mdf"]
+
+PROCESSES = [
+    "C:\\Windows\\System32\\svchost.exe",
+    "C:\\Windows\\explorer.exe",
+    "C:\\Windows\\System32\\SearchIndexer.exe",
+    "C:\\Program Files\\Microsoft Office\\root\\Office16\\OUTLOOK.EXE",
+    "C:\\Program Files (x86)\\Google\\Chrome\\Application\\chrome.exe",
+    "C:\\Windows\\System32\\msiexec.exe",
+    "C:\\Program Files\\Microsoft SQL Server\\MSSQL\\Binn\\sqlservr.exe",
+    "C:\\Windows\\System32\\WindowsPowerShell\\v1.0\\powershell.exe",
+    "C:\\Windows\\System32\\backgroundTaskHost.exe",
+    "C:\\Program Files\\Veeam\\Backup\\VeeamAgent.exe",
+]
+
+SIZE_UNITS = {"": 1, "B": 1, "KB": 1024, "MB": 1024**2, "GB": 1024**3}
+
+
+def parse_size(size):
+    reg = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMG]?B?)\s*", size.upper())
+    if not reg:
+        raise argparse.ArgumentTypeError(f"Invalid size: {size}")
+    return int(float(reg[1]) * SIZE_UNITS[reg[2]])
+
+
+def parse_mix(mix):
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(
+                f"Unknown event kind '{name}', expected one of {', '.join(DEFAULT_MIX)}"
+            )
+        weights[name] = float(weight or 1)
+    return weights
+
+
+# Cumulative Zipf weights for rank 1..n, used with random.choices
+def zipf_weights(n, exponent):
+    return list(itertools.accumulate(1 / rank**exponent for rank in range(1, n + 1)))
+
+
+def build_paths(rng, count):
+    users = [f"user{i:03d}" for i in range(25)]
+    paths = []
+    seen = set()
+    while len(paths) < count:
+        folder = rng.choice(ROOT_FOLDERS).format(user=rng.choice(users))
+        if rng.random() < 0.5:
+            folder += f"\\{rng.choice(['cache', 'bin', 'data', 'x64', 'tmp'])}{rng.randrange(50)}"
+        name = f"{rng.choice(['file', 'setup', 'update', 'report', 'lib'])}{rng.randrange(100000)}"
+        path = f"{folder}\\{name}.{rng.choice(EXTENSIONS)}"
+        if path not in seen:
+            seen.add(path)
+            paths.append(path)
+    return paths
+
+
+def build_processes(rng, count):
+    processes = list(PROCESSES[:count])
+    while len(processes) < count:
+        processes.append(
+            f"C:\\Program Files\\Vendor{rng.randrange(1000)}\\agent{len(processes)}.exe"
+        )
+    return processes
+
+
+class LogWriter:
+    def __init__(self, seed, mix, distinct_paths, distinct_processes, zipf, noise):
+        self.rng = random.Random(seed)
+        self.paths = build_paths(self.rng, distinct_paths)
+        self.processes = build_processes(self.rng, distinct_processes)
+        self.path_weights = zipf_weights(len(self.paths), zipf)
+        self.process_weights = zipf_weights(len(self.processes), zipf)
+        # Remote IPv4 addresses as the little-endian integers NFM logs
+        self.remote_ips = [self.rng.randrange(1, 2**32) for _ in range(REMOTE_IPS)]
+        self.remote_weights = zipf_weights(REMOTE_IPS, zipf)
+        self.kinds = list(mix)
+        self.kind_weights = list(itertools.accumulate(mix.values()))
+        self.noise = noise
+        self.time = START_TIME
+        self.ticks = START_TICKS
+        self.events = 0
+        # Lines due later, (ticks, sequence, thread, message), and the ticks
+        # at which each Tetra slot's lock and each scanning thread are free
+        self.scheduled = []
+        self.sequence = 0
+        self.slot_free = {}
+        self.thread_busy = {}
+        self.writers = {
+            "HandleCreation": self.handle_creation,
+            "ETHOS": self.ethos,
+            "SPERO": self.spero,
+            "Tetra": self.tetra,
+            "Exclusion": self.exclusion,
+            "Cache": self.cache,
+            "NFMMemCache": self.nfm,
+            "Cloud": self.cloud,
+            "Detection": self.detection,
+            "InnerFile": self.inner_files,
+        }
+
+    def prefix(self, thread, ticks=None):
+        if ticks is None:
+            ticks, time = self.ticks, self.time
+        else:
+            time = START_TIME + timedelta(milliseconds=ticks - START_TICKS)
+        return f"({ticks}, +0 ms) {time:%b %d %H:%M:%S} [{thread}]: "
+
+    def schedule(self, ticks, thread, message):
+        self.sequence += 1
+        heapq.heappush(self.scheduled, (ticks, self.sequence, thread, message))
+
+    # Scheduled lines due by now (or all of them), in time order
+    def due_lines(self, everything=False):
+        lines = []
+        while self.scheduled and (everything or self.scheduled[0][0] <= self.ticks):
+            ticks, _, thread, message = heapq.heappop(self.scheduled)
+            lines.append(self.prefix(thread, ticks) + message + "\n")
+        return lines
+
+    # A thread that is not busy with a scan, busy threads only log the lines
+    # scheduled for them.  With every thread busy, any thread.
+    def free_thread(self):
+        for _ in range(THREADS):
+            thread = 1000 + self.rng.randrange(THREADS) * 4
+            if self.thread_busy.get(thread, 0) <= self.ticks:
+                break
+        return thread
+
+    def advance(self):
+        step = self.rng.randrange(1, 40)
+        self.ticks += step
+        self.time += timedelta(milliseconds=step)
+
+    def handle_creation(self, thread, path, process):
+        return [
+            f"Event::HandleCreation: START \\\\?\\{path}(\\\\?\\{path}), \\\\?\\{process}"
+        ]
+
+    # The file is opened and hashed.  Once hashing is done the thread logs a
+    # line without a marker, then looks the hash up in the verdict cache.
+    def hashed(self, thread, path, process, message):
+        if self.thread_busy.get(thread, 0) > self.ticks:
+            return [message]
+        # After the two lines returned here, each written up to 39 ms later
+        hashed = self.ticks + 80
+        if path.endswith(HASH_LARGE_EXTENSIONS):
+            hashed += self.rng.randrange(*HASH_LARGE_TIME)
+        else:
+            hashed += self.rng.randrange(*HASH_TIME)
+        self.thread_busy[thread] = hashed + 10
+        self.schedule(hashed, thread, self.rng.choice(NOISE_LINES))
+        self.schedule(hashed + 10, thread, self.cache(thread, path, process)[0])
+        return [self.handle_creation(thread, path, process)[0], message]
+
+    def ethos(self, thread, path, process):
+        return self.hashed(
+            thread,
+            path,
+            process,
+            f"Ethos::GetHash: calculating ETHOS hash for \\\\?\\{path}",
+        )
+
+    def spero(self, thread, path, process):
+        return self.hashed(
+            thread,
+            path,
+            process,
+            f"Spero::Compute: GetSperoHash SPERO fingerprint: status: 1 for \\\\?\\{path}",
+        )
+
+    # The file is opened, then its scan waits for the slot's lock, which the
+    # acquire and release lines report later on
+    def tetra(self, thread, path, process):
+        # A thread waits for its previous scan before it starts another
+        if self.thread_busy.get(thread, 0) > self.ticks:
+            return self.handle_creation(thread, path, process)
+        slot = 1000 + thread // 4 % 8
+        # After the two lines returned here, each written up to 39 ms later
+        requested = self.ticks + 80
+        acquired = max(requested + self.rng.randrange(3), self.slot_free.get(slot, 0))
+        if path.endswith(TETRA_LONG_EXTENSIONS) and self.rng.random() < 0.5:
+            released = acquired + self.rng.randrange(*TETRA_LONG_HOLD)
+        else:
+            released = acquired + self.rng.randrange(*TETRA_HOLD)
+        self.slot_free[slot] = self.thread_busy[thread] = released
+        self.schedule(
+            acquired, thread, f"TetraEngineInterface::ScanFile[{slot}] lock acquired"
+        )
+        self.schedule(
+            released, thread, f"TetraEngineInterface::ScanFile[{slot}] lock released"
+        )
+        return [
+            self.handle_creation(thread, path, process)[0],
+            f"TetraEngineInterface::ScanFile[{slot}] lock requested",
+        ]
+
+    # The file is opened, then checked against the exclusions.  Files the
+    # synthetic policy excludes come back excluded, the rest not.
+    def exclusion(self, thread, path, process):
+        return [
+            self.handle_creation(thread, path, process)[0],
+            self.exclusion_result(path, process),
+        ]
+
+    def exclusion_result(self, path, process):
+        excluded = (
+            path.startswith(EXCLUDED_PREFIXES)
+            or any(part in path for part in EXCLUDED_PARTS)
+            or path.endswith(EXCLUDED_EXTENSIONS)
+            or process in EXCLUDED_PROCESSES
+        )
+        choice = self.rng.random()
+        if not excluded:
+            cached = " from cache" if choice < 0.5 else ""
+            return f"Exclusion::IsExcluded: result: 0{cached} for \\\\?\\{path}"
+        if choice < 0.5:
+            return f"Exclusion::IsExcluded: result: 1 from cache for \\\\?\\{path}"
+        if choice < 0.8:
+            reason = "process" if process in EXCLUDED_PROCESSES else "path"
+            return (
+                f"Exclusion::IsExcluded: result: 1 for \\\\?\\{path}, reason: {reason}"
+            )
+        return f"ExclusionCheck: \\\\?\\{path} is excluded"
+
+    def cache(self, thread, path, process):
+        sha = hashlib.sha256(path.encode("utf-8")).hexdigest()
+        if self.rng.random() < 0.7:
+            return [f"Cache::Get: age {self.rng.randrange(1, 86400)}, sha256: {sha}"]
+        return [f"Cache::Get: no entry for sha256: {sha}"]
+
+    # Connections go to a few busy hosts and a long tail of others
+    def nfm(self, thread, path, process):
+        rip = self.rng.choices(self.remote_ips, cum_weights=self.remote_weights)[0]
+        return [
+            f"NFMMemCache::Get: rip: {rip}, rport: {self.rng.choice([80, 443, 445, 3389])}, process: \\\\?\\{process}"
+        ]
+
+    # The file is opened, then the verdict is asked from the cloud and the
+    # outcome logged later by the same thread
+    def cloud(self, thread, path, process):
+        if self.thread_busy.get(thread, 0) > self.ticks:
+            return self.handle_creation(thread, path, process)
+        # After the two lines returned here, each written up to 39 ms later
+        attempted = self.ticks + 80
+        if self.rng.random() < CLOUD_TIMEOUT_RATE:
+            done = attempted + CLOUD_TIMEOUT
+            outcome = "cloud lookup timed out"
+        else:
+            done = attempted + self.rng.randrange(*CLOUD_LATENCY)
+            outcome = (
+                f"cloud lookup complete, disposition: {self.rng.choice([1, 1, 1, 2])}"
+            )
+        self.thread_busy[thread] = done
+        self.schedule(done, thread, f"Query::LookupExecute: {outcome}")
+        return [
+            self.handle_creation(thread, path, process)[0],
+            "Query::LookupExecute: attempting lookup with cloud",
+        ]
+
+    # A malicious disposition from one of the engines, usually followed by
+    # the file's quarantine
+    def detection(self, thread, path, process):
+        component = self.rng.choice(DETECTION_COMPONENTS)
+        sha = hashlib.sha256(path.encode("utf-8")).hexdigest()
+        lines = [
+            self.handle_creation(thread, path, process)[0],
+            f"{component}: \\\\?\\{path} disp 3, detection: W32.Auto:{sha[:6]}.in03",
+        ]
+        if self.rng.random() < QUARANTINE_RATE:
+            lines.append(f"EventMgr::Publish: publishing type=553648143, \\\\?\\{path}")
+        return lines
+
+    # A container (the file made an archive) is opened, then each of its
+    # inner files is scanned
+    def inner_files(self, thread, path, process):
+        container = path.rpartition(".")[0] + ".zip"
+        count = min(int(self.rng.paretovariate(INNER_SCAN_SHAPE)), MAX_INNER_SCANS)
+        return [
+            self.handle_creation(thread, container, process)[0],
+            *["Scan::InnerFile: EVENT_INNER_FILE_SCAN start"] * count,
+        ]
+
+    # Yields batches of log lines until `size` characters have been produced.
+    # The log stops after the event that reaches the budget, plus the lines
+    # still scheduled for earlier events.
+    def lines(self, size):
+        written = 0
+        rng = self.rng
+        while written < size:
+            kinds = rng.choices(self.kinds, cum_weights=self.kind_weights, k=BATCH_SIZE)
+            paths = rng.choices(self.paths, cum_weights=self.path_weights, k=BATCH_SIZE)
+            processes = rng.choices(
+                self.processes, cum_weights=self.process_weights, k=BATCH_SIZE
+            )
+            batch = []
+            for kind, path, process in zip(kinds, paths, processes):
+                start = len(batch)
+                thread = self.free_thread()
+                for message in self.writers[kind](thread, path, process):
+                    self.advance()
+                    batch += self.due_lines()
+                    batch.append(self.prefix(thread) + message + "\n")
+                self.events += 1
+                # Whole part of --noise is always written, the fraction is a probability
+                for _ in range(int(self.noise) + (rng.random() < self.noise % 1)):
+                    self.advance()
+                    batch += self.due_lines()
+                    batch.append(
+                        self.prefix(self.free_thread()) + rng.choice(NOISE_LINES) + "\n"
+                    )
+                written += sum(map(len, batch[start:]))
+                if written >= size:
+                    break
+            if written >= size:
+                # The log ends with every lock released
+                batch += self.due_lines(everything=True)
+            yield "".join(batch)
+
+
+def write_member(archive, name, writer, size):
+    written = 0
+    # Members opened by name take the archive's compression and level, and
+    # ZipInfo's fixed 1980 timestamp, so archives are byte-for-byte
+    # reproducible.  force_zip64 allows members larger than 4 GB when
+    # generating 20 GB logs.
+    with archive.open(name, "w", force_zip64=size >= 2**31) as member:
+        for chunk in writer.lines(size):
+            data = chunk.encode("utf-8")
+            member.write(data)
+            written += len(data)
+    return written
+
+
+# A log of another connector component: heartbeats of the tray application
+def component_log(lines=500):
+    return "".join(
+        f"({START_TICKS + 60000 * index}, +0 ms) "
+        f"{START_TIME + timedelta(minutes=index):%b %d %H:%M:%S} [2212]: "
+        "TrayApp::Heartbeat: connector status ok\n"
+        for index in range(lines)
+    )
+
+
+# The systeminfo output collected with the diagnostic
+def system_info():
+    return (
+        "\r\nHost Name:                 WKS-0042\r\n"
+        "OS Name:                   Microsoft Windows 10 Enterprise\r\n"
+        "OS Version:                10.0.19045 N/A Build 19045\r\n"
+        "System Type:               x64-based PC\r\n"
+        "Processor(s):              1 Processor(s) Installed.\r\n"
+        "                           [01]: Intel64 Family 6 Model 140 Stepping 1\r\n"
+        "Total Physical Memory:     16,214 MB\r\n"
+        "Available Physical Memory: 5,873 MB\r\n"
+    )
+
+
+# A policy.xml laid out like the connector's, with only the exclusions filled in
+def policy_xml():
+    def items(values):
+        return "".join(f"<item>{value}</item>" for value in values)
+
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<Signature xmlns="http://www.w3.org/2000/09/xmldsig#">'
+        "<SignedInfo></SignedInfo><SignatureValue></SignatureValue>"
+        '<Object Id="ConnectorPolicy"><config xmlns="urn:cisco:amp:policy">'
+        "<janus></janus><exclusions>"
+        f"<info>{items(POLICY_FILE_EXCLUSIONS)}</info>"
+        f"<process>{items(POLICY_PROCESS_EXCLUSIONS)}</process>"
+        "</exclusions></config></Object></Signature>\n"
+    )
+
+
+def generate_diagnostic(
+    output,
+    size,
+    seed=1,
+    mix=None,
+    rotations=3,
+    version=DEFAULT_VERSION,
+    old_version=DEFAULT_OLD_VERSION,
+    distinct_paths=50000,
+    distinct_processes=200,
+    zipf=1.1,
+    noise=1.0,
+    compresslevel=6,
+):
+    writer = LogWriter(
+        seed, mix or DEFAULT_MIX, distinct_paths, distinct_processes, zipf, noise
+    )
+    members = {}
+    base = "Cisco/AMP/{}/sfc.exe.log"
+    with zipfile.ZipFile(
+        output,
+        "w",
+        compression=zipfile.ZIP_DEFLATED,
+        allowZip64=True,
+        compresslevel=compresslevel,
+    ) as archive:
+        # A small log from the previous connector version, which the analyzer
+        # must skip in favour of the newest version
+        if old_version:
+            name = base.format(old_version)
+            members[name] = write_member(
+                archive, name, writer, min(size // 100, 1024**2)
+            )
+        # Rotated logs oldest first: sfc.exe.log.N ... sfc.exe.log.1, sfc.exe.log
+        per_log = max(size // max(rotations, 1), 1)
+        for index in range(max(rotations, 1) - 1, -1, -1):
+            name = base.format(version) + (f".{index}" if index else "")
+            members[name] = write_member(archive, name, writer, per_log)
+        # The members the analyzer reads besides the sfc logs
+        for name, text in (
+            (f"Cisco/AMP/{version}/iptray.exe.log", component_log()),
+            ("Cisco/AMP/policy.xml", policy_xml()),
+            ("systeminfo.txt", system_info()),
+        ):
+            data = text.encode("utf-8")
+            archive.writestr(
+                zipfile.ZipInfo(name),
+                data,
+                compress_type=zipfile.ZIP_DEFLATED,
+                compresslevel=compresslevel,
+            )
+            members[name] = len(data)
+    return {"output": output, "members": members, "events": writer.events}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic Secure Endpoint diagnostic for benchmarking"
+    )
+    parser.add_argument("-o", "--output", required=True, help="Zip file to write")
+    parser.add_argument(
+        "-s",
+        "--size",
+        type=parse_size,
+        default=parse_size("10MB"),
+        help="Total uncompressed size of the newest-version sfc logs, e.g. 10MB or 20GB",
+    )
+    parser.add_argument("--seed", type=int, default=1, help="Random seed")
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        help="Event mix as Kind=weight pairs, e.g. HandleCreation=60,ETHOS=5. "
+        f"Kinds: {', '.join(DEFAULT_MIX)}",
+    )
+    parser.add_argument(
+        "--rotations", type=int, default=3, help="Number of rotated sfc.exe.log files"
+    )
+    parser.add_argument("--version", default=DEFAULT_VERSION, help="Connector version")
+    parser.add_argument(
+        "--old-version",
+        default=DEFAULT_OLD_VERSION,
+        help="Older connector version to include, empty to skip",
+    )
+    parser.add_argument("--distinct-paths", type=int, default=50000)
+    parser.add_argument("--distinct-processes", type=int, default=200)
+    parser.add_argument(
+        "--zipf", type=float, default=1.1, help="Zipf exponent for paths and processes"
+    )
+    parser.add_argument(
+        "--noise",
+        type=float,
+        default=1.0,
+        help="Average number of unrelated log lines written after each event",
+    )
+    parser.add_argument("--compresslevel", type=int, default=6)
+    args = parser.parse_args()
+
+    result = generate_diagnostic(
+        args.output,
+        args.size,
+        seed=args.seed,
+        mix=args.mix,
+        rotations=args.rotations,
+        version=args.version,
+        old_version=args.old_version,
+        distinct_paths=args.distinct_paths,
+        distinct_processes=args.distinct_processes,
+        zipf=args.zipf,
+        noise=args.noise,
+        compresslevel=args.compresslevel,
+    )
+    for name, size in result["members"].items():
+        print("{0:>14} {1}".format(size, name))
+    print(f"\n{result['events']} events written to {result['output']}")
+
+
+if __name__ == "__main__":
+    main()
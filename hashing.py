@@ -0,0 +1,207 @@
+import csv
+import os
+import re
+from collections import Counter
+
+from analyzers import OTHER, Analyzer, Durations, histogram_rows
+
+r"""
+Hashing cost of the ETHOS and SPERO engines.
+
+    Ethos::GetHash: calculating ETHOS hash for \\?\C:\...
+    Spero::Compute: GetSperoHash SPERO fingerprint: status: 1 for \\?\C:\...
+
+Each hash is charged to its file, the file's extension and the process of the
+thread's last HandleCreation.  A hash is timed from its line to the next line
+the same thread logged, of any kind, which the parser looks for in the next
+FOLLOW_BYTES of the log.  When there is none, or it comes after MAX_HASH_MS,
+the hash is only counted.  Files, extensions and processes are ranked by time
+spent hashing, and every (engine, file, process) is exported to -hashing.csv.
+
+SHA-256 hashing is not covered: sfc.exe.log has no line for computing one.
+The SHA-256 only appears as the key of the verdict cache lookup that follows
+(Cache::Get, see cache_stats.py), which names no file and does not mark when
+hashing started, so there is nothing to charge or time.
+"""
+
+
+ETHOS_REGEX = re.compile(rb"calculating ETHOS hash(?: for (\\\\\?\\[^\r\n]+))?")
+SPERO_REGEX = re.compile(
+    rb"GetSperoHash SPERO fingerprint: status: (\d+)(?: for (\\\\\?\\[^\r\n]+))?"
+)
+ETHOS, SPERO = "ETHOS", "SPERO"
+ENCODING = "utf-8"
+# Longer gaps mean the thread went on to other work without logging
+MAX_HASH_MS = 60000
+TOP_ROWS = 15
+CSV_NAME = "-hashing.csv"
+
+
+def get_extension(file_path):
+    file_name = file_path.rpartition("\\")[2]
+    return file_name.split(".")[-1].lower() if "." in file_name else ""
+
+
+class HashingAnalyzer(Analyzer):
+    name = "Hashing Cost"
+    markers = (b"calculating ETHOS hash", b"GetSperoHash SPERO fingerprint")
+    timed = True
+
+    def __init__(self):
+        self.durations = {ETHOS: Durations(), SPERO: Durations()}
+        self.statuses = Counter()
+        # (engine, file, process) -> hashes, timed hashes and total ms
+        self.hashes = Counter()
+        self.timed_hashes = Counter()
+        self.milliseconds = Counter()
+
+    @staticmethod
+    def extract(line):
+        reg = ETHOS_REGEX.search(line)
+        if reg is not None:
+            return ETHOS, reg[1] and reg[1].decode(ENCODING, "ignore").rstrip(), None
+        reg = SPERO_REGEX.search(line)
+        if reg is not None:
+            file_path = reg[2] and reg[2].decode(ENCODING, "ignore").rstrip()
+            return SPERO, file_path, int(reg[1])
+        return None
+
+    def consume(self, ticks, timestamp, thread, holder, fields):
+        engine, file_path, status, end = fields
+        if status is not None:
+            self.statuses[(engine, status)] += 1
+        process = "(unknown)"
+        if holder is not None:
+            process = holder[1]
+            file_path = file_path or holder[0]
+        key = (engine, file_path or "(unknown)", process)
+        key = self.capped(self.hashes, key, (engine, OTHER, OTHER))
+        self.hashes[key] += 1
+        if end is not None and 0 <= end - ticks <= MAX_HASH_MS:
+            self.durations[engine][end - ticks] += 1
+            self.timed_hashes[key] += 1
+            self.milliseconds[key] += end - ticks
+
+    def merge(self, other):
+        for engine, durations in other.durations.items():
+            self.durations[engine].update(durations)
+        self.statuses.update(other.statuses)
+        for key, count in other.hashes.items():
+            capped = self.capped(self.hashes, key, (key[0], OTHER, OTHER))
+            self.hashes[capped] += count
+            if key in other.timed_hashes:
+                self.timed_hashes[capped] += other.timed_hashes[key]
+                self.milliseconds[capped] += other.milliseconds[key]
+
+    # Hashes, timed hashes and ms summed per file, extension or process
+    def ranked(self, group):
+        totals = {}
+        for key, count in self.hashes.items():
+            name = group(key)
+            row = totals.setdefault(name, [0, 0, 0])
+            row[0] += count
+            row[1] += self.timed_hashes[key]
+            row[2] += self.milliseconds[key]
+        rows = [
+            (name, count, timed, ms, round(ms / timed, 1) if timed else "")
+            for name, (count, timed, ms) in totals.items()
+        ]
+        # Most time spent first, untimed hashes by count after those
+        rows.sort(key=lambda row: (row[3], row[1]), reverse=True)
+        return rows[:TOP_ROWS]
+
+    def sections(self):
+        if not self.hashes:
+            return []
+        engines = []
+        for engine, durations in self.durations.items():
+            count = sum(n for key, n in self.hashes.items() if key[0] == engine)
+            summary = durations.summary()
+            engines.append(
+                (
+                    engine,
+                    count,
+                    summary["count"],
+                    durations.total(),
+                    summary["mean"],
+                    summary["p90"],
+                    summary["max"],
+                )
+            )
+        headings = ("Hashes", "Timed", "Total ms", "Mean ms")
+        sections = [
+            (
+                "Hashing Cost by Engine",
+                (
+                    "Engine",
+                    "Hashes",
+                    "Timed",
+                    "Total ms",
+                    "Mean ms",
+                    "p90 ms",
+                    "Max ms",
+                ),
+                engines,
+            ),
+            (
+                "Hashing Time Distribution",
+                ("Duration", ETHOS, SPERO),
+                histogram_rows(self.durations[ETHOS], self.durations[SPERO]),
+            ),
+            (
+                "Hashing Cost by Extension",
+                ("Extension", *headings),
+                self.ranked(lambda key: get_extension(key[1])),
+            ),
+            (
+                "Hashing Cost by Process",
+                ("Process", *headings),
+                self.ranked(lambda key: key[2]),
+            ),
+            (
+                "Hashing Cost by File",
+                ("File", *headings),
+                self.ranked(lambda key: key[1]),
+            ),
+        ]
+        statuses = [
+            (f"{engine} status {status}", count)
+            for (engine, status), count in sorted(self.statuses.items())
+        ]
+        if statuses:
+            sections.append(("Hashing Results", ("", "Hashes"), statuses))
+        return sections
+
+    def export(self, results_dir):
+        if not self.hashes:
+            return
+        with open(
+            os.path.join(results_dir, CSV_NAME), "w", newline="", encoding="utf-8-sig"
+        ) as f:
+            writer = csv.writer(f)
+            writer.writerow(
+                [
+                    "engine",
+                    "file",
+                    "extension",
+                    "process",
+                    "hashes",
+                    "timed",
+                    "total_ms",
+                ]
+            )
+            # Most hashes first, ties in key order so reruns compare equal
+            rows = sorted(self.hashes.items(), key=lambda item: (-item[1], item[0]))
+            for key, count in rows:
+                engine, file_path, process = key
+                writer.writerow(
+                    [
+                        engine,
+                        file_path,
+                        get_extension(file_path),
+                        process,
+                        count,
+                        self.timed_hashes[key],
+                        self.milliseconds[key],
+                    ]
+                )
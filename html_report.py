@@ -0,0 +1,230 @@
+import os
+import sys
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+"""
+Renders the shareable single-file HTML report from the aggregates built by
+Diag_Analyzer_v2.main().  Everything (styles, scripts and charts) is inlined
+so the report can be attached to a case and opened without the tool.
+"""
+
+
+TEMPLATES_PATH = Path(__file__).parent / "templates"
+
+# Rows shown in each sortable table
+TOP_COUNT = 50
+# Upper bound of bars drawn in the scan-rate timeline
+MAX_TIMELINE_POINTS = 240
+# Folders below this depth are folded into their parent in the treemap
+TREEMAP_DEPTH = 3
+# Children drawn per treemap node, the rest are merged into "Other"
+TREEMAP_CHILDREN = 8
+TREEMAP_WIDTH = 960
+TREEMAP_HEIGHT = 480
+
+MONTHS = {
+    month: index
+    for index, month in enumerate(
+        "Jan Feb Mar Apr May Jun Jul Aug Sep Oct Nov Dec".split()
+    )
+}
+
+
+def get_templates_dir():
+    if hasattr(sys, "_MEIPASS"):
+        # If running from a PyInstaller bundle, use the _MEIPASS directory
+        return Path(sys._MEIPASS) / "templates"
+    return TEMPLATES_PATH
+
+
+# Sort key for the per-minute timeline buckets, e.g. "Jan 22 00:00"
+def minute_key(minute):
+    month, day, clock = minute.split(" ")
+    return MONTHS.get(month, 12), int(day), clock
+
+
+# Merges neighbouring minutes until at most max_points bars remain, so a
+# week-long log does not produce a ten thousand bar chart.
+def downsample(points, max_points=MAX_TIMELINE_POINTS):
+    if len(points) <= max_points:
+        return points
+    bucket_size = -(-len(points) // max_points)
+    sampled = []
+    for i in range(0, len(points), bucket_size):
+        bucket = points[i : i + bucket_size]
+        sampled.append((bucket[0][0], sum(count for _, count in bucket)))
+    return sampled
+
+
+def get_timeline(timeline):
+    points = downsample(sorted(timeline.items(), key=lambda x: minute_key(x[0])))
+    peak = max((count for _, count in points), default=0)
+    bars = []
+    for label, count in points:
+        bars.append(
+            {
+                "label": label,
+                "count": count,
+                "height": round(100 * count / peak, 2) if peak else 0,
+            }
+        )
+    return {"bars": bars, "peak": peak}
+
+
+def strip_prefix(path):
+    return path[4:] if path.startswith("\\\\?\\") else path
+
+
+# Builds a folder tree truncated at TREEMAP_DEPTH from the per-folder counts.
+def build_folder_tree(paths):
+    tree = {"name": "", "count": 0, "children": {}}
+    for folder, count in paths.items():
+        tree["count"] += count
+        node = tree
+        for part in strip_prefix(folder).split("\\")[:TREEMAP_DEPTH]:
+            if not part:
+                continue
+            node = node["children"].setdefault(
+                part, {"name": part, "count": 0, "children": {}}
+            )
+            node["count"] += count
+    return tree
+
+
+# Slice-and-dice layout: each level splits its rectangle along the longer side
+# proportionally to the children's counts.
+def layout_treemap(node, x, y, width, height, depth, rects, path=""):
+    children = sorted(node["children"].values(), key=lambda c: -c["count"])
+    if not children or node["count"] <= 0:
+        return
+    shown = children[:TREEMAP_CHILDREN]
+    other = node["count"] - sum(child["count"] for child in shown)
+    if other > 0:
+        shown.append({"name": "Other", "count": other, "children": {}})
+
+    offset = 0.0
+    for child in shown:
+        share = child["count"] / node["count"]
+        if width >= height:
+            rect = (x + offset, y, width * share, height)
+            offset += width * share
+        else:
+            rect = (x, y + offset, width, height * share)
+            offset += height * share
+        child_path = f"{path}\\{child['name']}" if path else child["name"]
+        rects.append(
+            {
+                "x": round(rect[0], 1),
+                "y": round(rect[1], 1),
+                "width": round(rect[2], 1),
+                "height": round(rect[3], 1),
+                "label": child["name"],
+                "path": child_path,
+                "count": child["count"],
+                "depth": depth,
+            }
+        )
+        # Leave a small margin so the parent stays visible around its children
+        if rect[2] > 24 and rect[3] > 24:
+            layout_treemap(
+                child,
+                rect[0] + 2,
+                rect[1] + 14,
+                rect[2] - 4,
+                rect[3] - 16,
+                depth + 1,
+                rects,
+                child_path,
+            )
+
+
+def get_treemap(paths):
+    rects = []
+    tree = build_folder_tree(paths)
+    layout_treemap(tree, 0, 0, TREEMAP_WIDTH, TREEMAP_HEIGHT, 0, rects)
+    return {"rects": rects, "width": TREEMAP_WIDTH, "height": TREEMAP_HEIGHT}
+
+
+def get_table(counter, total, count=TOP_COUNT):
+    rows = []
+    # Approximate (sketch) counters carry an error per row: the count is an
+    # upper bound and count - error a lower bound
+    errors = getattr(counter, "errors", {})
+    for rank, (name, hits) in enumerate(counter.most_common(count), start=1):
+        rows.append(
+            {
+                "rank": rank,
+                "name": name,
+                "count": hits,
+                "error": errors.get(name, 0),
+                "lower": hits - errors.get(name, 0),
+                "share": round(100 * hits / total, 2) if total else 0,
+            }
+        )
+    return rows
+
+
+# Analyzer sections with each cell marked as numeric or not for alignment
+def get_analysis(analysis):
+    if analysis is None:
+        return []
+    return [
+        (
+            name,
+            [
+                (
+                    title,
+                    headings,
+                    [
+                        [(cell, isinstance(cell, (int, float))) for cell in row]
+                        for row in rows
+                    ],
+                )
+                for title, headings, rows in sections
+            ],
+        )
+        for name, sections in analysis.sections()
+    ]
+
+
+def get_report_context(aggregates, source):
+    total = aggregates["events"]
+    return {
+        "source": os.path.basename(source),
+        "generated": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "total_events": total,
+        "approximate": any(
+            hasattr(aggregates[name], "errors")
+            for name in ("processes", "files", "paths")
+        ),
+        "tables": [
+            ("Processes", get_table(aggregates["processes"], total)),
+            ("Files", get_table(aggregates["files"], total)),
+            ("Extensions", get_table(aggregates["extensions"], total)),
+            ("Paths", get_table(aggregates["paths"], total)),
+        ],
+        "engines": sorted(aggregates.get("engines", Counter()).items()),
+        "analysis": get_analysis(aggregates.get("sources"))
+        + get_analysis(aggregates.get("versions"))
+        + get_analysis(aggregates.get("analysis")),
+        "timeline": get_timeline(aggregates["timeline"]),
+        "treemap": get_treemap(aggregates["paths"]),
+    }
+
+
+def write_html_report(aggregates, results_dir, source, file_name="-report.html"):
+    environment = Environment(
+        loader=FileSystemLoader(str(get_templates_dir())),
+        autoescape=select_autoescape(["html"]),
+    )
+    template = environment.get_template("report.html")
+    report_path = os.path.join(results_dir, file_name)
+    # Stream the rendered template straight to disk
+    with open(report_path, "w", encoding="utf-8") as f:
+        template.stream(**get_report_context(aggregates, source)).dump(f)
+    print(f"HTML report written to: {report_path}\n")
+    return report_path
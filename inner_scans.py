@@ -0,0 +1,210 @@
+import csv
+import os
+import re
+from collections import Counter
+
+from analyzers import OTHER, Analyzer
+
+r"""
+Inner-file scan amplification: how many inner files each container scan
+(an archive, installer or document with embedded files) sets off.
+
+    Scan::InnerFile: EVENT_INNER_FILE_SCAN start
+    Scan::InnerFile: EVENT_INNER_FILE_SCAN start \\?\C:\...\setup.zip
+
+The container is the file on the line, or that of the thread's last
+HandleCreation, with that HandleCreation's process.  A container scan is a run
+of inner scans by one thread for the same container and process; another
+container on the thread starts a new one, so a rescan straight after by the
+same thread counts once.  Containers are ranked by inner scans, with their
+scans, inner scans per scan and the largest single scan, and every
+(container, process) is exported to -inner-scans.csv.
+"""
+
+
+INNER_SCAN_REGEX = re.compile(rb"EVENT_INNER_FILE_SCAN start(?:.*?(\\\\\?\\[^\r\n]+))?")
+ENCODING = "utf-8"
+UNKNOWN = "(unknown)"
+TOP_ROWS = 15
+# Upper bounds of the inner scans per container scan histogram
+SCAN_BUCKETS = (1, 10, 100, 1000, 10000)
+CSV_NAME = "-inner-scans.csv"
+
+
+def get_extension(file_path):
+    file_name = file_path.rpartition("\\")[2]
+    return file_name.split(".")[-1].lower() if "." in file_name else ""
+
+
+def per_scan(inner, scans):
+    return round(inner / scans, 1) if scans else 0
+
+
+class InnerScanAnalyzer(Analyzer):
+    name = "Inner File Scan Amplification"
+    markers = (b"EVENT_INNER_FILE_SCAN start",)
+
+    def __init__(self):
+        # (container, process) -> container scans, inner scans and the most
+        # inner scans of a single container scan
+        self.scans = Counter()
+        self.inner = Counter()
+        self.largest = {}
+        # Container scans per SCAN_BUCKETS bound (None past the last)
+        self.sizes = Counter()
+        # thread -> [(container, process), inner scans] of its open scan
+        self.open = {}
+
+    @staticmethod
+    def extract(line):
+        reg = INNER_SCAN_REGEX.search(line)
+        if reg is None:
+            return None
+        return (reg[1] and reg[1].decode(ENCODING, "ignore").rstrip(),)
+
+    def consume(self, ticks, timestamp, thread, holder, fields):
+        (container,) = fields
+        process = UNKNOWN
+        if holder is not None:
+            process = holder[1]
+            container = container or holder[0]
+        key = (container or UNKNOWN, process)
+        scan = self.open.get(thread)
+        if scan is None or scan[0] != key:
+            if scan is not None:
+                self.close(*scan)
+            scan = self.open[thread] = [key, 0]
+        scan[1] += 1
+
+    def close(self, key, inner):
+        key = self.capped(self.scans, key, (OTHER, OTHER))
+        self.scans[key] += 1
+        self.inner[key] += inner
+        self.largest[key] = max(self.largest.get(key, 0), inner)
+        self.sizes[next((b for b in SCAN_BUCKETS if inner <= b), None)] += 1
+
+    # A log ended: its container scans are done
+    def end_source(self):
+        for scan in self.open.values():
+            self.close(*scan)
+        self.open = {}
+
+    def merge(self, other):
+        self.sizes.update(other.sizes)
+        for key, scans in other.scans.items():
+            capped = self.capped(self.scans, key, (OTHER, OTHER))
+            self.scans[capped] += scans
+            self.inner[capped] += other.inner[key]
+            largest = other.largest[key]
+            self.largest[capped] = max(self.largest.get(capped, 0), largest)
+
+    # [(name, container scans, inner scans, per scan, largest scan)] summed
+    # per container, extension or process, most inner scans first
+    def ranked(self, group):
+        totals = {}
+        for key, scans in self.scans.items():
+            row = totals.setdefault(group(key), [0, 0, 0])
+            row[0] += scans
+            row[1] += self.inner[key]
+            row[2] = max(row[2], self.largest[key])
+        rows = [
+            (name, scans, inner, per_scan(inner, scans), largest)
+            for name, (scans, inner, largest) in totals.items()
+        ]
+        rows.sort(key=lambda row: (-row[2], row[0]))
+        return rows
+
+    def histogram(self):
+        rows = []
+        previous = 0
+        for bound in (*SCAN_BUCKETS, None):
+            if bound is None:
+                label = f"> {SCAN_BUCKETS[-1]}"
+            elif previous + 1 == bound:
+                label = str(bound)
+            else:
+                label = f"{previous + 1}-{bound}"
+            if self.sizes[bound]:
+                rows.append((label, self.sizes[bound]))
+            previous = bound
+        return rows
+
+    def sections(self):
+        if not self.scans:
+            return []
+        scans = sum(self.scans.values())
+        inner = sum(self.inner.values())
+        containers = self.ranked(lambda key: key[0])
+        rescanned = [row for row in containers if row[1] > 1]
+        rescanned.sort(key=lambda row: (-row[1], -row[2], row[0]))
+        headings = ("Scans", "Inner scans", "Inner per scan", "Largest scan")
+        return [
+            (
+                "Inner File Scans",
+                ("", "Count"),
+                [
+                    ("inner file scans", inner),
+                    ("container scans", scans),
+                    ("containers", len(containers)),
+                    ("inner scans per container scan", per_scan(inner, scans)),
+                    ("largest container scan", max(self.largest.values())),
+                    ("inner scans without a container", self.inner[(UNKNOWN,) * 2]),
+                ],
+            ),
+            (
+                "Inner Scans per Container Scan",
+                ("Inner scans", "Container scans"),
+                self.histogram(),
+            ),
+            (
+                "Inner Scan Amplification by Container",
+                ("Container", *headings),
+                containers[:TOP_ROWS],
+            ),
+            (
+                "Rescanned Containers",
+                ("Container", *headings),
+                rescanned[:TOP_ROWS],
+            ),
+            (
+                "Inner Scan Amplification by Extension",
+                ("Extension", *headings),
+                self.ranked(lambda key: get_extension(key[0]))[:TOP_ROWS],
+            ),
+            (
+                "Inner Scan Amplification by Process",
+                ("Process", *headings),
+                self.ranked(lambda key: key[1])[:TOP_ROWS],
+            ),
+        ]
+
+    def export(self, results_dir):
+        if not self.scans:
+            return
+        with open(
+            os.path.join(results_dir, CSV_NAME), "w", newline="", encoding="utf-8-sig"
+        ) as f:
+            writer = csv.writer(f)
+            writer.writerow(
+                [
+                    "container",
+                    "extension",
+                    "process",
+                    "scans",
+                    "inner_scans",
+                    "largest_scan",
+                ]
+            )
+            rows = sorted(self.inner.items(), key=lambda item: (-item[1], item[0]))
+            for key, inner in rows:
+                container, process = key
+                writer.writerow(
+                    [
+                        container,
+                        get_extension(container),
+                        process,
+                        self.scans[key],
+                        inner,
+                        self.largest[key],
+                    ]
+                )
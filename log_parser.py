@@ -0,0 +1,394 @@
+import contextlib
+import mmap
+import os
+import re
+from collections import Counter
+
+from analyzers import Analysis, LineRecords, parse_header
+from cache_stats import CacheAnalyzer
+from cloud import CloudLookupAnalyzer
+from detections import DetectionAnalyzer
+from exclusions import ExclusionAnalyzer
+from hashing import HashingAnalyzer
+from inner_scans import InnerScanAnalyzer
+from network import NetworkAnalyzer
+from sketches import SpaceSaving
+from spill import ENTRY_OVERHEAD, SpillingCounter
+from tetra import TetraLockAnalyzer
+
+"""
+sfc.exe.log parsing shared by the analyzer, the benchmark and quick-look mode.
+
+Logs are read as bytes: the prefilter and regex work on the raw lines and only
+the captured timestamp, path and process are decoded.  Logs on disk are
+memory-mapped and searched for markers in C, so lines without a marker never
+become Python objects.
+"""
+
+
+HANDLE_CREATION_REGEX = re.compile(
+    rb"(\w{3} \d{1,2} \d\d:\d\d:\d\d)(?: \[(\d+)\])?.*Event::HandleCreation: START (\\\\\?\\[^\(]+)\(\\\\\?\\[^\)]+\), (\\\\\?\\.+)"
+)
+HANDLE_CREATION_MARKER = b"Event::HandleCreation"
+# Encoding of the captured fields, undecodable bytes are dropped as before
+ENCODING = "utf-8"
+
+# Engine counters shown in the HTML report, keyed by the log markers counted for them
+ENGINE_MARKERS = [
+    ("SPERO Hashes", ("GetSperoHash SPERO fingerprint: status: 1",)),
+    ("ETHOS Hashes", ("calculating ETHOS hash",)),
+    ("Cloud Lookups", ("Query::LookupExecute: attempting lookup with cloud",)),
+    ("Tetra Scans", ("] lock acquired",)),
+    (
+        "Exclusions",
+        ("Exclusion::IsExcluded: result: 1", "ExclusionCheck: responding: is excluded"),
+    ),
+    ("Cache Hits", ("Cache::Get: age",)),
+    ("Inner File Scans", ("EVENT_INNER_FILE_SCAN start",)),
+    ("Malicious Dispositions", ("disp 3",)),
+    ("Quarantines", ("publishing type=553648143",)),
+]
+# bytes `in` goes through the buffer protocol and is several times slower than
+# str `in`, so every marker is looked for with one alternation regex instead
+MARKER_NAMES = {
+    marker.encode(): name for name, markers in ENGINE_MARKERS for marker in markers
+}
+
+# Analyzers fed with the lines holding their markers, see analyzers.py
+ANALYZERS = [
+    TetraLockAnalyzer,
+    CloudLookupAnalyzer,
+    CacheAnalyzer,
+    HashingAnalyzer,
+    ExclusionAnalyzer,
+    # Next to the exclusions, which must not hide real detections
+    DetectionAnalyzer,
+    NetworkAnalyzer,
+    InnerScanAnalyzer,
+]
+ANALYZER_MARKERS = {}
+for index, analyzer in enumerate(ANALYZERS):
+    for marker in analyzer.markers:
+        ANALYZER_MARKERS.setdefault(marker, []).append(index)
+
+MARKERS = list(
+    dict.fromkeys([HANDLE_CREATION_MARKER, *MARKER_NAMES, *ANALYZER_MARKERS])
+)
+# Longest first, so where two markers start at the same place the one that
+# contains the other is the one found
+MARKER_REGEX = re.compile(
+    b"|".join(re.escape(m) for m in sorted(MARKERS, key=len, reverse=True))
+)
+# What a found marker stands for: its engine counters, and the analyzers of
+# every marker it contains
+MARKER_ROUTES = {
+    marker: (
+        {name for known, name in MARKER_NAMES.items() if known in marker},
+        sorted(
+            {
+                index
+                for known, indices in ANALYZER_MARKERS.items()
+                if known in marker
+                for index in indices
+            }
+        ),
+    )
+    for marker in MARKERS
+}
+# Bytes of a mapped log searched per pass of candidate_lines
+SCAN_WINDOW = 64 * 2**20
+# How far past a timed record its thread's next line is looked for.  Blocks
+# read from a stream carry this much of the next block, so the records near a
+# block's end are timed as in a mapped log.
+FOLLOW_BYTES = 2 * 2**20
+# Share of --memory-limit for the analyzers' tables, and about how many of
+# them grow with the files or processes seen
+ANALYZER_SHARE = 0.1
+ANALYZER_TABLES = 16
+
+
+# With sketch_size set, the unbounded Files, Paths and Processes counters are
+# replaced by fixed-size sketches.  With memory_limit (bytes) set instead, the
+# Files and Paths counters spill to disk and stay exact.  Extensions and
+# minutes are always exact in memory.  The analyzers' per-file tables are
+# capped at as many keys as a sketch holds, or at what ANALYZER_SHARE of the
+# memory limit holds over their tables.
+def new_aggregates(sketch_size=None, memory_limit=None, spill_dir=None):
+    def counter(share=1.0):
+        if sketch_size:
+            return SpaceSaving(sketch_size)
+        if memory_limit and share:
+            return SpillingCounter(int(memory_limit * share), spill_dir)
+        return Counter()
+
+    key_limit = sketch_size
+    if memory_limit and not sketch_size:
+        share = int(memory_limit * ANALYZER_SHARE) // ANALYZER_TABLES
+        key_limit = max(share // ENTRY_OVERHEAD, 1000)
+    return {
+        "events": 0,
+        "processes": counter(share=0),
+        "files": counter(share=0.5),
+        "extensions": Counter(),
+        "paths": counter(share=0.5),
+        "timeline": Counter(),
+        "engines": Counter(),
+        "stats": Counter(),
+        "analysis": Analysis(ANALYZERS, key_limit),
+    }
+
+
+# Folds a single HandleCreation event into the running aggregates.
+def add_event(aggregates, timestamp, file_path, process):
+    aggregates["events"] += 1
+    aggregates["processes"][process] += 1
+    aggregates["files"][file_path] += 1
+    folder, _, file_name = file_path.rpartition("\\")
+    if "." in file_name:
+        aggregates["extensions"][file_name.split(".")[-1]] += 1
+    aggregates["paths"][folder] += 1
+    # Scan rate is bucketed per minute, e.g. "Jan 22 00:00"
+    aggregates["timeline"][timestamp[:-3]] += 1
+
+
+# Yields (timestamp, file, process) for every HandleCreation event in one
+# sfc.exe.log, counting engine markers on the other lines as it goes.  lines
+# are bytes, e.g. a file opened in "rb" mode.  With records (a LineRecords)
+# given, the lines of the analyzers are extracted into it as well.
+def parse_events(lines, engines, stats=None, records=None):
+    seen = prefilter_hits = matches = 0
+    # The same few hundred processes repeat on every line
+    processes = {}
+    if records is not None:
+        analyzed, threads, timed = records.records, records.threads, records.timed
+    for line in lines:
+        seen += 1
+        found = MARKER_REGEX.search(line)
+        if found is None:
+            continue
+        if found[0] == HANDLE_CREATION_MARKER:
+            prefilter_hits += 1
+            reg = HANDLE_CREATION_REGEX.search(line)
+            if reg:
+                matches += 1
+                raw_process = reg[4]
+                process = processes.get(raw_process)
+                if process is None:
+                    process = processes[raw_process] = raw_process.decode(
+                        ENCODING, "ignore"
+                    ).rstrip()
+                file_path = reg[3].decode(ENCODING, "ignore")
+                if records is not None and reg[2]:
+                    threads[int(reg[2])] = (file_path, process)
+                yield reg[1].decode("ascii"), file_path, process
+            continue
+        markers = MARKER_REGEX.findall(line, found.start())
+        if len(markers) == 1:
+            names, indices = MARKER_ROUTES[markers[0]]
+        else:
+            # Each engine counts once per line, however many of its markers
+            # match
+            names, indices = set(), set()
+            for marker in markers:
+                names.update(MARKER_ROUTES[marker][0])
+                indices.update(MARKER_ROUTES[marker][1])
+            indices = sorted(indices)
+        for name in names:
+            engines[name] += 1
+        if records is None or not indices:
+            continue
+        header = None
+        for index in indices:
+            analyzer = ANALYZERS[index]
+            fields = analyzer.extract(line)
+            if fields is None:
+                continue
+            if header is None:
+                header = parse_header(line)
+            ticks, timestamp, thread = header
+            if ticks is None:
+                continue
+            if analyzer.timed:
+                fields += (None,)
+                timed.append((len(analyzed), seen - 1))
+            analyzed.append(
+                (index, ticks, timestamp, thread, threads.get(thread), fields)
+            )
+    if stats is not None:
+        stats["lines seen"] += seen
+        stats["prefilter hits"] += prefilter_hits
+        stats["regex matches"] += matches
+
+
+# Memory-maps a log read-only, empty files (which cannot be mapped) give b""
+@contextlib.contextmanager
+def map_log(path):
+    with open(path, "rb") as f:
+        if not os.fstat(f.fileno()).st_size:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+# (low, high) windows of about `window` bytes covering the first size bytes
+# of a buffer (all of it by default), each ending on a line boundary
+def line_windows(buffer, window=SCAN_WINDOW, size=None):
+    if size is None:
+        size = len(buffer)
+    low = 0
+    while low < size:
+        high = size
+        if low + window < size:
+            high = buffer.find(b"\n", low + window) + 1 or size
+        yield low, high
+        low = high
+
+
+# Yields only the lines of buffer[low:high] that contain a marker, in file
+# order.  Each marker is located with the buffer's own find, which runs at
+# memory speed, so noise lines are never turned into Python objects.  Callers
+# scan big buffers a window at a time to keep the hit lists small.  With
+# offsets (a list) given, the start of each line yielded is appended to it.
+def candidate_lines(buffer, low=0, high=None, offsets=None):
+    find, rfind = buffer.find, buffer.rfind
+    if high is None:
+        high = len(buffer)
+    starts = set()
+    for marker in MARKERS:
+        hit = find(marker, low, high)
+        while hit != -1:
+            starts.add(rfind(b"\n", low, hit) + 1 or low)
+            # One hit per line is enough, carry on from the next line
+            end = find(b"\n", hit, high)
+            if end == -1:
+                break
+            hit = find(marker, end, high)
+    for start in sorted(starts):
+        if offsets is not None:
+            offsets.append(start)
+        end = find(b"\n", start, high)
+        yield buffer[start : high if end == -1 else end + 1]
+
+
+# Ticks of the first line thread logged after the line starting at start,
+# looked for up to stop, or None.  Lines are found by their " [thread]"
+# header and checked with parse_header, so the thread's next line counts
+# whether it holds a marker or not.
+def next_thread_line(buffer, start, thread, stop):
+    needle = b" [%d]" % thread
+    end = buffer.find(b"\n", start, stop)
+    while end != -1:
+        hit = buffer.find(needle, end, stop)
+        if hit == -1:
+            return None
+        line_start = buffer.rfind(b"\n", end, hit) + 1
+        ticks, _, line_thread = parse_header(buffer[line_start : hit + len(needle)])
+        if line_thread == thread:
+            return ticks
+        end = buffer.find(b"\n", hit, stop)
+    return None
+
+
+# Ends the timed records of one scan: offsets are the starts of the lines it
+# saw, the thread's next line is looked for within FOLLOW_BYTES of each
+def finish_timed(buffer, records, offsets):
+    for position, line in records.timed:
+        start = offsets[line]
+        thread = records.records[position][3]
+        stop = min(start + FOLLOW_BYTES, len(buffer))
+        records.finish(position, next_thread_line(buffer, start, thread, stop))
+    records.timed = []
+
+
+# Newlines counted a chunk at a time, for the "lines seen" statistic
+def count_lines(buffer, chunk_size=16 * 2**20):
+    lines = sum(
+        buffer[offset : offset + chunk_size].count(b"\n")
+        for offset in range(0, len(buffer), chunk_size)
+    )
+    # A last line without a trailing newline still counts
+    if len(buffer) and buffer[-1:] != b"\n":
+        lines += 1
+    return lines
+
+
+# Folds parsed events into the aggregates, or into an EventStore when one is
+# given (the Counters are then filled from the store).
+def add_events(events, aggregates, store=None):
+    if store is not None:
+        for event in events:
+            store.add(*event)
+        return aggregates
+    for event in events:
+        add_event(aggregates, *event)
+    return aggregates
+
+
+# Streams the lines of one sfc.exe.log into the aggregates
+def parse_log(lines, aggregates, store=None):
+    events = parse_events(lines, aggregates["engines"], aggregates["stats"])
+    return add_events(events, aggregates, store)
+
+
+# Parses a whole buffer of log lines (a mapped file or a block of one),
+# scanning only the lines that hold a marker.  Analyzer records go to the
+# aggregates' Analysis after each window, or into records when given (a parser
+# process sends them to the parent, which absorbs them in log order).  ahead
+# is the start of the next block, only read to time the records near the end.
+def parse_buffer(buffer, aggregates, store=None, records=None, ahead=b""):
+    stats = Counter()
+    size = len(buffer)
+    if ahead:
+        buffer += ahead
+    for low, high in line_windows(buffer, size=size):
+        window_records = LineRecords() if records is None else records
+        offsets = []
+        events = parse_events(
+            candidate_lines(buffer, low, high, offsets),
+            aggregates["engines"],
+            stats,
+            window_records,
+        )
+        add_events(events, aggregates, store)
+        finish_timed(buffer, window_records, offsets)
+        if records is None:
+            aggregates["analysis"].absorb(window_records)
+    # parse_events only saw the candidate lines
+    stats["lines seen"] = count_lines(buffer[:size] if ahead else buffer)
+    aggregates["stats"].update(stats)
+    return aggregates
+
+
+# Same as parse_log for a log on disk, scanning the memory-mapped file
+def parse_mapped_log(path, aggregates, store=None):
+    with map_log(path) as mapped:
+        parse_buffer(mapped, aggregates, store)
+    aggregates["analysis"].end_source()
+    return aggregates
+
+
+# Adds partial aggregates (e.g. from a parser process) into the running ones.
+# Keys are added one by one so sketches and spilling counters keep their
+# bookkeeping.
+def merge_aggregates(aggregates, partial):
+    for name, counts in partial.items():
+        if name == "events":
+            aggregates["events"] += counts
+            continue
+        if name == "analysis":
+            aggregates["analysis"].merge(counts)
+            continue
+        target = aggregates[name]
+        for key, count in counts.items():
+            target[key] += count
+    return aggregates
+
+
+# Fills the Counters and timeline of the aggregates from an EventStore,
+# optionally for a slice of it only
+def aggregates_from_store(store, aggregates, selection=None):
+    aggregates.update(store.counters(selection))
+    aggregates["timeline"] = store.timeline(selection)
+    aggregates["events"] = sum(aggregates["processes"].values())
+    return aggregates
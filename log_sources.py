@@ -0,0 +1,217 @@
+import re
+
+from analyzers import parse_header
+from exclusions import POLICY_NAME, PolicyExclusions
+from html_report import minute_key
+
+"""
+Diagnostic members besides the sfc.exe.log files.
+
+Each LogSource declares the members it reads with a regex on their path in
+the diagnostic (with / separators).  Whatever reads the diagnostic for its
+sfc.exe.log files (a zip or 7z listing, a pipe, a salvaged zip or a directory)
+hands the other members to the sources in the same pass, so adding a source
+never reads the archive again.  Sources give settings to the analyzers (the
+policy exclusions) and sections of their own to the summary and the report.
+"""
+
+
+READ_SIZE = 4 * 2**20
+ENCODING = "utf-8"
+# Lines of systeminfo.txt shown, in this order
+SYSTEM_INFO_KEYS = (
+    "Host Name",
+    "OS Name",
+    "OS Version",
+    "System Manufacturer",
+    "System Model",
+    "System Type",
+    "Processor(s)",
+    "Total Physical Memory",
+    "Available Physical Memory",
+    "System Boot Time",
+    "Time Zone",
+)
+
+
+# Base class, see the module docstring
+class LogSource:
+    # Heading in the summary and the HTML report
+    name = ""
+    # Matched against the member's path, e.g. "Cisco/AMP/policy.xml"
+    pattern = None
+
+    # Reads one matching member from a binary stream
+    def read(self, name, stream):
+        pass
+
+    # Passed to the analyzers' configure, e.g. {"policy": ...}
+    def settings(self):
+        return {}
+
+    # [(title, column headings, rows)] for the summary and the HTML report
+    def sections(self):
+        return []
+
+
+class PolicySource(LogSource):
+    name = "Policy"
+    pattern = re.compile(rf"(?:^|/){re.escape(POLICY_NAME)}$", re.IGNORECASE)
+
+    def __init__(self):
+        self.data = None
+
+    def read(self, name, stream):
+        # A diagnostic holds one policy, the first found is kept
+        if self.data is None:
+            self.data = stream.read()
+
+    def settings(self):
+        return {"policy": self.data and PolicyExclusions.parse(self.data)}
+
+
+# Logs of the other connector components, e.g. iptray.exe.log.1
+class ComponentLogSource(LogSource):
+    name = "Component Logs"
+    pattern = re.compile(
+        r"(?:^|/)(?!sfc\.exe\.log)([^/]+\.log)(?:\.\d+)?$", re.IGNORECASE
+    )
+
+    def __init__(self):
+        # component -> [logs, bytes, lines, first timestamp, last timestamp]
+        self.components = {}
+
+    def read(self, name, stream):
+        component = self.pattern.search(name)[1]
+        row = self.components.setdefault(component, [0, 0, 0, None, None])
+        row[0] += 1
+        first = last = None
+        rest = b""
+        while True:
+            data = stream.read(READ_SIZE)
+            if not data:
+                break
+            row[1] += len(data)
+            row[2] += data.count(b"\n")
+            lines = (rest + data).split(b"\n")
+            rest = lines.pop()
+            if first is None:
+                for line in lines:
+                    first = parse_header(line)[1]
+                    if first is not None:
+                        break
+            for line in reversed(lines):
+                timestamp = parse_header(line)[1]
+                if timestamp is not None:
+                    last = timestamp
+                    break
+        if rest:
+            row[2] += 1
+            last = parse_header(rest)[1] or last
+        # Rotated logs can come in any order
+        if first is not None and (
+            row[3] is None or minute_key(first) < minute_key(row[3])
+        ):
+            row[3] = first
+        if last is not None and (
+            row[4] is None or minute_key(last) > minute_key(row[4])
+        ):
+            row[4] = last
+
+    def sections(self):
+        if not self.components:
+            return []
+        return [
+            (
+                "Component Logs",
+                ("Component", "Logs", "MB", "Lines", "First", "Last"),
+                [
+                    (
+                        component,
+                        logs,
+                        round(size / 2**20, 2),
+                        lines,
+                        first or "",
+                        last or "",
+                    )
+                    for component, (logs, size, lines, first, last) in sorted(
+                        self.components.items()
+                    )
+                ],
+            )
+        ]
+
+
+# The output of Windows' systeminfo command
+class SystemInfoSource(LogSource):
+    name = "System Information"
+    pattern = re.compile(r"(?:^|/)systeminfo\.txt$", re.IGNORECASE)
+
+    def __init__(self):
+        self.values = {}
+
+    def read(self, name, stream):
+        data = stream.read()
+        if data.startswith((b"\xff\xfe", b"\xfe\xff")):
+            text = data.decode("utf-16", "ignore")
+        else:
+            text = data.decode(ENCODING, "ignore")
+        for line in text.splitlines():
+            key, _, value = line.partition(":")
+            key = key.strip()
+            if key in SYSTEM_INFO_KEYS and key not in self.values:
+                self.values[key] = value.strip()
+
+    def sections(self):
+        if not self.values:
+            return []
+        return [
+            (
+                "System Information",
+                ("", "Value"),
+                [
+                    (key, self.values[key])
+                    for key in SYSTEM_INFO_KEYS
+                    if key in self.values
+                ],
+            )
+        ]
+
+
+# Each member is read by the first source whose pattern it matches
+LOG_SOURCES = [PolicySource, SystemInfoSource, ComponentLogSource]
+
+
+class LogSources:
+    def __init__(self, sources=LOG_SOURCES):
+        self.sources = [source() for source in sources]
+
+    def find(self, name):
+        name = name.replace("\\", "/")
+        for source in self.sources:
+            if source.pattern.search(name):
+                return source
+        return None
+
+    def wants(self, name):
+        return self.find(name) is not None
+
+    def feed(self, name, stream):
+        source = self.find(name)
+        if source is not None:
+            source.read(name.replace("\\", "/"), stream)
+
+    def settings(self):
+        settings = {}
+        for source in self.sources:
+            settings.update(source.settings())
+        return settings
+
+    # [(source name, sections)] for the sources that found anything
+    def sections(self):
+        found = []
+        for source in self.sources:
+            sections = source.sections()
+            if sections:
+                found.append((source.name, sections))
+        return found
@@ -0,0 +1,215 @@
+import csv
+import os
+import re
+import struct
+from collections import Counter
+
+from analyzers import Analyzer, minute_groups
+from html_report import minute_key
+
+r"""
+Network connections seen by network flow monitoring.
+
+    NFMMemCache::Get: rip: 16885952, rport: 443, process: \\?\C:\...
+
+rip is the remote IPv4 address as a little-endian integer.  Connections are
+counted per remote IP, remote port, process (the one on the line, or that of
+the thread's last HandleCreation) and minute.  Every distinct IP keeps the
+same few counters, and the integers are only turned into dotted addresses,
+all at once, when the report is written.
+"""
+
+
+NFM_REGEX = re.compile(
+    rb"NFMMemCache::Get: rip: (\d+)(?:, rport: (\d+))?(?:, process: (\\\\\?\\[^\r\n]+))?"
+)
+ENCODING = "utf-8"
+MAX_IP = 2**32 - 1
+UNKNOWN = "(unknown)"
+TIME_ROWS = 48
+TOP_IPS = 15
+TOP_PORTS_PER_IP = 3
+TOP_PROCESSES = 10
+TOP_PORTS = 10
+CSV_NAME = "-remote-ips.csv"
+
+
+# {rip: "a.b.c.d"} for many little-endian rip integers, packed in one go
+def decode_ips(rips):
+    rips = list(rips)
+    data = struct.pack(f"<{len(rips)}L", *rips)
+    return {
+        rip: "{}.{}.{}.{}".format(*data[offset : offset + 4])
+        for rip, offset in zip(rips, range(0, len(data), 4))
+    }
+
+
+class NetworkAnalyzer(Analyzer):
+    name = "Network Connections"
+    markers = (b"NFMMemCache::Get: rip: ",)
+
+    def __init__(self):
+        # Per remote IP (as its rip integer): connections, timestamps of the
+        # first and last, and connections per (rip, port)
+        self.connections = Counter()
+        self.first_seen = {}
+        self.last_seen = {}
+        self.ports = Counter()
+        self.processes = Counter()
+        self.minutes = Counter()
+        self.invalid = 0
+        # First and last timestamps in the current log.  Logs are not always
+        # read oldest first, so they are folded in when the log ends.
+        self.source_first = {}
+        self.source_last = {}
+
+    @staticmethod
+    def extract(line):
+        reg = NFM_REGEX.search(line)
+        if reg is None:
+            return None
+        rip = int(reg[1])
+        port = reg[2] and int(reg[2])
+        process = reg[3] and reg[3].decode(ENCODING, "ignore").rstrip()
+        return rip, port, process
+
+    def consume(self, ticks, timestamp, thread, holder, fields):
+        rip, port, process = fields
+        if rip > MAX_IP:
+            self.invalid += 1
+            return
+        if process is None:
+            process = UNKNOWN if holder is None else holder[1]
+        if rip not in self.source_first:
+            self.source_first[rip] = timestamp
+        self.source_last[rip] = timestamp
+        self.connections[rip] += 1
+        if port is not None:
+            self.ports[(rip, port)] += 1
+        self.processes[process] += 1
+        self.minutes[timestamp[:-3]] += 1
+
+    # Keeps the earlier of the first and the later of the last timestamps
+    def add_seen(self, first_seen, last_seen):
+        for rip, timestamp in first_seen.items():
+            first = self.first_seen.get(rip)
+            if first is None or minute_key(timestamp) < minute_key(first):
+                self.first_seen[rip] = timestamp
+        for rip, timestamp in last_seen.items():
+            last = self.last_seen.get(rip)
+            if last is None or minute_key(timestamp) > minute_key(last):
+                self.last_seen[rip] = timestamp
+
+    def end_source(self):
+        self.add_seen(self.source_first, self.source_last)
+        self.source_first, self.source_last = {}, {}
+
+    def merge(self, other):
+        self.add_seen(other.first_seen, other.last_seen)
+        for name in ("connections", "ports", "processes", "minutes"):
+            getattr(self, name).update(getattr(other, name))
+        self.invalid += other.invalid
+
+    # {rip: [(port, connections)]}, most used ports first
+    def ports_by_ip(self):
+        ports = {}
+        for (rip, port), count in self.ports.items():
+            ports.setdefault(rip, []).append((port, count))
+        for counts in ports.values():
+            counts.sort(key=lambda item: (-item[1], item[0]))
+        return ports
+
+    def over_time(self):
+        minutes = sorted(self.minutes, key=minute_key)
+        # Minute each IP was first seen in -> IPs
+        new_ips = Counter(timestamp[:-3] for timestamp in self.first_seen.values())
+        return [
+            (
+                label,
+                sum(self.minutes[m] for m in group),
+                sum(new_ips[m] for m in group),
+            )
+            for label, group in minute_groups(minutes, TIME_ROWS)
+        ]
+
+    def sections(self):
+        if not self.connections and not self.invalid:
+            return []
+        total = sum(self.connections.values())
+        top = sorted(self.connections.items(), key=lambda item: (-item[1], item[0]))
+        top = top[:TOP_IPS]
+        addresses = decode_ips(rip for rip, _ in top)
+        ports = self.ports_by_ip()
+        remote_ports = Counter()
+        for (_, port), count in self.ports.items():
+            remote_ports[port] += count
+        summary = [
+            ("connections", total),
+            ("remote IPs", len(self.connections)),
+            ("processes", len(self.processes)),
+            ("minutes with connections", len(self.minutes)),
+            ("connections per minute, peak", max(self.minutes.values(), default=0)),
+        ]
+        if self.invalid:
+            summary.append(("rip values out of range", self.invalid))
+        return [
+            ("Network Connections", ("", "Connections"), summary),
+            (
+                "Top Remote IPs",
+                ("Remote IP", "Connections", "Ports", "First seen", "Last seen"),
+                [
+                    (
+                        addresses[rip],
+                        count,
+                        ", ".join(
+                            f"{port} ({n})"
+                            for port, n in ports.get(rip, [])[:TOP_PORTS_PER_IP]
+                        ),
+                        self.first_seen[rip],
+                        self.last_seen[rip],
+                    )
+                    for rip, count in top
+                ],
+            ),
+            (
+                "Network Connections by Process",
+                ("Process", "Connections"),
+                sorted(self.processes.items(), key=lambda item: (-item[1], item[0]))[
+                    :TOP_PROCESSES
+                ],
+            ),
+            (
+                "Network Connections by Remote Port",
+                ("Port", "Connections"),
+                sorted(remote_ports.items(), key=lambda item: (-item[1], item[0]))[
+                    :TOP_PORTS
+                ],
+            ),
+            (
+                "Network Connections over Time",
+                ("Minute", "Connections", "New remote IPs"),
+                self.over_time(),
+            ),
+        ]
+
+    def export(self, results_dir):
+        if not self.connections:
+            return
+        rows = sorted(self.connections.items(), key=lambda item: (-item[1], item[0]))
+        addresses = decode_ips(self.connections)
+        ports = self.ports_by_ip()
+        with open(
+            os.path.join(results_dir, CSV_NAME), "w", newline="", encoding="utf-8-sig"
+        ) as f:
+            writer = csv.writer(f)
+            writer.writerow(["remote_ip", "connections", "ports", "first", "last"])
+            for rip, count in rows:
+                writer.writerow(
+                    [
+                        addresses[rip],
+                        count,
+                        " ".join(f"{port}:{n}" for port, n in ports.get(rip, [])),
+                        self.first_seen[rip],
+                        self.last_seen[rip],
+                    ]
+                )
@@ -0,0 +1,213 @@
+import multiprocessing
+import queue
+import threading
+import zipfile
+
+from analyzers import Analysis, LineRecords
+from log_parser import (
+    ANALYZERS,
+    FOLLOW_BYTES,
+    merge_aggregates,
+    new_aggregates,
+    parse_buffer,
+)
+from sevenzip import SevenZipFile
+
+"""
+Parallel parsing pipeline.
+
+Every log source (a zip member, the newest-version members of a 7z archive or
+an unpacked log) gets a decompressor thread that cuts its stream into
+line-aligned blocks.  The blocks go through one bounded queue to parser
+processes, which send back partial aggregates that are merged as they arrive.
+Decompression and parsing overlap.
+
+Blocks are numbered per log so the analyzer records they produce can be
+absorbed in log order, whatever order the parsers finish them in.  A block
+counts against `jobs * BLOCKS_PER_JOB` from the moment it is cut until its
+records are absorbed, so the blocks waiting to be parsed, the results waiting
+to be merged and the records waiting for an earlier block of their log stay
+bounded whatever the log sizes.  With the event store, each block's events
+come back with its result and are bounded the same way.
+"""
+
+
+BLOCK_SIZE = 4 * 2**20
+QUEUE_BLOCKS_PER_JOB = 2
+# Blocks between the decompressors and the parent's merge, per parser process
+BLOCKS_PER_JOB = 4
+
+
+# Sources are functions returning an iterator of binary streams, opened in
+# the decompressor thread so each thread has its own file handle
+def zip_member_source(archive_path, name):
+    def source():
+        with zipfile.ZipFile(archive_path) as archive, archive.open(name) as stream:
+            yield stream
+
+    return source
+
+
+# 7z members share solid folders, so they are decoded by a single thread
+def sevenzip_source(archive_path, names):
+    def source():
+        with SevenZipFile(archive_path) as archive:
+            for _, stream in archive.open_members(names):
+                yield stream
+
+    return source
+
+
+def file_source(path):
+    def source():
+        with open(path, "rb") as stream:
+            yield stream
+
+    return source
+
+
+# Cuts a stream into blocks that end on a line boundary
+def cut_blocks(stream, block_size=BLOCK_SIZE):
+    rest = b""
+    while True:
+        data = stream.read(block_size)
+        if not data:
+            break
+        data = rest + data
+        cut = data.rfind(b"\n") + 1
+        rest = data[cut:]
+        if cut:
+            yield data[:cut]
+    if rest:
+        yield rest
+
+
+# (block, ahead) pairs: the blocks of a stream, each with the first
+# FOLLOW_BYTES of the next one for parse_buffer.  Blocks are larger than
+# that, so one block ahead is always enough.
+def read_blocks(stream, block_size=BLOCK_SIZE):
+    previous = None
+    for block in cut_blocks(stream, block_size):
+        if previous is not None:
+            yield previous, block[:FOLLOW_BYTES]
+        previous = block
+    if previous is not None:
+        yield previous, b""
+
+
+# Queues (log, block number, block, ahead) tasks, a log being (source, stream)
+# numbers.  Each block takes one of the slots, which the parent gives back
+# once the block's records are absorbed.
+def decompress(source_index, source, tasks, slots, errors):
+    try:
+        for stream_index, stream in enumerate(source()):
+            for index, (block, ahead) in enumerate(read_blocks(stream)):
+                slots.acquire()
+                tasks.put(((source_index, stream_index), index, block, ahead))
+    except Exception as e:
+        errors.append(e)
+
+
+# Collects a block's events in a parser process for the parent's EventStore
+class EventList(list):
+    def add(self, *event):
+        self.append(event)
+
+
+# Parser process: parses blocks until it gets None, then sends None back
+def parse_worker(tasks, results, keep_events=False):
+    try:
+        for log, index, block, ahead in iter(tasks.get, None):
+            events = EventList() if keep_events else None
+            records = LineRecords()
+            partial = parse_buffer(block, new_aggregates(), events, records, ahead)
+            # The analyzers' results travel as records, not as an Analysis
+            del partial["analysis"]
+            results.put((log, index, partial, events, records))
+    except Exception as e:
+        results.put(e)
+    results.put(None)
+
+
+# With targets (aggregates per source, e.g. per connector version) given, the
+# results of each source go to its own target instead of aggregates
+def parse_parallel(sources, aggregates, jobs, store=None, targets=None):
+    tasks = multiprocessing.Queue(maxsize=jobs * QUEUE_BLOCKS_PER_JOB)
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(
+            target=parse_worker, args=(tasks, results, store is not None), daemon=True
+        )
+        for _ in range(jobs)
+    ]
+    slots = threading.Semaphore(jobs * BLOCKS_PER_JOB)
+    errors = []
+    decompressors = [
+        threading.Thread(
+            target=decompress,
+            args=(index, source, tasks, slots, errors),
+            daemon=True,
+        )
+        for index, source in enumerate(sources)
+    ]
+    # Per log: its own Analysis, the next block number to absorb and the
+    # records of blocks that arrived ahead of it
+    analyses, next_blocks, waiting = {}, {}, {}
+
+    # Tells the parsers to stop once every source has been queued
+    def finish():
+        for thread in decompressors:
+            thread.join()
+        for _ in workers:
+            tasks.put(None)
+
+    for worker in workers:
+        worker.start()
+    for thread in decompressors:
+        thread.start()
+    threading.Thread(target=finish, daemon=True).start()
+
+    try:
+        running = jobs
+        while running:
+            try:
+                result = results.get(timeout=1)
+            except queue.Empty:
+                if not any(worker.is_alive() for worker in workers):
+                    raise RuntimeError("A parser process exited unexpectedly")
+                continue
+            if result is None:
+                running -= 1
+            elif isinstance(result, Exception):
+                raise result
+            else:
+                log, index, partial, events, records = result
+                merge_aggregates(targets[log[0]] if targets else aggregates, partial)
+                for event in events or ():
+                    store.add(*event)
+                blocks = waiting.setdefault(log, {})
+                blocks[index] = records
+                target = targets[log[0]] if targets else aggregates
+                analysis = analyses.get(log)
+                if analysis is None:
+                    key_limit = target["analysis"].key_limit
+                    analysis = analyses[log] = Analysis(ANALYZERS, key_limit)
+                index = next_blocks.get(log, 0)
+                while index in blocks:
+                    analysis.absorb(blocks.pop(index))
+                    slots.release()
+                    index += 1
+                next_blocks[log] = index
+        for worker in workers:
+            worker.join()
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+    if errors:
+        raise errors[0]
+    for log in sorted(analyses):
+        analyses[log].end_source()
+        target = targets[log[0]] if targets else aggregates
+        target["analysis"].merge(analyses[log])
+    return aggregates
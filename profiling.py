@@ -0,0 +1,213 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+"""
+Stage timing helpers shared by the benchmark harness and --profile.
+
+A StageTimer accumulates wall time per named stage and samples the process
+resident set size in a background thread, so the peak RSS can be attributed to
+the stage that was running when it happened.
+"""
+
+
+RSS_SAMPLE_INTERVAL = 0.01
+
+
+def get_rss():
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        ctypes.windll.psapi.GetProcessMemoryInfo(
+            ctypes.windll.kernel32.GetCurrentProcess(),
+            ctypes.byref(counters),
+            counters.cb,
+        )
+        return counters.WorkingSetSize
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # No /proc (macOS): fall back to the high-water mark, reported in bytes there
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class StageTimer:
+    def __init__(self, sample_rss=True):
+        self.seconds = {}
+        self.peak_rss = {}
+        self.current = None
+        self._stop = threading.Event()
+        self._sampler = None
+        if sample_rss:
+            self._sampler = threading.Thread(target=self._sample, daemon=True)
+            self._sampler.start()
+
+    def _record_rss(self):
+        stage = self.current
+        if stage is not None:
+            rss = get_rss()
+            if rss > self.peak_rss.get(stage, 0):
+                self.peak_rss[stage] = rss
+
+    def _sample(self):
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL):
+            self._record_rss()
+
+    # Time spent in a stage accumulates, so a stage may be entered many times
+    # (e.g. alternating parsing and aggregation batches).
+    @contextmanager
+    def stage(self, name):
+        previous = self.current
+        self.current = name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0.0) + (
+                time.perf_counter() - start
+            )
+            if self._sampler is not None:
+                self._record_rss()
+            self.current = previous
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+
+class Profiler:
+    """
+    Collects the numbers behind --profile: wall time, tracemalloc peak and RSS
+    peak per stage, parser counters, and an optional cProfile of the parse loop.
+    When disabled every method is a no-op so main() can call it unconditionally.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.tracemalloc_peak = {}
+        self.counters = {}
+        self.parse_profile = None
+        self.timer = StageTimer() if enabled else None
+        if enabled:
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        tracemalloc.reset_peak()
+        with self.timer.stage(name):
+            yield
+        peak = tracemalloc.get_traced_memory()[1]
+        self.tracemalloc_peak[name] = max(self.tracemalloc_peak.get(name, 0), peak)
+
+    # Runs the block under cProfile, kept separate from stage() so only the
+    # parse loop pays for it
+    @contextmanager
+    def profile(self):
+        if not self.enabled:
+            yield
+            return
+        self.parse_profile = cProfile.Profile()
+        self.parse_profile.enable()
+        try:
+            yield
+        finally:
+            self.parse_profile.disable()
+
+    def add_counters(self, counters):
+        if self.enabled:
+            for name, value in counters.items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def get_results(self):
+        return {
+            "stages": {
+                name: {
+                    "seconds": round(seconds, 4),
+                    "tracemalloc_peak_mb": round(
+                        self.tracemalloc_peak.get(name, 0) / 2**20, 2
+                    ),
+                    "peak_rss_mb": round(self.timer.peak_rss.get(name, 0) / 2**20, 1),
+                }
+                for name, seconds in self.timer.seconds.items()
+            },
+            "counters": self.counters,
+        }
+
+    # Writes -profile.json, -profile.txt and -parse.pstats to the results directory
+    def write(self, results_dir):
+        if not self.enabled:
+            return []
+        self.timer.stop()
+        tracemalloc.stop()
+        results = self.get_results()
+        written = []
+
+        json_path = os.path.join(results_dir, "-profile.json")
+        with open(json_path, "w") as f:
+            json.dump(results, f, indent=2)
+        written.append(json_path)
+
+        text_path = os.path.join(results_dir, "-profile.txt")
+        with open(text_path, "w") as f:
+            f.write("Stages:\n")
+            f.write(
+                "{0:<14}{1:>10}{2:>18}{3:>12}\n".format(
+                    "stage", "seconds", "tracemalloc MB", "peak MB"
+                )
+            )
+            for name, numbers in results["stages"].items():
+                f.write(
+                    "{0:<14}{1:>10}{2:>18}{3:>12}\n".format(
+                        name,
+                        numbers["seconds"],
+                        numbers["tracemalloc_peak_mb"],
+                        numbers["peak_rss_mb"],
+                    )
+                )
+            f.write("\nCounters:\n")
+            for name, value in results["counters"].items():
+                f.write("{0:>12} {1}\n".format(value, name))
+            if self.parse_profile is not None:
+                f.write("\nParse loop (top 25 by cumulative time):\n")
+                stream = io.StringIO()
+                stats = pstats.Stats(self.parse_profile, stream=stream)
+                stats.sort_stats("cumulative").print_stats(25)
+                f.write(stream.getvalue())
+        written.append(text_path)
+
+        if self.parse_profile is not None:
+            pstats_path = os.path.join(results_dir, "-parse.pstats")
+            self.parse_profile.dump_stats(pstats_path)
+            written.append(pstats_path)
+        return written
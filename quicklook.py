@@ -0,0 +1,212 @@
+import bisect
+import math
+import os
+import time
+from collections import Counter
+
+from log_parser import parse_events
+
+"""
+Quick-look sampling mode.
+
+Reads evenly spaced blocks of the extracted logs, realigned to line boundaries,
+through the normal HandleCreation regex and extrapolates the top Processes,
+Extensions and Paths with 95% confidence intervals.  Sampling is refined in
+rounds (each round fills the gaps left by the previous ones) until the ranking
+stops changing, the time budget runs out or every byte has been read.  Blocks
+only count the lines no earlier block read, so once the logs are fully
+covered the estimates are exact.
+
+The logs must be extracted first, since deflated zip members cannot be read
+at an offset without decompressing everything before it.  The budget counts
+from `start`, which the caller sets before extracting, so the extraction time
+is part of it.  The first round is always read, even once extraction alone
+has used up the budget.
+"""
+
+
+BLOCK_SIZE = 64 * 1024
+FIRST_ROUND_BLOCKS = 32
+DEFAULT_TIME_BUDGET = 5.0
+DEFAULT_TOP = 10
+# Normal quantile for a 95% confidence interval
+Z_95 = 1.96
+DIMENSIONS = ["Processes", "Extensions", "Paths"]
+
+
+# n-th term of the base-2 van der Corput sequence: 0.5, 0.25, 0.75, 0.125, ...
+# Every prefix of it is spread evenly over [0, 1), so each round of sampling
+# lands in the middle of the gaps left by the previous rounds.
+def van_der_corput(n):
+    fraction, denominator = 0.0, 1
+    while n:
+        denominator *= 2
+        n, remainder = divmod(n, 2)
+        fraction += remainder / denominator
+    return fraction
+
+
+# Reads the block starting at offset, dropping the partial first line and
+# finishing the last one so only whole lines reach the parser.
+def read_block(f, offset, block_size=BLOCK_SIZE):
+    f.seek(offset)
+    data = f.read(block_size)
+    if offset:
+        newline = data.find(b"\n")
+        data = data[newline + 1 :] if newline != -1 else b""
+    if data and not data.endswith(b"\n"):
+        data += f.readline()
+    return data
+
+
+# Byte ranges of one log already counted, kept sorted and disjoint.  Blocks
+# hold whole lines, so the ranges start and end on line boundaries.
+class Coverage:
+    def __init__(self):
+        self.starts, self.ends = [], []
+        self.covered = 0
+
+    # Marks [start, end) as read and returns the parts of it that were not
+    def add(self, start, end):
+        if start >= end:
+            return []
+        starts, ends = self.starts, self.ends
+        first = bisect.bisect_left(ends, start)
+        last = bisect.bisect_right(starts, end)
+        gaps = []
+        position = start
+        for index in range(first, last):
+            if starts[index] > position:
+                gaps.append((position, starts[index]))
+            position = max(position, ends[index])
+        if position < end:
+            gaps.append((position, end))
+        if first < last:
+            start, end = min(start, starts[first]), max(end, ends[last - 1])
+        starts[first:last] = [start]
+        ends[first:last] = [end]
+        self.covered += sum(gap_end - gap_start for gap_start, gap_end in gaps)
+        return gaps
+
+
+def count_block(data):
+    processes, extensions, paths = Counter(), Counter(), Counter()
+    for _, file_path, process in parse_events(data.splitlines(), Counter()):
+        processes[process] += 1
+        folder, _, file_name = file_path.rpartition("\\")
+        if "." in file_name:
+            extensions[file_name.split(".")[-1]] += 1
+        paths[folder] += 1
+    return {"Processes": processes, "Extensions": extensions, "Paths": paths}
+
+
+# Ratio estimate of an item's total over all logs, with the half-width of its
+# 95% confidence interval.  Blocks are treated as clusters of lines sampled
+# without replacement from total_bytes; they never overlap, so the interval
+# only closes once every byte was read.
+def estimate(blocks, name, item, total_bytes):
+    sampled = sum(size for size, _ in blocks)
+    if not sampled:
+        return 0, float("inf")
+    hits = [counts[name][item] for _, counts in blocks]
+    if sampled >= total_bytes:
+        return sum(hits), 0
+    ratio = sum(hits) / sampled
+    n = len(blocks)
+    if n < 2:
+        return ratio * total_bytes, float("inf")
+    mean_size = sampled / n
+    residuals = sum(
+        (hit - ratio * size) ** 2 for hit, (size, _) in zip(hits, blocks)
+    ) / (n - 1)
+    coverage = min(sampled / total_bytes, 1.0)
+    variance = total_bytes**2 * (1 - coverage) * residuals / (n * mean_size**2)
+    return ratio * total_bytes, Z_95 * math.sqrt(variance)
+
+
+def get_ranking(totals, top):
+    return {
+        name: [item for item, _ in totals[name].most_common(top)] for name in totals
+    }
+
+
+def quick_look(log_paths, time_budget=DEFAULT_TIME_BUDGET, top=DEFAULT_TOP, start=None):
+    if start is None:
+        start = time.perf_counter()
+    setup = time.perf_counter() - start
+    logs = [(path, os.path.getsize(path)) for path in log_paths]
+    logs = [(path, size) for path, size in logs if size]
+    total_bytes = sum(size for _, size in logs)
+
+    handles = {path: open(path, "rb") for path, _ in logs}
+    coverage = {path: Coverage() for path, _ in logs}
+    # (bytes, counts) of the blocks with lines not read before
+    blocks = []
+    reads = 0
+    totals = {name: Counter() for name in DIMENSIONS}
+    previous = None
+    rounds = 0
+    reason = "no log data"
+    try:
+        while logs:
+            rounds += 1
+            # Round sizes double, so each round halves the spacing between blocks
+            round_size = FIRST_ROUND_BLOCKS if rounds == 1 else reads
+            for index in range(reads, reads + round_size):
+                reads += 1
+                # Map the fraction onto the logs laid end to end
+                position = int(van_der_corput(index) * total_bytes)
+                for path, size in logs:
+                    if position < size:
+                        break
+                    position -= size
+                handle = handles[path]
+                data = read_block(handle, position)
+                # Only the lines no earlier block counted
+                end = handle.tell()
+                offset = end - len(data)
+                gaps = coverage[path].add(offset, end)
+                data = b"".join(data[a - offset : b - offset] for a, b in gaps)
+                if data:
+                    counts = count_block(data)
+                    blocks.append((len(data), counts))
+                    for name in DIMENSIONS:
+                        totals[name].update(counts[name])
+                if rounds > 1 and time.perf_counter() - start >= time_budget:
+                    break
+
+            ranking = get_ranking(totals, top)
+            if sum(c.covered for c in coverage.values()) >= total_bytes:
+                reason = "logs fully sampled"
+                break
+            if time.perf_counter() - start >= time_budget:
+                reason = "time budget reached"
+                break
+            if ranking == previous:
+                reason = "ranking stable"
+                break
+            previous = ranking
+    finally:
+        for handle in handles.values():
+            handle.close()
+
+    sampled = sum(size for size, _ in blocks)
+    sections = {}
+    for name in DIMENSIONS:
+        rows = []
+        for item, _ in totals[name].most_common(top):
+            total, margin = estimate(blocks, name, item, total_bytes)
+            rows.append(
+                (item, round(total), round(margin) if math.isfinite(margin) else "?")
+            )
+        sections[name] = rows
+    return {
+        "sections": sections,
+        "blocks": reads,
+        "rounds": rounds,
+        "sampled_bytes": sampled,
+        "total_bytes": total_bytes,
+        "seconds": round(time.perf_counter() - start, 2),
+        "setup_seconds": round(setup, 2),
+        "reason": reason,
+    }
@@ -2,15 +2,32 @@ from pathlib import Path
 import os
 import tkinter as tk
 import tkinter.filedialog as fd
+import sqlite3
 import sys
+import time
+import webbrowser
 from tkinter import (
     Toplevel,
     Label,
     IntVar,
+    StringVar,
+    Entry,
     Scrollbar,
     Frame,
 )
 
+from detections import read_detections
+from Diag_Analyzer_v2 import log_window
+from event_db import (
+    DB_NAME,
+    GROUPS,
+    format_table,
+    open_event_db,
+    query_events,
+    run_sql,
+)
+from event_store import EventStore
+
 
 def open_popup(current_window, parent_window):
     # Hide results window
@@ -32,7 +49,7 @@ def get_section_from_summary(subheading, filepath):
 
     # Read and extract section
     lines = []
-    with open(filepath, "r") as f:
+    with open(filepath, "r", encoding="utf-8") as f:
         in_section = False
         for line in f:
             if line.strip() == subheading:
@@ -68,7 +85,7 @@ def get_latest_summary_path():
     return summary_path
 
 
-def launch_results_window(file_path, options, parent_window=None):
+def launch_results_window(file_path, options, parent_window=None, source=None):
     result_win = Toplevel(parent_window)
     result_win.title("Results")
     result_win.geometry("1300x863")  # Increased width
@@ -139,7 +156,7 @@ def launch_results_window(file_path, options, parent_window=None):
         for heading in active_sections
     )
 
-    Label(
+    summary_label = Label(
         scrollable_frame,
         text=summary_text or "No results to display for selected options.",
         bg="#FFFFFF",
@@ -147,7 +164,14 @@ def launch_results_window(file_path, options, parent_window=None):
         font=("CiscoSansTT", 10),
         wraplength=1150,  # Adjusted wraplength
         justify="left",
-    ).pack(pady=10)
+    )
+    summary_label.pack(pady=10)
+
+    # Re-slices the saved event store by time, process and folder without
+    # re-parsing the logs
+    store_path = Path(file_path).parent / "-events.store"
+    if store_path.exists():
+        add_slice_controls(result_win, store_path, active_sections, summary_label)
 
     back_button = tk.Button(
         result_win,
@@ -183,6 +207,230 @@ def launch_results_window(file_path, options, parent_window=None):
         height=40.0,  # Adjusted position and size for alignment
     )
 
+    # Opens the self-contained HTML report written next to the summary
+    report_path = Path(file_path).parent / "-report.html"
+    if report_path.exists():
+        report_button = tk.Button(
+            result_win,
+            text="Open HTML Report",
+            command=lambda: webbrowser.open(report_path.resolve().as_uri()),
+            bd=0,
+            highlightthickness=0,
+            relief="flat",
+            bg="#FFFFFF",
+            activebackground="#FFFFFF",
+        )
+        report_button.place(
+            x=880.0,
+            y=750.0,
+            width=140.0,
+            height=40.0,
+        )
+
+    # Lists the malicious dispositions and quarantines, each opening the log
+    # lines around it
+    detections = read_detections(Path(file_path).parent)
+    if detections:
+        detections_button = tk.Button(
+            result_win,
+            text=f"Detections ({len(detections)})",
+            command=lambda: show_detections(result_win, detections, source),
+            bd=0,
+            highlightthickness=0,
+            relief="flat",
+            bg="#FFFFFF",
+            activebackground="#FFFFFF",
+        )
+        detections_button.place(
+            x=740.0,
+            y=750.0,
+            width=140.0,
+            height=40.0,
+        )
+
+    # Ad-hoc questions against the SQLite index of the events
+    db_path = Path(file_path).parent / DB_NAME
+    if db_path.exists():
+        query_button = tk.Button(
+            result_win,
+            text="Query Events",
+            command=lambda: show_query_box(result_win, db_path),
+            bd=0,
+            highlightthickness=0,
+            relief="flat",
+            bg="#FFFFFF",
+            activebackground="#FFFFFF",
+        )
+        query_button.place(
+            x=620.0,
+            y=750.0,
+            width=120.0,
+            height=40.0,
+        )
+
+
+def format_slice(summary, active_sections):
+    sections = []
+    for heading in active_sections:
+        rows = summary[heading[:-1].lower()]
+        sections.append(
+            f"{heading}\n"
+            + "\n".join("{0:>8} {1}".format(count, name) for name, count in rows)
+        )
+    return "\n\n".join(sections)
+
+
+def add_slice_controls(result_win, store_path, active_sections, summary_label):
+    full_text = summary_label.cget("text")
+    store = {}
+    fields = [
+        ("From (Jan 22 10:00:00)", StringVar()),
+        ("To", StringVar()),
+        ("Process contains", StringVar()),
+        ("Path starts with", StringVar()),
+    ]
+    x = 60
+    for caption, var in fields:
+        Label(result_win, text=caption, bg="#FFFFFF", fg="#000000").place(x=x, y=670)
+        Entry(result_win, textvariable=var, width=24).place(x=x, y=695)
+        x += 210
+
+    def apply_slice():
+        # Loaded on first use, the store can be several hundred MB
+        if "events" not in store:
+            store["events"] = EventStore.load(store_path)
+        start, end, process, folder = (var.get().strip() or None for _, var in fields)
+        try:
+            selection = store["events"].select(start, end, process, folder)
+        except (KeyError, ValueError):
+            summary_label.config(text="Times must look like: Jan 22 10:00:00")
+            return
+        text = format_slice(store["events"].summarize(selection), active_sections)
+        summary_label.config(text=text or "No events in this slice.")
+
+    def reset_slice():
+        for _, var in fields:
+            var.set("")
+        summary_label.config(text=full_text)
+
+    tk.Button(result_win, text="Apply", command=apply_slice).place(
+        x=x, y=690, width=80, height=30
+    )
+    tk.Button(result_win, text="Reset", command=reset_slice).place(
+        x=x + 90, y=690, width=80, height=30
+    )
+
+
+# Counts of the events matching the filters, grouped by process, file,
+# folder, extension or minute, or the result of a SELECT
+def show_query_box(parent, db_path):
+    window = Toplevel(parent)
+    window.title("Query Events")
+    window.geometry("1100x600")
+    controls = tk.Frame(window)
+    controls.pack(fill="x", padx=10, pady=5)
+    fields = [
+        ("Process contains", StringVar()),
+        ("Path starts with", StringVar()),
+        ("From (10:00 or Jan 22 10:00)", StringVar()),
+        ("To", StringVar()),
+    ]
+    for column, (caption, var) in enumerate(fields):
+        Label(controls, text=caption).grid(row=0, column=column, sticky="w")
+        Entry(controls, textvariable=var, width=28).grid(row=1, column=column, padx=2)
+    group = StringVar(value="process")
+    Label(controls, text="Group by").grid(row=0, column=len(fields), sticky="w")
+    tk.OptionMenu(controls, group, *GROUPS).grid(row=1, column=len(fields))
+    sql = StringVar()
+    Label(controls, text="Or SQL").grid(row=2, column=0, sticky="w")
+    Entry(controls, textvariable=sql, width=120).grid(
+        row=3, column=0, columnspan=len(fields), sticky="we", padx=2
+    )
+    output = tk.Text(window, wrap="none", font=("Consolas", 9))
+    output.pack(fill="both", expand=True, padx=10, pady=5)
+
+    def run_query():
+        started = time.perf_counter()
+        connection = open_event_db(str(db_path))
+        try:
+            if sql.get().strip():
+                headings, rows = run_sql(connection, sql.get())
+            else:
+                process, folder, start, end = (
+                    var.get().strip() or None for _, var in fields
+                )
+                headings, rows = query_events(
+                    connection, process, folder, start, end, group.get(), 50
+                )
+            text = format_table(headings, rows)
+            text += f"\n\n{len(rows)} rows in "
+            text += f"{1000 * (time.perf_counter() - started):.0f} ms"
+        except (sqlite3.Error, ValueError) as e:
+            text = f"Error: {e}"
+        finally:
+            connection.close()
+        output.delete("1.0", "end")
+        output.insert("end", text)
+
+    tk.Button(controls, text="Run", command=run_query).grid(
+        row=1, column=len(fields) + 1, padx=5
+    )
+
+
+def show_detections(parent, detections, source):
+    window = Toplevel(parent)
+    window.title("Detections")
+    window.geometry("1100x500")
+    listbox = tk.Listbox(window, font=("Consolas", 9))
+    scrollbar = Scrollbar(window, orient="vertical", command=listbox.yview)
+    listbox.configure(yscrollcommand=scrollbar.set)
+    scrollbar.pack(side="right", fill="y")
+    listbox.pack(side="left", fill="both", expand=True)
+    for detection in detections:
+        excluded = ""
+        if detection["excluded_by"]:
+            excluded = f"  [excluded by {detection['excluded_by']}]"
+        listbox.insert(
+            "end",
+            f"{detection['time']}  {detection['kind']:<11} "
+            f"{detection['engine']:<6} {detection['file']}{excluded}",
+        )
+
+    def open_selected(event):
+        selection = listbox.curselection()
+        if selection:
+            show_log_window(window, source, detections[selection[0]])
+
+    listbox.bind("<Double-Button-1>", open_selected)
+
+
+# The log lines around a detection, read again from the diagnostic, with the
+# detection's line highlighted
+def show_log_window(parent, source, detection):
+    found = None
+    if source:
+        found = log_window(
+            source,
+            detection["time"],
+            int(detection["ticks"]),
+            int(detection["thread"]),
+        )
+    window = Toplevel(parent)
+    window.title(found["log"] if found else "Log")
+    window.geometry("1100x500")
+    text = tk.Text(window, wrap="none", font=("Consolas", 9))
+    text.pack(fill="both", expand=True)
+    if found is None:
+        text.insert("end", "The line could not be found in the diagnostic's logs.")
+        text.configure(state="disabled")
+        return
+    for number, line in enumerate(found["lines"]):
+        tags = ("detection",) if number == found["line"] else ()
+        text.insert("end", line + "\n", tags)
+    text.tag_configure("detection", background="#FFE08A")
+    text.see(f"{found['line'] + 1}.0")
+    text.configure(state="disabled")
+
 
 # Allows user to save the results shown in a local .txt file.
 def popup_export_file(parent, content_to_export):
@@ -198,7 +446,7 @@ def popup_export_file(parent, content_to_export):
             filetypes=[("Text files", "*.txt"), ("All files", "*.*")],
         )
         if file_path:
-            with open(file_path, "w") as f:
+            with open(file_path, "w", encoding="utf-8") as f:
                 f.write(content_to_export)
             tk.Label(popup, text="File saved!", fg="green").pack()
 
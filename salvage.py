@@ -0,0 +1,142 @@
+import io
+import os
+import pickle
+import zipfile
+import zlib
+
+from log_parser import merge_aggregates, parse_buffer
+from log_sources import LogSources
+from pipeline import read_blocks
+from zipstream import LOCAL_SIGNATURE, ZipStreamReader
+
+"""
+Salvage reader for truncated or still-copying zip diagnostics.
+
+The zip is walked through its local file headers, so the missing central
+directory does not matter.  Every complete sfc.exe.log member is parsed, plus
+the whole lines that could be decompressed from a member cut off by the end
+of the file.  With a checkpoint file, the aggregates of the complete members
+and the offset of the next header are saved, and the next run only parses
+what was added to the file since.
+"""
+
+
+CHECKPOINT_VERSION = 4
+# The bytes before the resume offset must still have the same CRC for a
+# checkpoint to be used, in case the file was replaced meanwhile
+FINGERPRINT_SIZE = 64 * 1024
+END_SIGNATURES = (b"PK\x01\x02", b"PK\x05\x06", b"PK\x06\x06")
+
+
+# A zip that starts with a member but has no end of central directory record
+def needs_salvage(path):
+    if not os.path.isfile(path):
+        return False
+    with open(path, "rb") as f:
+        if f.read(len(LOCAL_SIGNATURE)) != LOCAL_SIGNATURE:
+            return False
+    return not zipfile.is_zipfile(path)
+
+
+def fingerprint(f, offset):
+    start = max(offset - FINGERPRINT_SIZE, 0)
+    f.seek(start)
+    return zlib.crc32(f.read(offset - start))
+
+
+def load_checkpoint(checkpoint, f, settings):
+    try:
+        # Checkpoints are only ever written by this module
+        with open(checkpoint, "rb") as c:
+            state = pickle.load(c)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    if state.get("version") != CHECKPOINT_VERSION or state["settings"] != settings:
+        return None
+    if os.fstat(f.fileno()).st_size < state["offset"]:
+        return None
+    if fingerprint(f, state["offset"]) != state["fingerprint"]:
+        return None
+    return state
+
+
+def save_checkpoint(checkpoint, f, state):
+    state["fingerprint"] = fingerprint(f, state["offset"])
+    temporary = checkpoint + ".tmp"
+    with open(temporary, "wb") as c:
+        pickle.dump(state, c, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, checkpoint)
+
+
+def add_to_group(groups, group, aggregates):
+    if group in groups:
+        merge_aggregates(groups[group], aggregates)
+    else:
+        groups[group] = aggregates
+
+
+# Parses the sfc.exe.log members of a possibly truncated zip into one set of
+# aggregates per group(name), e.g. per connector version.  Returns the groups
+# and a dict describing what was recovered.
+def salvage_zip(path, new_aggregates, group, checkpoint=None, settings=None):
+    with open(path, "rb") as f:
+        state = load_checkpoint(checkpoint, f, settings) if checkpoint else None
+        resumed_from = state["offset"] if state else 0
+        if state is None:
+            state = {
+                "version": CHECKPOINT_VERSION,
+                "settings": settings,
+                "offset": 0,
+                "members": 0,
+                "groups": {},
+                "sources": LogSources(),
+            }
+        f.seek(state["offset"])
+        reader = ZipStreamReader(f, state["offset"], salvage=True)
+        new_members = 0
+        truncated = None
+        for name, member in reader.members():
+            aggregates = None
+            if state["sources"].wants(name):
+                # A cut member is read again in full by the next run
+                data = member.read()
+                if not member.truncated:
+                    state["sources"].feed(name, io.BytesIO(data))
+            elif os.path.basename(name).startswith("sfc.exe.log"):
+                aggregates = new_aggregates()
+                for block, ahead in read_blocks(member):
+                    # The last line of a cut member is usually incomplete
+                    if member.truncated and not block.endswith(b"\n"):
+                        break
+                    parse_buffer(block, aggregates, ahead=ahead)
+                aggregates["analysis"].end_source()
+            member.skip()
+            if member.truncated:
+                truncated = (name, member.size, aggregates)
+                break
+            if aggregates is not None:
+                add_to_group(state["groups"], group(name), aggregates)
+                state["members"] += 1
+                new_members += 1
+            state["offset"] = reader.position
+
+        f.seek(state["offset"])
+        complete = truncated is None and f.read(4) in END_SIGNATURES
+        if checkpoint:
+            save_checkpoint(checkpoint, f, state)
+
+    # The readable part of a cut member counts for this run only, the next
+    # run parses the member again once it is complete
+    groups = state["groups"]
+    if truncated and truncated[2] is not None:
+        add_to_group(groups, group(truncated[0]), truncated[2])
+    return groups, {
+        "complete": complete,
+        "members": state["members"],
+        "new_members": new_members,
+        "resumed_from": resumed_from,
+        "offset": state["offset"],
+        "truncated": truncated[0] if truncated else None,
+        "truncated_bytes": truncated[1] if truncated else 0,
+        "sources": state["sources"],
+    }
@@ -0,0 +1,642 @@
+import io
+import lzma
+import struct
+import zlib
+
+"""
+Streaming reader for .7z diagnostics, using only the standard library.
+
+The archive headers are parsed directly and the member data is decoded with
+lzma raw filter chains (LZMA, LZMA2, BCJ and Delta), zlib (Deflate) or copied
+as is.  open_members() decodes the archive's folders in order and hands out
+one member at a time, so only the folders holding a requested member are
+decoded, and decoding of a solid folder stops after its last requested member.
+Encrypted archives and BCJ2 are not supported.
+"""
+
+
+SIGNATURE = b"7z\xbc\xaf\x27\x1c"
+SIGNATURE_HEADER_SIZE = 32
+# Compressed bytes read from the archive per decoder call
+READ_SIZE = 1024 * 1024
+
+# Property ids of the 7z header
+K_END = 0x00
+K_HEADER = 0x01
+K_ARCHIVE_PROPERTIES = 0x02
+K_ADDITIONAL_STREAMS_INFO = 0x03
+K_MAIN_STREAMS_INFO = 0x04
+K_FILES_INFO = 0x05
+K_PACK_INFO = 0x06
+K_UNPACK_INFO = 0x07
+K_SUBSTREAMS_INFO = 0x08
+K_SIZE = 0x09
+K_CRC = 0x0A
+K_FOLDER = 0x0B
+K_CODERS_UNPACK_SIZE = 0x0C
+K_NUM_UNPACK_STREAM = 0x0D
+K_EMPTY_STREAM = 0x0E
+K_EMPTY_FILE = 0x0F
+K_NAME = 0x11
+K_ENCODED_HEADER = 0x17
+K_DUMMY = 0x19
+
+CODER_COPY = b"\x00"
+CODER_LZMA = b"\x03\x01\x01"
+CODER_LZMA2 = b"\x21"
+CODER_DEFLATE = b"\x04\x01\x08"
+CODER_DELTA = b"\x03"
+# Branch converters supported by liblzma
+BCJ_FILTERS = {
+    b"\x03\x03\x01\x03": lzma.FILTER_X86,
+    b"\x03\x03\x02\x05": lzma.FILTER_POWERPC,
+    b"\x03\x03\x04\x01": lzma.FILTER_IA64,
+    b"\x03\x03\x05\x01": lzma.FILTER_ARM,
+    b"\x03\x03\x07\x01": lzma.FILTER_ARMTHUMB,
+    b"\x03\x03\x08\x05": lzma.FILTER_SPARC,
+}
+CODER_NAMES = {
+    b"\x03\x03\x01\x1b": "BCJ2",
+    b"\x06\xf1\x07\x01": "AES",
+    b"\x04\x01\x08": "Deflate",
+    b"\x04\x02\x02": "BZip2",
+    b"\x03\x04\x01": "PPMd",
+}
+
+
+class Bad7zFile(Exception):
+    pass
+
+
+class SevenZipInfo:
+    def __init__(self, filename, file_size, crc=None, is_dir=False):
+        self.filename = filename
+        self.file_size = file_size
+        self.CRC = crc
+        self.is_dir = is_dir
+
+
+# Cursor over an in-memory header
+class HeaderReader:
+    def __init__(self, data):
+        self.data = data
+        self.position = 0
+
+    def byte(self):
+        if self.position >= len(self.data):
+            raise Bad7zFile("Truncated 7z header")
+        value = self.data[self.position]
+        self.position += 1
+        return value
+
+    def read(self, size):
+        data = self.data[self.position : self.position + size]
+        if len(data) < size:
+            raise Bad7zFile("Truncated 7z header")
+        self.position += size
+        return data
+
+    # 7z variable length integer: the leading one bits of the first byte give
+    # the number of extra little-endian bytes
+    def number(self):
+        first = self.byte()
+        mask = 0x80
+        value = 0
+        for index in range(8):
+            if not first & mask:
+                return value | ((first & (mask - 1)) << (8 * index))
+            value |= self.byte() << (8 * index)
+            mask >>= 1
+        return value
+
+    def uint32(self):
+        return struct.unpack("<I", self.read(4))[0]
+
+    def bits(self, count):
+        values = []
+        mask = 0
+        for _ in range(count):
+            if not mask:
+                current, mask = self.byte(), 0x80
+            values.append(bool(current & mask))
+            mask >>= 1
+        return values
+
+    # A vector that may start with an "all defined" byte instead of the bits
+    def defined(self, count):
+        if self.byte():
+            return [True] * count
+        return self.bits(count)
+
+    def digests(self, count):
+        return [self.uint32() if defined else None for defined in self.defined(count)]
+
+    def expect(self, property_id):
+        value = self.number()
+        if value != property_id:
+            raise Bad7zFile(f"Unexpected 7z header property {value:#x}")
+
+
+class Coder:
+    def __init__(self, method, inputs, outputs, properties):
+        self.method = method
+        self.inputs = inputs
+        self.outputs = outputs
+        self.properties = properties
+
+
+class Folder:
+    def __init__(self):
+        self.coders = []
+        self.bind_pairs = []
+        self.packed_streams = []
+        self.unpack_sizes = []
+        self.crc = None
+
+    def find_bind_by_output(self, output):
+        for in_index, out_index in self.bind_pairs:
+            if out_index == output:
+                return in_index
+        return None
+
+    def find_bind_by_input(self, input_index):
+        for in_index, out_index in self.bind_pairs:
+            if in_index == input_index:
+                return out_index
+        return None
+
+    # Size of the stream that leaves the folder, i.e. the unbound output
+    def unpack_size(self):
+        for index, size in enumerate(self.unpack_sizes):
+            if self.find_bind_by_output(index) is None:
+                return size
+        return 0
+
+    # Coders from the folder's output back to its packed input, which is also
+    # the order liblzma expects raw filter chains in
+    def chain(self):
+        if len(self.packed_streams) != 1:
+            raise Bad7zFile(f"Unsupported 7z coder: {self.coder_names()}")
+        starts = []
+        input_index = output_index = 0
+        for coder in self.coders:
+            starts.append((input_index, output_index))
+            input_index += coder.inputs
+            output_index += coder.outputs
+        output = next(
+            index
+            for index in range(output_index)
+            if self.find_bind_by_output(index) is None
+        )
+        coders = []
+        while True:
+            number = next(
+                number
+                for number, (_, first_output) in enumerate(starts)
+                if first_output <= output < first_output + self.coders[number].outputs
+            )
+            coder = self.coders[number]
+            if coder.inputs != 1 or coder.outputs != 1:
+                raise Bad7zFile(f"Unsupported 7z coder: {self.coder_names()}")
+            coders.append(coder)
+            output = self.find_bind_by_input(starts[number][0])
+            if output is None:
+                return coders
+
+    def coder_names(self):
+        return ", ".join(
+            CODER_NAMES.get(coder.method, coder.method.hex()) for coder in self.coders
+        )
+
+
+# Mimics LZMADecompressor for the Deflate and Copy coders so a folder reader
+# can drive every decoder the same way
+class Inflater:
+    def __init__(self):
+        self.decoder = zlib.decompressobj(-15)
+        self.needs_input = True
+        self.eof = False
+
+    def decompress(self, data, max_length=-1):
+        data = self.decoder.unconsumed_tail + data
+        output = self.decoder.decompress(data, max(max_length, 0))
+        self.needs_input = not self.decoder.unconsumed_tail
+        self.eof = self.decoder.eof
+        return output
+
+
+class Copier:
+    def __init__(self):
+        self.pending = b""
+        self.needs_input = True
+        self.eof = False
+
+    def decompress(self, data, max_length=-1):
+        data = self.pending + data
+        if max_length < 0:
+            max_length = len(data)
+        output, self.pending = data[:max_length], data[max_length:]
+        self.needs_input = not self.pending
+        return output
+
+
+def lzma_filter(coder):
+    method, properties = coder.method, coder.properties
+    if method == CODER_LZMA2:
+        bits = properties[0] & 0x3F
+        dict_size = 0xFFFFFFFF if bits == 40 else (2 | (bits & 1)) << (bits // 2 + 11)
+        return {"id": lzma.FILTER_LZMA2, "dict_size": dict_size}
+    if method == CODER_LZMA:
+        lc_lp_pb = properties[0]
+        return {
+            "id": lzma.FILTER_LZMA1,
+            "lc": lc_lp_pb % 9,
+            "lp": lc_lp_pb // 9 % 5,
+            "pb": lc_lp_pb // 45,
+            "dict_size": struct.unpack("<I", properties[1:5])[0],
+        }
+    if method in BCJ_FILTERS:
+        return {"id": BCJ_FILTERS[method]}
+    if method == CODER_DELTA:
+        return {"id": lzma.FILTER_DELTA, "dist": properties[0] + 1}
+    return None
+
+
+def new_decoder(folder):
+    coders = [coder for coder in folder.chain() if coder.method != CODER_COPY]
+    if not coders:
+        return Copier()
+    if len(coders) == 1 and coders[0].method == CODER_DEFLATE:
+        return Inflater()
+    filters = [lzma_filter(coder) for coder in coders]
+    if None in filters:
+        raise Bad7zFile(f"Unsupported 7z coder: {folder.coder_names()}")
+    return lzma.LZMADecompressor(lzma.FORMAT_RAW, filters=filters)
+
+
+# Decoded bytes of one folder, read on demand from its packed stream
+class FolderReader:
+    def __init__(self, f, offset, packed_size, folder):
+        self.f = f
+        self.offset = offset
+        self.packed_left = packed_size
+        self.decoder = new_decoder(folder)
+
+    def read(self, size):
+        while True:
+            data = b""
+            if self.decoder.needs_input and self.packed_left:
+                self.f.seek(self.offset)
+                data = self.f.read(min(READ_SIZE, self.packed_left))
+                if not data:
+                    raise Bad7zFile("7z archive is truncated")
+                self.offset += len(data)
+                self.packed_left -= len(data)
+            elif self.decoder.needs_input or self.decoder.eof:
+                raise Bad7zFile("7z member data ends early")
+            output = self.decoder.decompress(data, size)
+            if output:
+                return output
+
+
+# A single member, readable once while the archive is positioned on it
+class MemberStream(io.RawIOBase):
+    def __init__(self, folder_reader, info):
+        self.folder_reader = folder_reader
+        self.info = info
+        self.left = info.file_size
+        self.crc = 0
+        self.pending = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if not self.left and not self.pending:
+            return 0
+        if not self.pending:
+            data = self.folder_reader.read(min(len(buffer), self.left))
+            self.left -= len(data)
+            self.crc = zlib.crc32(data, self.crc)
+            if (
+                not self.left
+                and self.info.CRC is not None
+                and self.crc != self.info.CRC
+            ):
+                raise Bad7zFile(f"Bad CRC-32 for file {self.info.filename!r}")
+            self.pending = data
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+    def skip(self):
+        while self.read(READ_SIZE):
+            pass
+
+
+class SevenZipFile:
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.f = open(file_name, "rb")
+        try:
+            self._read_headers()
+        except BaseException:
+            self.f.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.f.close()
+
+    def namelist(self):
+        return [info.filename for info in self.files]
+
+    def infolist(self):
+        return list(self.files)
+
+    def getinfo(self, name):
+        for info in self.files:
+            if info.filename == name:
+                return info
+        raise KeyError(f"There is no item named {name!r} in the archive")
+
+    def _read_headers(self):
+        start = self.f.read(SIGNATURE_HEADER_SIZE)
+        if len(start) < SIGNATURE_HEADER_SIZE or not start.startswith(SIGNATURE):
+            raise Bad7zFile("File is not a 7z archive")
+        offset, size, crc = struct.unpack("<QQI", start[12:32])
+        self.f.seek(SIGNATURE_HEADER_SIZE + offset)
+        data = self.f.read(size)
+        if len(data) < size or zlib.crc32(data) != crc:
+            raise Bad7zFile("7z header is truncated or corrupt")
+        header = HeaderReader(data)
+        kind = header.number()
+        # Headers are usually compressed themselves, possibly more than once
+        while kind == K_ENCODED_HEADER:
+            streams = self._read_streams_info(header)
+            data = b"".join(
+                self._decode_folder_whole(streams, index)
+                for index in range(len(streams["folders"]))
+            )
+            header = HeaderReader(data)
+            kind = header.number()
+        if kind != K_HEADER:
+            raise Bad7zFile("7z header is corrupt")
+        self._read_header(header)
+
+    def _decode_folder_whole(self, streams, index):
+        folder = streams["folders"][index]
+        reader = FolderReader(
+            self.f,
+            streams["pack_offsets"][index],
+            streams["pack_sizes"][index],
+            folder,
+        )
+        left = folder.unpack_size()
+        chunks = []
+        while left:
+            chunk = reader.read(left)
+            left -= len(chunk)
+            chunks.append(chunk)
+        data = b"".join(chunks)
+        if folder.crc is not None and zlib.crc32(data) != folder.crc:
+            raise Bad7zFile("7z header is corrupt")
+        return data
+
+    def _read_header(self, header):
+        self.streams = {"folders": [], "sizes": [], "digests": []}
+        self.files = []
+        # Members with data, in the order of the folders' substreams
+        self.streamed = []
+        kind = header.number()
+        if kind == K_ARCHIVE_PROPERTIES:
+            while header.number() != K_END:
+                header.read(header.number())
+            kind = header.number()
+        if kind == K_ADDITIONAL_STREAMS_INFO:
+            self._read_streams_info(header)
+            kind = header.number()
+        if kind == K_MAIN_STREAMS_INFO:
+            self.streams = self._read_streams_info(header)
+            kind = header.number()
+        if kind == K_FILES_INFO:
+            self._read_files_info(header)
+            kind = header.number()
+        if kind != K_END:
+            raise Bad7zFile("7z header is corrupt")
+
+    def _read_streams_info(self, header):
+        streams = {"folders": [], "pack_sizes": [], "pack_offsets": []}
+        kind = header.number()
+        if kind == K_PACK_INFO:
+            position = SIGNATURE_HEADER_SIZE + header.number()
+            count = header.number()
+            kind = header.number()
+            if kind == K_SIZE:
+                streams["pack_sizes"] = [header.number() for _ in range(count)]
+                kind = header.number()
+            if kind == K_CRC:
+                header.digests(count)
+                kind = header.number()
+            if kind != K_END:
+                raise Bad7zFile("7z header is corrupt")
+            for size in streams["pack_sizes"]:
+                streams["pack_offsets"].append(position)
+                position += size
+            kind = header.number()
+        if kind == K_UNPACK_INFO:
+            streams["folders"] = self._read_unpack_info(header)
+            kind = header.number()
+        # Without substream information every folder holds a single stream
+        streams["substreams"] = [1] * len(streams["folders"])
+        streams["sizes"] = [folder.unpack_size() for folder in streams["folders"]]
+        streams["digests"] = [folder.crc for folder in streams["folders"]]
+        if kind == K_SUBSTREAMS_INFO:
+            self._read_substreams_info(header, streams)
+            kind = header.number()
+        if kind != K_END:
+            raise Bad7zFile("7z header is corrupt")
+        # Packed streams are consumed one folder at a time in 7z archives
+        # written by 7-Zip, so each folder maps to the next packed stream
+        pack_index = 0
+        offsets, sizes = [], []
+        for folder in streams["folders"]:
+            offsets.append(streams["pack_offsets"][pack_index])
+            sizes.append(streams["pack_sizes"][pack_index])
+            pack_index += len(folder.packed_streams)
+        streams["pack_offsets"], streams["pack_sizes"] = offsets, sizes
+        return streams
+
+    def _read_unpack_info(self, header):
+        header.expect(K_FOLDER)
+        count = header.number()
+        if header.byte():
+            raise Bad7zFile("External 7z folders are not supported")
+        folders = [self._read_folder(header) for _ in range(count)]
+        header.expect(K_CODERS_UNPACK_SIZE)
+        for folder in folders:
+            outputs = sum(coder.outputs for coder in folder.coders)
+            folder.unpack_sizes = [header.number() for _ in range(outputs)]
+        kind = header.number()
+        if kind == K_CRC:
+            for folder, crc in zip(folders, header.digests(count)):
+                folder.crc = crc
+            kind = header.number()
+        if kind != K_END:
+            raise Bad7zFile("7z header is corrupt")
+        return folders
+
+    def _read_folder(self, header):
+        folder = Folder()
+        inputs = outputs = 0
+        for _ in range(header.number()):
+            flags = header.byte()
+            if flags & 0x80:
+                raise Bad7zFile("Alternative 7z coder methods are not supported")
+            method = header.read(flags & 0x0F)
+            coder_inputs = coder_outputs = 1
+            if flags & 0x10:
+                coder_inputs, coder_outputs = header.number(), header.number()
+            properties = header.read(header.number()) if flags & 0x20 else b""
+            folder.coders.append(Coder(method, coder_inputs, coder_outputs, properties))
+            inputs += coder_inputs
+            outputs += coder_outputs
+        folder.bind_pairs = [
+            (header.number(), header.number()) for _ in range(outputs - 1)
+        ]
+        packed = inputs - len(folder.bind_pairs)
+        if packed == 1:
+            folder.packed_streams = [
+                index
+                for index in range(inputs)
+                if folder.find_bind_by_input(index) is None
+            ][:1]
+        else:
+            folder.packed_streams = [header.number() for _ in range(packed)]
+        return folder
+
+    def _read_substreams_info(self, header, streams):
+        folders = streams["folders"]
+        counts = [1] * len(folders)
+        kind = header.number()
+        if kind == K_NUM_UNPACK_STREAM:
+            counts = [header.number() for _ in folders]
+            kind = header.number()
+        sizes = []
+        for folder, count in zip(folders, counts):
+            if not count:
+                continue
+            total = folder.unpack_size()
+            known = []
+            if kind == K_SIZE:
+                known = [header.number() for _ in range(count - 1)]
+            sizes.extend(known)
+            sizes.append(total - sum(known))
+        if kind == K_SIZE:
+            kind = header.number()
+        # Streams of single-stream folders reuse the folder CRC, the others
+        # have theirs listed here
+        digests = []
+        missing = sum(
+            count
+            for folder, count in zip(folders, counts)
+            if not (count == 1 and folder.crc is not None)
+        )
+        listed = []
+        if kind == K_CRC:
+            listed = header.digests(missing)
+            kind = header.number()
+        listed = iter(listed)
+        for folder, count in zip(folders, counts):
+            if count == 1 and folder.crc is not None:
+                digests.append(folder.crc)
+            else:
+                digests.extend(next(listed, None) for _ in range(count))
+        if kind != K_END:
+            raise Bad7zFile("7z header is corrupt")
+        streams["substreams"], streams["sizes"], streams["digests"] = (
+            counts,
+            sizes,
+            digests,
+        )
+
+    def _read_files_info(self, header):
+        count = header.number()
+        empty_stream = [False] * count
+        empty_file = []
+        names = [""] * count
+        while True:
+            kind = header.number()
+            if kind == K_END:
+                break
+            size = header.number()
+            if kind == K_EMPTY_STREAM:
+                empty_stream = header.bits(count)
+                header.position += size - (count + 7) // 8
+            elif kind == K_EMPTY_FILE:
+                empty_file = HeaderReader(header.read(size)).bits(sum(empty_stream))
+            elif kind == K_NAME:
+                data = HeaderReader(header.read(size))
+                if data.byte():
+                    raise Bad7zFile("External 7z file names are not supported")
+                names = data.data[1:].decode("utf-16-le").split("\0")[:count]
+            else:
+                header.read(size)
+        empty_file = iter(empty_file)
+        sizes = iter(self.streams["sizes"])
+        digests = iter(self.streams["digests"])
+        for name, empty in zip(names, empty_stream):
+            # Names use the Windows separator in archives made on Windows
+            name = name.replace("\\", "/")
+            if empty:
+                is_dir = not next(empty_file, False)
+                self.files.append(SevenZipInfo(name, 0, is_dir=is_dir))
+            else:
+                info = SevenZipInfo(name, next(sizes), next(digests))
+                self.files.append(info)
+                self.streamed.append(info)
+
+    # Yields (name, stream) for the requested members in archive order.  Each
+    # stream must be read (or left) before the next one is requested: members
+    # in the same solid folder are decoded one after another, and decoding of
+    # a folder stops after its last requested member.
+    def open_members(self, names):
+        wanted = set(names)
+        for info in self.files:
+            if info.filename in wanted and info not in self.streamed:
+                yield info.filename, io.BytesIO()
+        members = iter(self.streamed)
+        streams = self.streams
+        for index, folder in enumerate(streams["folders"]):
+            folder_members = [
+                next(members) for _ in range(streams["substreams"][index])
+            ]
+            needed = [
+                number
+                for number, info in enumerate(folder_members)
+                if info.filename in wanted
+            ]
+            if not needed:
+                continue
+            reader = FolderReader(
+                self.f,
+                streams["pack_offsets"][index],
+                streams["pack_sizes"][index],
+                folder,
+            )
+            for info in folder_members[: needed[-1] + 1]:
+                stream = MemberStream(reader, info)
+                if info.filename in wanted:
+                    yield info.filename, stream
+                stream.skip()
+
+
+def is_7z_file(file_name):
+    with open(file_name, "rb") as f:
+        return f.read(len(SIGNATURE)) == SIGNATURE
@@ -0,0 +1,202 @@
+import argparse
+import heapq
+import json
+
+"""
+Bounded-memory heavy-hitter sketches for --approximate.
+
+SpaceSaving keeps at most `capacity` items.  Every reported count is an upper
+bound and count - error is a lower bound of the true number of occurrences, and
+any item seen more than min_count() times, which is at most total / capacity
+for a sketch that was never merged, is guaranteed to be present.
+Sketches serialise to JSON and merge without losing those guarantees, so the
+results of several logs or hosts can be combined afterwards.
+
+Usage:
+    python sketches.py merge host1/-sketches.json host2/-sketches.json -o fleet.json
+"""
+
+
+DEFAULT_CAPACITY = 10000
+
+
+# A sketch count as text.  The bound is one-sided: the true count is at most
+# count and at least count - error, e.g. "<=120 (>=100)".
+def format_bound(count, error):
+    if not error:
+        return str(count)
+    return f"<={count} (>={count - error})"
+
+
+class SpaceSaving:
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.total = 0
+        self.counts = {}
+        self.errors = {}
+        # Largest count a merge discarded, the most an item missing from a
+        # merged sketch can have occurred
+        self.floor = 0
+        # Min-heap of (count, item).  Counts only grow, so entries may be stale
+        # and are refreshed lazily when an eviction looks at them.
+        self._heap = []
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __contains__(self, item):
+        return item in self.counts
+
+    def __getitem__(self, item):
+        return self.counts.get(item, 0)
+
+    # Supports `sketch[item] += n` the same way a Counter does.  A new item
+    # arriving when the sketch is full replaces the smallest one and inherits
+    # its count as the error bound.
+    def __setitem__(self, item, value):
+        counts = self.counts
+        if item in counts:
+            self.total += value - counts[item]
+            counts[item] = value
+            return
+        self.total += value
+        if len(counts) < self.capacity:
+            counts[item] = self.floor + value
+            self.errors[item] = self.floor
+            heapq.heappush(self._heap, (self.floor + value, item))
+            return
+        floor = self._evict()
+        counts[item] = floor + value
+        self.errors[item] = floor
+        heapq.heappush(self._heap, (floor + value, item))
+
+    def _evict(self):
+        heap = self._heap
+        counts = self.counts
+        while True:
+            count, item = heapq.heappop(heap)
+            current = counts[item]
+            if current == count:
+                del counts[item]
+                del self.errors[item]
+                return count
+            heapq.heappush(heap, (current, item))
+
+    # Upper bound of the count of an item missing from the sketch
+    def min_count(self):
+        if len(self.counts) < self.capacity:
+            return self.floor
+        return min(self.counts.values())
+
+    def error(self, item):
+        return self.errors.get(item, self.min_count())
+
+    def update(self, items):
+        for item in items:
+            self[item] += 1
+
+    def items(self):
+        return self.counts.items()
+
+    def most_common(self, n=None):
+        items = self.counts.items()
+        if n is None:
+            return sorted(items, key=lambda x: x[1], reverse=True)
+        return heapq.nlargest(n, items, key=lambda x: x[1])
+
+    # Rows of (item, count, error) where the true count is in [count - error, count]
+    def most_common_with_error(self, n=None):
+        return [(item, count, self.errors[item]) for item, count in self.most_common(n)]
+
+    def merge(self, other):
+        merged = SpaceSaving(max(self.capacity, other.capacity))
+        # An item missing from a full sketch may have occurred up to its min count
+        floor_self = self.min_count()
+        floor_other = other.min_count()
+        combined = []
+        for item in self.counts.keys() | other.counts.keys():
+            count = self.counts.get(item, floor_self) + other.counts.get(
+                item, floor_other
+            )
+            error = self.errors.get(item, floor_self) + other.errors.get(
+                item, floor_other
+            )
+            combined.append((count, error, item))
+        combined.sort(key=lambda x: x[0], reverse=True)
+        for count, error, item in combined[: merged.capacity]:
+            merged.counts[item] = count
+            merged.errors[item] = error
+            merged._heap.append((count, item))
+        heapq.heapify(merged._heap)
+        # The merged sketch may not be full when the capacities differ, so it
+        # keeps the bound of the items it dropped and of those neither had
+        discarded = combined[merged.capacity : merged.capacity + 1]
+        merged.floor = max(
+            floor_self + floor_other, discarded[0][0] if discarded else 0
+        )
+        merged.total = self.total + other.total
+        return merged
+
+    def to_dict(self):
+        return {
+            "capacity": self.capacity,
+            "total": self.total,
+            "floor": self.floor,
+            "items": self.most_common_with_error(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["capacity"])
+        sketch.total = data["total"]
+        sketch.floor = data.get("floor", 0)
+        for item, count, error in data["items"]:
+            sketch.counts[item] = count
+            sketch.errors[item] = error
+            sketch._heap.append((count, item))
+        heapq.heapify(sketch._heap)
+        return sketch
+
+
+def save_sketches(sketches, file_name):
+    with open(file_name, "w") as f:
+        json.dump({name: sketch.to_dict() for name, sketch in sketches.items()}, f)
+
+
+def load_sketches(file_name):
+    with open(file_name) as f:
+        return {
+            name: SpaceSaving.from_dict(data) for name, data in json.load(f).items()
+        }
+
+
+def merge_sketch_files(file_names):
+    merged = {}
+    for file_name in file_names:
+        for name, sketch in load_sketches(file_name).items():
+            merged[name] = merged[name].merge(sketch) if name in merged else sketch
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge -sketches.json files")
+    commands = parser.add_subparsers(dest="command", required=True)
+    merge = commands.add_parser("merge", help="Merge sketches from several runs")
+    merge.add_argument("files", nargs="+", help="-sketches.json files to merge")
+    merge.add_argument("-o", "--output", help="Write the merged sketches here")
+    merge.add_argument("--top", type=int, default=10, help="Rows to print per section")
+    args = parser.parse_args()
+
+    merged = merge_sketch_files(args.files)
+    for name, sketch in merged.items():
+        print(f"{name} (approximate, {sketch.total} events):")
+        for item, count, error in sketch.most_common_with_error(args.top):
+            print("{0:>20} {1}".format(format_bound(count, error), item))
+        print()
+    if args.output:
+        save_sketches(merged, args.output)
+        print(f"Merged sketches written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import heapq
+import itertools
+import os
+import shutil
+import tempfile
+import weakref
+from collections import Counter
+from collections.abc import Mapping
+
+"""
+External aggregation for very high-cardinality counters.
+
+SpillingCounter behaves like a Counter for `counter[key] += n`, but once its
+estimated size passes a memory limit the in-memory counts are written to a
+key-sorted run file on disk and the counter starts again empty.  items(),
+most_common() and the other views merge the runs with what is still in
+memory, so the totals stay exact while memory stays bounded.
+"""
+
+
+# Rough cost of one entry: the key string header, the int and the dict slot
+ENTRY_OVERHEAD = 150
+
+
+def write_run(rows, directory, prefix):
+    fd, path = tempfile.mkstemp(prefix=prefix, suffix=".run", dir=directory)
+    with os.fdopen(fd, "w", encoding="utf-8", newline="\n") as f:
+        for key, count in rows:
+            f.write(f"{key}\t{count}\n")
+    return path
+
+
+def read_run(path):
+    with open(path, encoding="utf-8", newline="\n") as f:
+        for line in f:
+            key, _, count = line[:-1].rpartition("\t")
+            yield key, int(count)
+
+
+# Adds up the counts of equal neighbouring keys in a key-sorted stream
+def combine_sorted(rows):
+    for key, group in itertools.groupby(rows, key=lambda row: row[0]):
+        yield key, sum(count for _, count in group)
+
+
+class SpillingCounter(Counter):
+    def __init__(self, limit_bytes, directory=None):
+        super().__init__()
+        self.limit_bytes = limit_bytes
+        self.used_bytes = 0
+        self.runs = []
+        self.directory = tempfile.mkdtemp(prefix="diag-spill-", dir=directory)
+        # Run files are removed with the counter, or at interpreter exit
+        self._cleanup = weakref.finalize(self, shutil.rmtree, self.directory, True)
+
+    # Reading a key that is not in memory changes nothing, only storing a new
+    # key counts towards the limit
+    def __missing__(self, key):
+        return 0
+
+    def __setitem__(self, key, count):
+        if not dict.__contains__(self, key):
+            size = len(key) + ENTRY_OVERHEAD
+            if self.used_bytes + size > self.limit_bytes:
+                self.spill()
+            self.used_bytes += size
+        dict.__setitem__(self, key, count)
+
+    # Adds the counts in memory like `counter[key] += n`.  Counter.update
+    # reads the current counts through get(), which are totals once spilled.
+    def update(self, iterable=None, /, **kwds):
+        if not isinstance(iterable, Mapping):
+            iterable = Counter(iterable)
+        for key, count in itertools.chain(iterable.items(), kwds.items()):
+            self[key] += count
+
+    def spill(self):
+        if dict.__len__(self):
+            rows = sorted(dict.items(self))
+            self.runs.append(write_run(rows, self.directory, "counts-"))
+        dict.clear(self)
+        self.used_bytes = 0
+
+    # Exact (key, total) pairs in key order, merged from the runs and memory
+    def items(self):
+        if not self.runs:
+            return dict.items(self)
+        streams = [read_run(path) for path in self.runs]
+        streams.append(sorted(dict.items(self)))
+        return combine_sorted(heapq.merge(*streams))
+
+    # Once spilled, counter[key] is only the part still in memory, the part
+    # `counter[key] += n` adds to.  The views below read the exact totals
+    # from items() instead, streaming the runs.
+    def keys(self):
+        if not self.runs:
+            return dict.keys(self)
+        return (key for key, _ in self.items())
+
+    def values(self):
+        if not self.runs:
+            return dict.values(self)
+        return (count for _, count in self.items())
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        if not self.runs:
+            return dict.__len__(self)
+        return sum(1 for _ in self.items())
+
+    def __contains__(self, key):
+        if not self.runs:
+            return dict.__contains__(self, key)
+        return any(item == key for item, _ in self.items())
+
+    def get(self, key, default=None):
+        if not self.runs:
+            return dict.get(self, key, default)
+        return next((count for item, count in self.items() if item == key), default)
+
+    # With runs on disk, sorts the merged totals by count in bounded-size
+    # chunks and merges those, so even a full listing never loads every key
+    def iter_most_common(self):
+        if not self.runs:
+            yield from Counter.most_common(self)
+            return
+        runs = []
+        rows = iter(self.items())
+        # Sorted chunks are sized to the same memory limit as the counter
+        chunk_size = max(self.limit_bytes // ENTRY_OVERHEAD, 1000)
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                break
+            chunk.sort(key=lambda row: (-row[1], row[0]))
+            runs.append(write_run(chunk, self.directory, "sorted-"))
+        yield from heapq.merge(
+            *(read_run(path) for path in runs), key=lambda row: (-row[1], row[0])
+        )
+        for path in runs:
+            os.remove(path)
+
+    def most_common(self, n=None):
+        if n is None:
+            return list(self.iter_most_common())
+        return heapq.nlargest(n, self.items(), key=lambda row: row[1])
+
+    def close(self):
+        self._cleanup()
@@ -0,0 +1,23 @@
+import os
+import sys
+import zipfile
+
+import pytest
+
+# The modules live at the top of the repository, not in a package
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from generate_diag import DEFAULT_VERSION, generate_diagnostic  # noqa: E402
+
+
+# A synthetic diagnostic whose newest log spans several pipeline blocks
+@pytest.fixture(scope="session")
+def diagnostic(tmp_path_factory):
+    folder = tmp_path_factory.mktemp("diagnostic")
+    archive = folder / "diagnostic.zip"
+    generate_diagnostic(str(archive), 10 * 2**20, rotations=1)
+    with zipfile.ZipFile(archive) as f:
+        name = f"Cisco/AMP/{DEFAULT_VERSION}/sfc.exe.log"
+        f.extract(name, folder)
+    return archive, folder / name
@@ -0,0 +1,114 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from event_db import (
+    open_event_db,
+    parse_time,
+    query_events,
+    run_sql,
+    to_epoch,
+    write_event_db,
+)
+from event_store import EventStore
+from log_parser import aggregates_from_store, new_aggregates
+
+WINDOWS = "\\\\?\\C:\\Windows"
+SVCHOST = WINDOWS + "\\svchost.exe"
+EXPLORER = WINDOWS + "\\explorer.exe"
+EVENTS = [
+    ("Jan 22 08:00:00", WINDOWS + "\\a.dll", SVCHOST),
+    ("Jan 22 08:00:30", WINDOWS + "\\b.dll", SVCHOST),
+    ("Jan 22 09:15:00", "\\\\?\\C:\\Users\\me\\c.txt", EXPLORER),
+    ("Jan 23 08:00:10", WINDOWS + "\\a.dll", EXPLORER),
+    ("Jan 23 10:00:00", "\\\\?\\D:\\100%_done\\d.log", SVCHOST),
+]
+
+
+@pytest.fixture
+def connection(tmp_path):
+    store = EventStore(year=2025)
+    for event in EVENTS:
+        store.add(*event)
+    aggregates = aggregates_from_store(store, new_aggregates())
+    # A path a plain "file:" URI would misread
+    file_name = tmp_path / "odd #?%20 dir" / "-events.db"
+    file_name.parent.mkdir()
+    write_event_db(store, aggregates, str(file_name))
+    connection = open_event_db(str(file_name))
+    yield connection
+    connection.close()
+
+
+@pytest.mark.parametrize(
+    "value, end, expected",
+    [
+        ("10:00", False, ("day", 36000)),
+        ("10:00", True, ("day", 36059)),
+        ("10:00:05", True, ("day", 36005)),
+        (" 9:30 ", False, ("day", 34200)),
+        (
+            "Jan 22 10:00:05",
+            False,
+            ("moment", to_epoch(datetime(2025, 1, 22, 10, 0, 5))),
+        ),
+        ("Jan 22 10:00", True, ("moment", to_epoch(datetime(2025, 1, 22, 10, 0, 59)))),
+        ("Feb  3 07:05", False, ("moment", to_epoch(datetime(2025, 2, 3, 7, 5)))),
+        ("2026-01-22 10:00", False, ("moment", to_epoch(datetime(2026, 1, 22, 10, 0)))),
+        (
+            "2026-01-22T10:00:07",
+            False,
+            ("moment", to_epoch(datetime(2026, 1, 22, 10, 0, 7))),
+        ),
+    ],
+)
+def test_parse_time(value, end, expected):
+    assert parse_time(value, 2025, end) == expected
+
+
+@pytest.mark.parametrize("value", ["", "tomorrow", "Foo 22 10:00", "2026-01-22"])
+def test_parse_time_rejects(value):
+    with pytest.raises(ValueError):
+        parse_time(value, 2025)
+
+
+def test_query_by_process(connection):
+    headings, rows = query_events(connection)
+    assert headings == ("Process", "Scans")
+    assert rows == [(SVCHOST, 3), (EXPLORER, 2)]
+
+
+def test_query_filters(connection):
+    _, rows = query_events(connection, process="EXPLORER", by="file")
+    assert sorted(rows) == [
+        ("\\\\?\\C:\\Users\\me\\c.txt", 1),
+        (WINDOWS + "\\a.dll", 1),
+    ]
+    # Folders match with or without the \\?\ prefix, and LIKE wildcards in
+    # them are taken literally
+    _, rows = query_events(connection, folder="C:\\Windows", by="folder")
+    assert rows == [(WINDOWS, 3)]
+    _, rows = query_events(connection, folder="D:\\100%_", by="extension")
+    assert rows == [("log", 1)]
+    _, rows = query_events(connection, folder="D:\\1000", by="extension")
+    assert rows == []
+
+
+def test_query_times(connection):
+    # A time of day matches on every date
+    _, rows = query_events(connection, start="08:00", end="08:00", by="minute")
+    assert [count for _, count in rows] == [2, 1]
+    _, rows = query_events(connection, start="Jan 22 09:00", end="Jan 23 08:00")
+    assert rows == [(EXPLORER, 2)]
+    _, rows = query_events(connection, start="2025-01-23 09:00")
+    assert rows == [(SVCHOST, 1)]
+    # A time of day range ending before it starts wraps midnight
+    _, rows = query_events(connection, start="09:30", end="08:00")
+    assert rows == [(SVCHOST, 3), (EXPLORER, 1)]
+
+
+def test_read_only(connection):
+    assert run_sql(connection, "SELECT COUNT(*) FROM events")[1] == [(len(EVENTS),)]
+    with pytest.raises(sqlite3.OperationalError):
+        run_sql(connection, "DELETE FROM events")
@@ -0,0 +1,30 @@
+from datetime import datetime
+
+from event_store import EventStore
+
+
+def moments(store, *timestamps):
+    return [store.to_datetime(store.to_seconds(t)) for t in timestamps]
+
+
+# Logs carry no year, the events are dated no later than the archive
+def test_year_from_archive_time():
+    store = EventStore(latest=datetime(2026, 1, 3, 10, 0))
+    assert moments(store, "Dec 20 08:00:00", "Jan 2 09:00:00") == [
+        datetime(2025, 12, 20, 8, 0),
+        datetime(2026, 1, 2, 9, 0),
+    ]
+
+
+def test_feb_29_lands_in_a_leap_year():
+    store = EventStore(year=2025)
+    # A leap day after an event of a common year used to fail moving it there
+    assert moments(store, "Mar 1 00:00:00", "Feb 29 10:00:00") == [
+        datetime(2025, 3, 1),
+        datetime(2024, 2, 29, 10, 0),
+    ]
+    store = EventStore(latest=datetime(2025, 3, 5))
+    assert moments(store, "Feb 29 10:00:00", "Mar 1 00:00:00") == [
+        datetime(2024, 2, 29, 10, 0),
+        datetime(2024, 3, 1),
+    ]
@@ -0,0 +1,44 @@
+from exclusions import EXTENSION, PATH, PROCESS, WILDCARD, PolicyExclusions
+
+POLICY = (
+    "<config><exclusions><info>"
+    "<item>1|0|C:\\Windows\\WinSxS\\</item>"
+    "<item>1|0|CSIDL_COMMON_APPDATA\\Package Cache\\</item>"
+    "<item>1|0|Builds</item>"
+    "<item>2|0|W32.Auto:2a7f1c.in03</item>"
+    "<item>2|0|W32.Example.Trojan</item>"
+    "<item>3|0|.mdf</item>"
+    "<item>4|0|*\\Engineering\\builds\\</item>"
+    "</info><process>"
+    "<item>1|C:\\Program Files\\Veeam\\VeeamAgent.exe|0|</item>"
+    "<item>1|C:\\Program Files\\SQL\\sqlservr.exe|4|</item>"
+    "</process></exclusions></config>"
+)
+
+
+def test_parse_by_type_code():
+    policy = PolicyExclusions.parse(POLICY)
+    # Threat exclusions (type 2) are skipped, whatever their name looks like
+    assert policy.exclusions == [
+        ("C:\\Windows\\WinSxS\\", PATH),
+        ("CSIDL_COMMON_APPDATA\\Package Cache\\", PATH),
+        ("Builds", PATH),
+        (".mdf", EXTENSION),
+        ("*\\Engineering\\builds\\", WILDCARD),
+        ("C:\\Program Files\\Veeam\\VeeamAgent.exe", PROCESS),
+    ]
+
+
+def test_match():
+    policy = PolicyExclusions.parse(POLICY)
+    assert policy.match("\\\\?\\C:\\Windows\\WinSxS\\x\\a.dll", None) == 0
+    assert policy.match("\\\\?\\C:\\ProgramData\\Package Cache\\b.msi", None) == 1
+    assert policy.match("\\\\?\\D:\\data\\db.MDF", None) == 3
+    assert policy.match("\\\\?\\E:\\src\\Engineering\\builds\\c.obj", None) == 4
+    veeam = "\\\\?\\C:\\Program Files\\Veeam\\VeeamAgent.exe"
+    assert policy.match("\\\\?\\D:\\backup.vbk", veeam) == 5
+    assert policy.match("\\\\?\\D:\\backup.vbk", None) is None
+
+
+def test_not_a_policy():
+    assert PolicyExclusions.parse(b"not xml") is None
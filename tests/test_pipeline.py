@@ -0,0 +1,135 @@
+import io
+
+from analyzers import OTHER
+from generate_diag import DEFAULT_VERSION
+from log_parser import (
+    merge_aggregates,
+    new_aggregates,
+    parse_buffer,
+    parse_mapped_log,
+)
+from pipeline import (
+    BLOCK_SIZE,
+    cut_blocks,
+    file_source,
+    parse_parallel,
+    zip_member_source,
+)
+from sketches import SpaceSaving
+
+LOG_NAME = f"Cisco/AMP/{DEFAULT_VERSION}/sfc.exe.log"
+COUNTERS = ["processes", "files", "extensions", "paths", "timeline", "engines"]
+
+
+# Analyzer sections with the rows sorted, since rows with equal counts may
+# come in any order
+def sorted_sections(aggregates):
+    return [
+        (
+            name,
+            [
+                (title, headings, sorted(map(repr, rows)))
+                for title, headings, rows in sections
+            ],
+        )
+        for name, sections in aggregates["analysis"].sections()
+    ]
+
+
+def assert_same(aggregates, expected):
+    assert aggregates["events"] == expected["events"]
+    for name in COUNTERS:
+        assert dict(aggregates[name]) == dict(expected[name]), name
+    assert sorted_sections(aggregates) == sorted_sections(expected)
+
+
+def serial(path):
+    return parse_mapped_log(str(path), new_aggregates())
+
+
+def test_cut_blocks_end_on_lines():
+    data = b"".join(b"line %d\n" % i for i in range(1000)) + b"last"
+    blocks = list(cut_blocks(io.BytesIO(data), block_size=100))
+    assert b"".join(blocks) == data
+    assert all(block.endswith(b"\n") for block in blocks[:-1])
+
+
+def test_merge_aggregates_matches_serial(diagnostic):
+    _, log = diagnostic
+    data = log.read_bytes()
+    expected = serial(log)
+    assert expected["events"]
+    aggregates = new_aggregates()
+    for block in cut_blocks(io.BytesIO(data), BLOCK_SIZE // 4):
+        partial = parse_buffer(block, new_aggregates())
+        del partial["analysis"]
+        merge_aggregates(aggregates, partial)
+    assert aggregates["events"] == expected["events"]
+    for name in COUNTERS:
+        assert aggregates[name] == expected[name], name
+
+
+def test_merge_aggregates_into_sketches(diagnostic):
+    _, log = diagnostic
+    expected = serial(log)
+    aggregates = new_aggregates(sketch_size=100)
+    partial = serial(log)
+    del partial["analysis"]
+    merge_aggregates(aggregates, partial)
+    assert isinstance(aggregates["files"], SpaceSaving)
+    for item, count, error in aggregates["files"].most_common_with_error():
+        assert count - error <= expected["files"][item] <= count
+
+
+def test_parse_parallel_matches_serial(diagnostic):
+    archive, log = diagnostic
+    expected = serial(log)
+    for jobs in (1, 3):
+        aggregates = parse_parallel(
+            [zip_member_source(str(archive), LOG_NAME)], new_aggregates(), jobs
+        )
+        assert_same(aggregates, expected)
+
+
+def test_parse_parallel_targets(diagnostic):
+    _, log = diagnostic
+    expected = serial(log)
+    targets = [new_aggregates(), new_aggregates()]
+    parse_parallel(
+        [file_source(str(log)), file_source(str(log))], targets[0], 2, targets=targets
+    )
+    for aggregates in targets:
+        assert_same(aggregates, expected)
+
+
+# Per-file and per-process tables of the analyzers stay within the cap, with
+# the keys past it counted under OTHER
+CAPPED_TABLES = {
+    "Tetra Lock Contention": ["hold_files", "hold_processes"],
+    "Cloud Lookups": [
+        "file_lookups",
+        "file_latency",
+        "process_lookups",
+        "process_latency",
+    ],
+    "Cache Hit Ratios": ["lookups", "hits"],
+    "Hashing Cost": ["hashes", "timed_hashes", "milliseconds"],
+    "Exclusions": ["excluded"],
+    "Inner File Scan Amplification": ["scans", "inner"],
+}
+
+
+def test_analyzer_tables_capped(diagnostic):
+    _, log = diagnostic
+    expected = serial(log)
+    aggregates = parse_mapped_log(str(log), new_aggregates(sketch_size=5))
+    analyzers = zip(aggregates["analysis"].analyzers, expected["analysis"].analyzers)
+    for analyzer, exact in analyzers:
+        for name in CAPPED_TABLES.get(analyzer.name, ()):
+            table, full = getattr(analyzer, name), getattr(exact, name)
+            assert len(table) < len(full), name
+            assert sum(table.values()) == sum(full.values()), name
+            for key, count in table.items():
+                if OTHER not in (key if isinstance(key, tuple) else (key,)):
+                    assert count == full[key], name
+        assert analyzer.folded == 0 or analyzer.name in CAPPED_TABLES
@@ -0,0 +1,27 @@
+from log_parser import new_aggregates, parse_mapped_log
+from quicklook import Coverage, quick_look
+
+
+def test_coverage_returns_unread_parts():
+    coverage = Coverage()
+    assert coverage.add(10, 20) == [(10, 20)]
+    assert coverage.add(30, 40) == [(30, 40)]
+    assert coverage.add(15, 35) == [(20, 30)]
+    assert coverage.add(0, 50) == [(0, 10), (40, 50)]
+    assert coverage.add(5, 45) == []
+    assert coverage.covered == 50
+
+
+# A log much smaller than the first round of blocks is read in full, so the
+# estimates are the exact counts
+def test_full_coverage_is_exact(diagnostic, tmp_path):
+    _, log = diagnostic
+    lines = log.read_bytes().splitlines(keepends=True)
+    small = tmp_path / "sfc.exe.log"
+    small.write_bytes(b"".join(lines[:5000]))
+    result = quick_look([str(small)], time_budget=60)
+    assert result["reason"] == "logs fully sampled"
+    assert result["sampled_bytes"] == result["total_bytes"]
+    exact = parse_mapped_log(str(small), new_aggregates())
+    for item, total, margin in result["sections"]["Processes"]:
+        assert (total, margin) == (exact["processes"][item], 0)
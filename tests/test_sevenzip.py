@@ -0,0 +1,121 @@
+import lzma
+import struct
+import zlib
+
+import pytest
+
+from sevenzip import Bad7zFile, SevenZipFile, is_7z_file
+
+MEMBERS = {
+    "Cisco/AMP/8.2.1.21650/sfc.exe.log": b"old version\n" * 100,
+    "Cisco/AMP/8.4.2.30317/sfc.exe.log.1": b"".join(
+        b"(%d, +0 ms) Jan 22 08:00:00 [1]: line %d\n" % (i, i) for i in range(20000)
+    ),
+    "Cisco/AMP/8.4.2.30317/sfc.exe.log": b"newest\n" * 5000,
+}
+# LZMA2 dictionary of 1 MB, whose 7z property byte is 16
+LZMA2_FILTERS = [{"id": lzma.FILTER_LZMA2, "dict_size": 2**20}]
+LZMA2_PROPERTIES = b"\x10"
+
+
+# 7z variable-length number: the high bits of the first byte give the count
+# of little-endian bytes that follow
+def number(value):
+    for extra in range(8):
+        if value < 1 << (7 * (extra + 1)):
+            high = value >> (8 * extra)
+            first = (0xFF00 >> extra) & 0xFF | high
+            return bytes([first]) + value.to_bytes(8, "little")[:extra]
+    return b"\xff" + value.to_bytes(8, "little")
+
+
+def digests(values):
+    return b"\x01" + b"".join(struct.pack("<I", value) for value in values)
+
+
+# Writes a 7z archive of members, in a single solid folder or one folder per
+# member, compressed with LZMA2 or stored with the Copy coder
+def write_7z(path, members, solid=True, method="lzma2"):
+    groups = [list(members.items())] if solid else [[item] for item in members.items()]
+    packed, folders = [], []
+    for group in groups:
+        data = b"".join(content for _, content in group)
+        if method == "lzma2":
+            packed.append(lzma.compress(data, lzma.FORMAT_RAW, filters=LZMA2_FILTERS))
+            coder = b"\x21\x21" + number(1) + LZMA2_PROPERTIES
+        else:
+            packed.append(data)
+            coder = b"\x01\x00"
+        folders.append((coder, len(data), [content for _, content in group]))
+
+    header = b"\x01\x04"
+    # Pack info
+    header += b"\x06" + number(0) + number(len(packed)) + b"\x09"
+    header += b"".join(number(len(data)) for data in packed) + b"\x00"
+    # Unpack info
+    header += b"\x07\x0b" + number(len(folders)) + b"\x00"
+    header += b"".join(number(1) + coder for coder, _, _ in folders)
+    header += b"\x0c" + b"".join(number(size) for _, size, _ in folders) + b"\x00"
+    # Substreams info
+    header += b"\x08\x0d" + b"".join(number(len(items)) for _, _, items in folders)
+    header += b"\x09" + b"".join(
+        number(len(content)) for _, _, items in folders for content in items[:-1]
+    )
+    header += b"\x0a" + digests(
+        zlib.crc32(content) for _, _, items in folders for content in items
+    )
+    header += b"\x00\x00"
+    # Files info
+    names = b"\x00" + b"".join((name + "\0").encode("utf-16-le") for name in members)
+    header += b"\x05" + number(len(members))
+    header += b"\x11" + number(len(names)) + names + b"\x00\x00"
+
+    body = b"".join(packed)
+    start = struct.pack("<QQI", len(body), len(header), zlib.crc32(header))
+    with open(path, "wb") as f:
+        f.write(b"7z\xbc\xaf\x27\x1c\x00\x04")
+        f.write(struct.pack("<I", zlib.crc32(start)) + start)
+        f.write(body + header)
+    return path
+
+
+def read_members(path, names):
+    with SevenZipFile(path) as archive:
+        return {name: stream.read() for name, stream in archive.open_members(names)}
+
+
+@pytest.mark.parametrize("solid", [True, False])
+@pytest.mark.parametrize("method", ["lzma2", "copy"])
+def test_open_members(tmp_path, solid, method):
+    path = write_7z(tmp_path / "diag.7z", MEMBERS, solid, method)
+    assert is_7z_file(str(path))
+    with SevenZipFile(str(path)) as archive:
+        assert archive.namelist() == list(MEMBERS)
+        assert [info.file_size for info in archive.infolist()] == [
+            len(data) for data in MEMBERS.values()
+        ]
+    assert read_members(str(path), MEMBERS) == MEMBERS
+
+
+def test_open_some_members(tmp_path):
+    path = write_7z(tmp_path / "diag.7z", MEMBERS)
+    names = list(MEMBERS)[1:]
+    assert read_members(str(path), names) == {name: MEMBERS[name] for name in names}
+
+
+def test_bad_crc(tmp_path):
+    path = tmp_path / "diag.7z"
+    write_7z(path, {"a.txt": b"hello world"}, method="copy")
+    data = bytearray(path.read_bytes())
+    data[data.index(b"hello")] ^= 0xFF
+    path.write_bytes(bytes(data))
+    with pytest.raises(Bad7zFile, match="Bad CRC-32"):
+        read_members(str(path), ["a.txt"])
+
+
+def test_not_a_7z_file(tmp_path):
+    path = tmp_path / "diag.7z"
+    path.write_bytes(b"PK\x03\x04" + bytes(100))
+    assert not is_7z_file(str(path))
+    with pytest.raises(Bad7zFile):
+        SevenZipFile(str(path))
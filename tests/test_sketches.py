@@ -0,0 +1,99 @@
+import random
+from collections import Counter
+
+from sketches import SpaceSaving, format_bound, load_sketches, save_sketches
+
+
+# A Zipf-like stream of items, with many more distinct items than a sketch holds
+def stream(seed, length=50000, distinct=5000):
+    rng = random.Random(seed)
+    weights = [1 / rank**1.1 for rank in range(1, distinct + 1)]
+    return rng.choices([f"item{i}" for i in range(distinct)], weights, k=length)
+
+
+def sketch_of(items, capacity=200):
+    sketch = SpaceSaving(capacity)
+    sketch.update(items)
+    return sketch
+
+
+def assert_bounds(sketch, exact):
+    assert sketch.total == sum(exact.values())
+    assert len(sketch) <= sketch.capacity
+    for item, count, error in sketch.most_common_with_error():
+        assert count - error <= exact[item] <= count
+    # Items seen more than min_count times are always kept, which includes
+    # those seen more than total / capacity times in an unmerged sketch
+    for item, count in exact.items():
+        if count > sketch.min_count():
+            assert item in sketch
+
+
+def test_bounds():
+    items = stream(1)
+    assert_bounds(sketch_of(items), Counter(items))
+
+
+def test_exact_below_capacity():
+    items = stream(2, distinct=100)
+    sketch = sketch_of(items)
+    assert dict(sketch.items()) == Counter(items)
+    assert all(error == 0 for _, _, error in sketch.most_common_with_error())
+
+
+def test_increments_by_more_than_one():
+    exact = Counter()
+    sketch = SpaceSaving(50)
+    rng = random.Random(3)
+    for item in stream(3, length=5000, distinct=1000):
+        weight = rng.randint(1, 5)
+        sketch[item] += weight
+        exact[item] += weight
+    assert_bounds(sketch, exact)
+
+
+def test_merge_keeps_bounds():
+    first, second = stream(4), stream(5)
+    merged = sketch_of(first).merge(sketch_of(second))
+    assert_bounds(merged, Counter(first) + Counter(second))
+
+
+def test_merge_different_capacities():
+    small, large = SpaceSaving(2), SpaceSaving(4)
+    small.update("aaabbbc")
+    large.update("z")
+    merged = small.merge(large)
+    assert_bounds(merged, Counter("aaabbbcz"))
+    # 'a' was evicted from the small sketch, the merged one still bounds it
+    assert "a" not in merged
+    assert merged.min_count() >= 3
+    assert merged.error("a") >= 3
+
+
+def test_merge_different_capacities_keeps_bounds():
+    first, second, third = stream(8), stream(9, length=500), stream(10)
+    merged = sketch_of(first, 100).merge(sketch_of(second, 400))
+    exact = Counter(first) + Counter(second)
+    assert_bounds(merged, exact)
+    # Items added after the merge keep the bounds too
+    merged.update(third)
+    assert_bounds(merged, exact + Counter(third))
+
+
+def test_save_and_load(tmp_path):
+    sketch = sketch_of(stream(6))
+    file_name = str(tmp_path / "-sketches.json")
+    save_sketches({"files": sketch}, file_name)
+    loaded = load_sketches(file_name)["files"]
+    assert loaded.most_common_with_error() == sketch.most_common_with_error()
+    assert loaded.total == sketch.total
+    # The loaded sketch keeps counting with the same guarantees
+    more = stream(7)
+    loaded.update(more)
+    sketch.update(more)
+    assert loaded.most_common_with_error(10) == sketch.most_common_with_error(10)
+
+
+def test_format_bound():
+    assert format_bound(120, 0) == "120"
+    assert format_bound(120, 20) == "<=120 (>=100)"
@@ -0,0 +1,56 @@
+import random
+from collections import Counter
+
+from spill import SpillingCounter
+
+
+# A counter spilled several times, with the exact counts it should hold
+def spilled(tmp_path):
+    rng = random.Random(1)
+    counter = SpillingCounter(20000, str(tmp_path))
+    exact = Counter()
+    for _ in range(5000):
+        key = f"C:\\data\\{rng.randrange(1000)}"
+        counter[key] += 1
+        exact[key] += 1
+    assert counter.runs
+    return counter, exact
+
+
+def test_items_are_exact(tmp_path):
+    counter, exact = spilled(tmp_path)
+    assert dict(counter.items()) == exact
+    # Equal counts may come in any order
+    top = [count for _, count in counter.most_common(10)]
+    assert top == [count for _, count in exact.most_common(10)]
+
+
+def test_views_match_items(tmp_path):
+    counter, exact = spilled(tmp_path)
+    assert len(counter) == len(exact)
+    assert sorted(counter) == sorted(counter.keys()) == sorted(exact)
+    assert sorted(counter.values()) == sorted(exact.values())
+    assert sum(counter.values()) == counter.total() == exact.total()
+    key = next(iter(exact))
+    assert key in counter and "missing" not in counter
+    assert counter.get(key) == exact[key]
+    assert counter.get("missing", 0) == 0
+
+
+def test_update_adds_counts(tmp_path):
+    counter, exact = spilled(tmp_path)
+    more = Counter(f"C:\\data\\{i}" for i in range(0, 2000, 3))
+    counter.update(more)
+    counter.update(["C:\\new"], extra=2)
+    assert dict(counter.items()) == exact + more + Counter({"C:\\new": 1, "extra": 2})
+
+
+def test_missing_keys_are_read_without_side_effects(tmp_path):
+    counter = SpillingCounter(1000, str(tmp_path))
+    counter["a"] += 1
+    used = counter.used_bytes
+    for i in range(100):
+        assert counter[f"missing{i}"] == 0
+    assert counter.used_bytes == used
+    assert not counter.runs
+    assert dict(counter.items()) == {"a": 1}
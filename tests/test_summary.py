@@ -0,0 +1,18 @@
+import os
+
+from Diag_Analyzer_v2 import print_info_to_file, print_table_to_file
+from results import get_section_from_summary
+
+# Outside cp1252, the locale encoding of most Windows hosts
+PATH = "\\\\?\\C:\\Users\\田中\\データ\\報告.xlsx"
+
+
+# The summary is UTF-8 whatever the locale encoding, and read back as such
+def test_summary_is_utf8(tmp_path):
+    print_info_to_file([(PATH, 3)], "Files", str(tmp_path), overwrite=True)
+    print_table_to_file("Table", ("File", "Scans"), [(PATH, 3)], str(tmp_path))
+    summary = os.path.join(tmp_path, "-summary.txt")
+    with open(summary, "rb") as f:
+        text = f.read().decode("utf-8")
+    assert f"       3 {PATH}\n" in text
+    assert get_section_from_summary("Files:", summary) == [f"       3 {PATH}"]
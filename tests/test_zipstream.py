@@ -0,0 +1,91 @@
+import io
+import zipfile
+
+import pytest
+
+from zipstream import ZipStreamReader
+
+MEMBERS = {
+    "Cisco/AMP/8.4.2.30317/sfc.exe.log": b"".join(
+        b"(%d, +0 ms) Jan 22 08:00:00 [1]: line %d\n" % (i, i) for i in range(20000)
+    ),
+    "Cisco/AMP/policy.xml": b"<config/>\n",
+    "empty.txt": b"",
+}
+
+
+# A write-only stream that cannot tell or seek, so zipfile writes every
+# member with a trailing data descriptor as when streaming to a pipe
+class Pipe(io.RawIOBase):
+    def __init__(self):
+        self.data = io.BytesIO()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self.data.write(data)
+
+
+def read_all(data, salvage=False):
+    reader = ZipStreamReader(io.BytesIO(data), salvage=salvage)
+    return {name: stream.read() for name, stream in reader.members()}
+
+
+def make_zip(compression, members=MEMBERS, **kwargs):
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w", compression, **kwargs) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return output.getvalue()
+
+
+@pytest.mark.parametrize(
+    "compression",
+    [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED, zipfile.ZIP_BZIP2, zipfile.ZIP_LZMA],
+)
+def test_members_with_sizes(compression):
+    assert read_all(make_zip(compression)) == MEMBERS
+
+
+@pytest.mark.parametrize("force_zip64", [False, True])
+def test_members_with_data_descriptors(force_zip64):
+    pipe = Pipe()
+    with zipfile.ZipFile(pipe, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in MEMBERS.items():
+            with archive.open(name, "w", force_zip64=force_zip64) as member:
+                member.write(data)
+    assert read_all(pipe.data.getvalue()) == MEMBERS
+
+
+def test_members_left_unread_are_skipped():
+    reader = ZipStreamReader(io.BytesIO(make_zip(zipfile.ZIP_DEFLATED)))
+    names = [name for name, _ in reader.members()]
+    assert names == list(MEMBERS)
+
+
+def test_stored_member_with_descriptor_is_refused():
+    pipe = Pipe()
+    with zipfile.ZipFile(pipe, "w", zipfile.ZIP_STORED) as archive:
+        archive.writestr("a.txt", b"data")
+    with pytest.raises(zipfile.BadZipFile, match="stored without sizes"):
+        read_all(pipe.data.getvalue())
+
+
+def test_bad_crc():
+    data = bytearray(make_zip(zipfile.ZIP_STORED, {"a.txt": b"hello world"}))
+    data[data.index(b"hello")] ^= 0xFF
+    with pytest.raises(zipfile.BadZipFile, match="Bad CRC-32"):
+        read_all(bytes(data))
+
+
+def test_truncated_stream():
+    data = make_zip(zipfile.ZIP_DEFLATED)
+    cut = data[: len(data) // 2]
+    with pytest.raises(zipfile.BadZipFile):
+        read_all(cut)
+    reader = ZipStreamReader(io.BytesIO(cut), salvage=True)
+    for name, stream in reader.members():
+        data = stream.read()
+        assert stream.truncated
+        assert MEMBERS[name].startswith(data)
@@ -0,0 +1,204 @@
+import re
+from collections import Counter
+
+from analyzers import OTHER, Analyzer, Durations, histogram_rows, holder_label
+
+"""
+Tetra engine lock contention.
+
+Every Tetra scan takes the engine lock of its slot:
+    TetraEngineInterface::ScanFile[1003] lock requested
+    TetraEngineInterface::ScanFile[1003] lock acquired
+    TetraEngineInterface::ScanFile[1003] lock released
+The three lines are paired per slot and thread.  Wait time runs from request
+to acquire, hold time from acquire to release, both in log ticks (ms).  A wait
+is blamed on whoever released the same slot while it lasted.  A holder is the
+file and process of the thread's last HandleCreation before its request.
+"""
+
+
+LOCK_REGEX = re.compile(
+    rb"TetraEngineInterface::ScanFile\[(\d+)\] lock (requested|acquired|released)"
+)
+REQUESTED, ACQUIRED, RELEASED = 0, 1, 2
+ACTIONS = {b"requested": REQUESTED, b"acquired": ACQUIRED, b"released": RELEASED}
+# Waits at least this long (ms) count as contended
+CONTENDED_WAIT_MS = 10
+TOP_WINDOWS = 10
+TOP_BLOCKERS = 3
+TOP_HOLDERS = 10
+
+
+class TetraLockAnalyzer(Analyzer):
+    name = "Tetra Lock Contention"
+    markers = (b"TetraEngineInterface::ScanFile[",)
+
+    def __init__(self):
+        # Open pairs, (slot, thread) -> (ticks, holder)
+        self.requests = {}
+        self.held = {}
+        # slot -> (ticks, holder) of its last release
+        self.released = {}
+        self.waits = Durations()
+        self.holds = Durations()
+        # Per minute ("Jan 22 08:01"): total wait, acquisitions, contended
+        # acquisitions, longest wait and wait ms per blocking holder
+        self.window_waits = Counter()
+        self.window_acquisitions = Counter()
+        self.window_contended = Counter()
+        self.window_longest = {}
+        self.window_blockers = {}
+        self.hold_processes = Counter()
+        self.hold_files = Counter()
+        self.unmatched = Counter()
+
+    @staticmethod
+    def extract(line):
+        reg = LOCK_REGEX.search(line)
+        if reg is None:
+            return None
+        return int(reg[1]), ACTIONS[reg[2]]
+
+    def consume(self, ticks, timestamp, thread, holder, fields):
+        slot, action = fields
+        key = (slot, thread)
+        if action == REQUESTED:
+            self.requests[key] = (ticks, holder)
+        elif action == ACQUIRED:
+            requested = self.requests.pop(key, None)
+            if requested is None:
+                self.unmatched["acquired without a request"] += 1
+                self.held[key] = (ticks, holder)
+            else:
+                # The file is the one opened before the lock was requested,
+                # the thread may have opened others while it waited
+                self.held[key] = (ticks, requested[1] or holder)
+                self.add_wait(slot, requested[0], ticks, timestamp[:-3])
+        else:
+            acquired = self.held.pop(key, None)
+            if acquired is None:
+                self.released[slot] = (ticks, holder)
+                self.unmatched["released without an acquire"] += 1
+                return
+            hold = ticks - acquired[0]
+            self.holds[hold] += 1
+            owner = acquired[1] or holder
+            self.released[slot] = (ticks, owner)
+            if owner is not None:
+                path = self.capped(self.hold_files, owner[0], OTHER)
+                process = self.capped(self.hold_processes, owner[1], OTHER)
+                self.hold_files[path] += hold
+                self.hold_processes[process] += hold
+
+    def add_wait(self, slot, requested, acquired, minute):
+        wait = acquired - requested
+        self.waits[wait] += 1
+        self.window_waits[minute] += wait
+        self.window_acquisitions[minute] += 1
+        if wait > self.window_longest.get(minute, -1):
+            self.window_longest[minute] = wait
+        if wait < CONTENDED_WAIT_MS:
+            return
+        self.window_contended[minute] += 1
+        # Whoever released the slot while this thread waited held it up
+        blocker = None
+        released = self.released.get(slot)
+        if released is not None and requested <= released[0] <= acquired:
+            blocker = released[1]
+        blockers = self.window_blockers.setdefault(minute, Counter())
+        blockers[self.capped(blockers, holder_label(blocker), OTHER)] += wait
+
+    def end_source(self):
+        self.unmatched["requested, never acquired"] += len(self.requests)
+        self.unmatched["acquired, never released"] += len(self.held)
+        self.requests, self.held, self.released = {}, {}, {}
+
+    def merge(self, other):
+        for name in (
+            "waits",
+            "holds",
+            "window_waits",
+            "window_acquisitions",
+            "window_contended",
+            "unmatched",
+        ):
+            getattr(self, name).update(getattr(other, name))
+        self.merge_capped(self.hold_processes, other.hold_processes, OTHER)
+        self.merge_capped(self.hold_files, other.hold_files, OTHER)
+        for minute, wait in other.window_longest.items():
+            if wait > self.window_longest.get(minute, -1):
+                self.window_longest[minute] = wait
+        for minute, blockers in other.window_blockers.items():
+            table = self.window_blockers.setdefault(minute, Counter())
+            self.merge_capped(table, blockers, OTHER)
+
+    def sections(self):
+        if not self.waits and not self.holds:
+            return []
+        waits, holds = self.waits.summary(), self.holds.summary()
+        times = [
+            (label, waits[key], holds[key])
+            for label, key in (
+                ("pairs", "count"),
+                ("mean", "mean"),
+                ("median", "p50"),
+                ("90th percentile", "p90"),
+                ("99th percentile", "p99"),
+                ("longest", "max"),
+            )
+        ]
+        times.append(("total", self.waits.total(), self.holds.total()))
+
+        windows = []
+        for minute, wait in self.window_waits.most_common(TOP_WINDOWS):
+            if not wait:
+                break
+            blockers = self.window_blockers.get(minute, Counter())
+            windows.append(
+                (
+                    minute,
+                    wait,
+                    self.window_contended[minute],
+                    self.window_acquisitions[minute],
+                    self.window_longest[minute],
+                    "; ".join(
+                        f"{label} ({ms} ms)"
+                        for label, ms in blockers.most_common(TOP_BLOCKERS)
+                    ),
+                )
+            )
+
+        sections = [
+            ("Tetra Lock Times (ms)", ("", "Wait", "Hold"), times),
+            (
+                "Tetra Lock Time Distribution",
+                ("Duration", "Waits", "Holds"),
+                histogram_rows(self.waits, self.holds),
+            ),
+            (
+                "Tetra Worst Contention Windows",
+                (
+                    "Minute",
+                    "Total wait ms",
+                    f"Waits >= {CONTENDED_WAIT_MS} ms",
+                    "Acquisitions",
+                    "Longest wait ms",
+                    "Blocked by",
+                ),
+                windows,
+            ),
+            (
+                "Tetra Lock Hold Time by Process",
+                ("Process", "Hold ms"),
+                self.hold_processes.most_common(TOP_HOLDERS),
+            ),
+            (
+                "Tetra Lock Hold Time by File",
+                ("File", "Hold ms"),
+                self.hold_files.most_common(TOP_HOLDERS),
+            ),
+        ]
+        unmatched = [(label, n) for label, n in sorted(self.unmatched.items()) if n]
+        if unmatched:
+            sections.append(("Tetra Unpaired Lock Lines", ("", "Lines"), unmatched))
+        return sections
@@ -0,0 +1,147 @@
+import re
+
+from html_report import minute_key
+from log_parser import ENGINE_MARKERS
+
+"""
+Connector versions found in one diagnostic, compared side by side, e.g. the
+scan load before and after an upgrade.
+
+Member names are matched against VERSION_REGEX once, when they are indexed by
+version.  With --compare-versions every version's logs are parsed into their
+own aggregates.  Versions cover different spans of time, so load is compared
+per minute with scans, and processes and extensions by their share of the
+scans rather than raw counts.  The change column compares the newest version
+with the one before it.
+"""
+
+
+VERSION_REGEX = re.compile(r"(\d{1,2}\.\d{1,2}\.\d{1,2}.\d{1,5}).*sfc\.exe")
+NO_VERSION = "0.0.0"
+TOP_ROWS = 10
+
+
+# "8.4.2.30317" -> (8, 4, 2, 30317), for ordering versions
+def version_key(version):
+    return tuple(int(part) for part in re.findall(r"\d+", version))
+
+
+# {version: [sfc.exe.log members]}, members without a version under NO_VERSION
+def index_versions(names):
+    versions = {}
+    for name in names:
+        reg = VERSION_REGEX.search(name)
+        if reg is not None:
+            versions.setdefault(reg[1], []).append(name)
+        elif "sfc.exe" in name:
+            versions.setdefault(NO_VERSION, []).append(name)
+    return versions
+
+
+def change(before, after):
+    if not before:
+        return "new" if after else ""
+    return f"{100 * (after - before) / before:+.1f}%"
+
+
+def per_minute(count, minutes):
+    return round(count / minutes, 1) if minutes else 0
+
+
+def share(count, total):
+    return round(100 * count / total, 2) if total else 0
+
+
+class VersionComparison:
+    name = "Version Comparison"
+
+    # versions is {version: aggregates}
+    def __init__(self, versions):
+        self.aggregates = versions
+        self.versions = sorted(versions, key=version_key)
+
+    # [(metric, value per version)], scan load normalised per minute
+    def load(self):
+        spans = [
+            sorted(self.aggregates[version]["timeline"], key=minute_key)
+            for version in self.versions
+        ]
+        rows = [("first minute", [m[0] if m else "" for m in spans])]
+        rows.append(("last minute", [m[-1] if m else "" for m in spans]))
+        rows.append(("minutes with scans", [len(m) for m in spans]))
+        events = [self.aggregates[version]["events"] for version in self.versions]
+        rows.append(("scan events", events))
+        rows.append(
+            (
+                "scan events per minute",
+                [per_minute(n, len(m)) for n, m in zip(events, spans)],
+            )
+        )
+        for name, _ in ENGINE_MARKERS:
+            counts = [
+                self.aggregates[version]["engines"][name] for version in self.versions
+            ]
+            if any(counts):
+                rows.append(
+                    (
+                        f"{name} per minute",
+                        [per_minute(n, len(m)) for n, m in zip(counts, spans)],
+                    )
+                )
+        return rows
+
+    # Share of the scans of the top names of any version, most in the newest
+    # version first
+    def shares(self, counter_name):
+        counters = [self.aggregates[version][counter_name] for version in self.versions]
+        totals = [sum(count for _, count in counter.items()) for counter in counters]
+        names = set()
+        for counter in counters:
+            top = sorted(counter.items(), key=lambda item: (-item[1], item[0]))
+            names.update(name for name, _ in top[:TOP_ROWS])
+        rows = [
+            (
+                name,
+                [
+                    share(counter[name], total)
+                    for counter, total in zip(counters, totals)
+                ],
+            )
+            for name in names
+        ]
+        rows.sort(key=lambda row: ([-value for value in reversed(row[1])], row[0]))
+        return rows
+
+    def tables(self):
+        before, after = self.versions[-2:]
+        heading = f"Change {before} -> {after}"
+        load = [
+            (
+                metric,
+                *values,
+                "" if isinstance(values[-1], str) else change(values[-2], values[-1]),
+            )
+            for metric, values in self.load()
+        ]
+        sections = [("Scan Load by Version", ("", *self.versions, heading), load)]
+        for title, counter_name in (
+            ("Process Share by Version", "processes"),
+            ("Extension Share by Version", "extensions"),
+        ):
+            sections.append(
+                (
+                    title,
+                    (title.split()[0], *(f"{v} %" for v in self.versions), heading),
+                    [
+                        (name, *values, f"{values[-1] - values[-2]:+.2f} pp")
+                        for name, values in self.shares(counter_name)
+                    ],
+                )
+            )
+        return sections
+
+    # [(name, sections)] like Analysis.sections, empty with a single version
+    def sections(self):
+        if len(self.versions) < 2:
+            return []
+        return [(self.name, self.tables())]
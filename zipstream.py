@@ -0,0 +1,271 @@
+import bz2
+import io
+import lzma
+import struct
+import zipfile
+import zlib
+
+"""
+Sequential zip reader for diagnostics piped in on stdin.
+
+A pipe cannot seek to the central directory at the end of a zip, so members
+are found through their local file headers instead and decompressed as the
+bytes arrive.  Members written with a trailing data descriptor (sizes unknown
+up front, as zip writers streaming to a pipe do) are supported for Deflate,
+BZip2 and LZMA, where the compressed data marks its own end.
+
+With salvage=True a stream that ends early is not an error: the member being
+read simply ends with whatever could be decompressed and is marked truncated.
+"""
+
+
+LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+LOCAL_SIGNATURE = b"PK\x03\x04"
+DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+ZIP64_EXTRA = 0x0001
+FLAG_ENCRYPTED = 0x01
+FLAG_DESCRIPTOR = 0x08
+FLAG_UTF8 = 0x800
+READ_SIZE = 64 * 1024
+
+
+class Copier:
+    def __init__(self):
+        self.eof = False
+        self.unused_data = b""
+
+    def decompress(self, data):
+        return data
+
+
+# LZMA members start with a 4 byte version and properties size, then the
+# LZMA1 properties, before the raw stream
+class LzmaDecompressor:
+    def __init__(self):
+        self.header = b""
+        self.decoder = None
+        self.eof = False
+        self.unused_data = b""
+
+    def decompress(self, data):
+        if self.decoder is None:
+            self.header += data
+            if len(self.header) < 4:
+                return b""
+            (size,) = struct.unpack("<H", self.header[2:4])
+            if len(self.header) < 4 + size:
+                return b""
+            properties = self.header[4 : 4 + size]
+            data = self.header[4 + size :]
+            self.decoder = lzma.LZMADecompressor(
+                lzma.FORMAT_RAW,
+                filters=[lzma._decode_filter_properties(lzma.FILTER_LZMA1, properties)],
+            )
+        output = self.decoder.decompress(data)
+        self.eof = self.decoder.eof
+        self.unused_data = self.decoder.unused_data
+        return output
+
+
+def new_decompressor(method):
+    if method == zipfile.ZIP_STORED:
+        return Copier()
+    if method == zipfile.ZIP_DEFLATED:
+        return zlib.decompressobj(-15)
+    if method == zipfile.ZIP_BZIP2:
+        return bz2.BZ2Decompressor()
+    if method == zipfile.ZIP_LZMA:
+        return LzmaDecompressor()
+    raise zipfile.BadZipFile(f"Unsupported compression method {method}")
+
+
+# One member, readable once while the stream is positioned on it
+class MemberStream(io.RawIOBase):
+    def __init__(self, reader, name, method, compressed_size, crc, descriptor, zip64):
+        self.reader = reader
+        self.name = name
+        self.decompressor = new_decompressor(method)
+        # None when the size is only given by the data descriptor
+        self.left = compressed_size
+        self.expected_crc = crc
+        self.descriptor = descriptor
+        self.zip64 = zip64
+        self.crc = 0
+        self.size = 0
+        self.pending = b""
+        self.done = False
+        self.truncated = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.pending and not self.done:
+            self.pending = self._next_chunk()
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+    def _next_chunk(self):
+        if self.left == 0 or self.decompressor.eof:
+            self._finish()
+            return b""
+        want = READ_SIZE if self.left is None else min(READ_SIZE, self.left)
+        data = self.reader.read(want)
+        if not data:
+            if self.reader.salvage:
+                self.done = self.truncated = True
+                return b""
+            raise zipfile.BadZipFile(f"Stream ended inside {self.name!r}")
+        if self.left is not None:
+            self.left -= len(data)
+        try:
+            output = self.decompressor.decompress(data)
+        except (zlib.error, OSError, EOFError, lzma.LZMAError) as e:
+            raise zipfile.BadZipFile(f"Corrupt data in {self.name!r}: {e}")
+        self.crc = zlib.crc32(output, self.crc)
+        self.size += len(output)
+        return output
+
+    def _finish(self):
+        self.done = True
+        # Bytes read past the end of the compressed data belong to the next
+        # header
+        self.reader.unread(self.decompressor.unused_data)
+        if self.descriptor:
+            try:
+                self.expected_crc = self._read_descriptor()
+            except zipfile.BadZipFile:
+                if not self.reader.salvage:
+                    raise
+                # The data is all there but its CRC was cut off
+                self.truncated = True
+                return
+        if self.crc != self.expected_crc:
+            raise zipfile.BadZipFile(f"Bad CRC-32 for file {self.name!r}")
+
+    def _read_descriptor(self):
+        sizes = 16 if self.zip64 else 8
+        data = self.reader.read_exactly(4)
+        if data == DESCRIPTOR_SIGNATURE:
+            data = self.reader.read_exactly(4)
+        self.reader.read_exactly(sizes)
+        return struct.unpack("<I", data)[0]
+
+    def skip(self):
+        while self.read(READ_SIZE):
+            pass
+
+
+class ZipStreamReader:
+    def __init__(self, stream, position=0, salvage=False):
+        self.stream = stream
+        self.pushed = b""
+        # Offset in the zip of the next byte to be read
+        self.position = position
+        self.salvage = salvage
+
+    def read(self, size):
+        if self.pushed:
+            data, self.pushed = self.pushed[:size], self.pushed[size:]
+        else:
+            data = self.stream.read(size)
+        self.position += len(data)
+        return data
+
+    def read_exactly(self, size):
+        data = b""
+        while len(data) < size:
+            chunk = self.read(size - len(data))
+            if not chunk:
+                raise zipfile.BadZipFile("Stream ended inside a zip header")
+            data += chunk
+        return data
+
+    def unread(self, data):
+        self.pushed = data + self.pushed
+        self.position -= len(data)
+
+    # Yields (name, stream) for every member.  Each stream must be read (or
+    # left) before asking for the next member, the rest of it is skipped.
+    def members(self):
+        while True:
+            try:
+                header, name, extra = self._read_header()
+            except zipfile.BadZipFile:
+                if self.salvage:
+                    return  # Cut inside a header, nothing left to recover
+                raise
+            if header is None:
+                # The central directory (or the end of the stream) follows
+                # the last member
+                return
+            _, _, flags, method, _, _, crc, compressed_size, size = header[:9]
+            name = name.decode("utf-8" if flags & FLAG_UTF8 else "cp437")
+            if flags & FLAG_ENCRYPTED:
+                raise zipfile.BadZipFile(f"{name!r} is encrypted")
+            zip64 = False
+            if compressed_size == 0xFFFFFFFF or size == 0xFFFFFFFF:
+                zip64 = True
+                compressed_size = get_zip64_sizes(extra, size, compressed_size)
+            descriptor = bool(flags & FLAG_DESCRIPTOR)
+            if descriptor:
+                if method == zipfile.ZIP_STORED:
+                    raise zipfile.BadZipFile(
+                        f"{name!r} is stored without sizes and cannot be streamed"
+                    )
+                # Writers that stream always size the descriptor for zip64
+                # when they add a zip64 extra field
+                zip64 = zip64 or has_zip64_extra(extra)
+                compressed_size = None
+            member = MemberStream(
+                self, name, method, compressed_size, crc, descriptor, zip64
+            )
+            yield name, member
+            member.skip()
+
+    def _read_header(self):
+        signature = self.read_exactly(4) if self._more() else b""
+        if signature != LOCAL_SIGNATURE:
+            self.unread(signature)
+            return None, None, None
+        header = LOCAL_HEADER.unpack(signature + self.read_exactly(26))
+        return header, self.read_exactly(header[9]), self.read_exactly(header[10])
+
+    def _more(self):
+        if self.pushed:
+            return True
+        data = self.stream.read(1)
+        self.pushed = data
+        return bool(data)
+
+
+def iter_extra(extra):
+    position = 0
+    while position + 4 <= len(extra):
+        field, size = struct.unpack("<HH", extra[position : position + 4])
+        yield field, extra[position + 4 : position + 4 + size]
+        position += 4 + size
+
+
+def has_zip64_extra(extra):
+    return any(field == ZIP64_EXTRA for field, _ in iter_extra(extra))
+
+
+# Compressed size from the zip64 extra field; it lists the uncompressed size
+# first, but only when the header's own value is 0xFFFFFFFF
+def get_zip64_sizes(extra, size, compressed_size):
+    for field, data in iter_extra(extra):
+        if field != ZIP64_EXTRA:
+            continue
+        values = [
+            struct.unpack("<Q", data[offset : offset + 8])[0]
+            for offset in range(0, len(data) - 7, 8)
+        ]
+        if size == 0xFFFFFFFF:
+            values.pop(0)
+        if compressed_size == 0xFFFFFFFF:
+            return values[0]
+        return compressed_size
+    raise zipfile.BadZipFile("Missing zip64 extra field")